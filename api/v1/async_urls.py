@@ -0,0 +1,13 @@
+from django.urls import path
+from api.v1 import async_views
+from api.v1.urls import urlpatterns as sync_urlpatterns
+
+# Те же адреса и имена, что в api/v1/urls.py: представления, у которых есть асинхронный вариант
+# в async_views (с тем же именем класса), заменяются на него, остальные остаются синхронными
+app_name = "api"
+urlpatterns = list()
+for pattern in sync_urlpatterns:
+    async_view = getattr(async_views, pattern.callback.view_class.__name__, None)
+    if async_view is not None:
+        pattern = path(str(pattern.pattern), async_view.as_view(), name=pattern.name)
+    urlpatterns.append(pattern)
@@ -0,0 +1,255 @@
+import json
+from asgiref.sync import sync_to_async
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse, QueryDict
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from book_management.versioning import get_catalog_version
+from .utils import ConditionalGetMixin, related_queryset
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    """JSON ответ (кириллица без экранирования, как у JSONRenderer DRF)"""
+
+    return JsonResponse(data, status=status_code, safe=False, json_dumps_params={"ensure_ascii": False})
+
+
+def request_data(request):
+    """
+    Данные запроса: JSON, application/x-www-form-urlencoded или multipart(только POST)
+    Возвращает None, если JSON не удалось разобрать
+    """
+
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+    if request.method == "POST":
+        data = request.POST.copy()
+        data.update(request.FILES)
+        return data
+    return QueryDict(request.body)
+
+
+class AsyncBaseView(View):
+    """
+    Базовое асинхронное представление API на обычном django.views.View
+    (APIView DRF 3.14 не поддерживает async def обработчики)
+    Сериализаторы DRF используются как есть: их проверка обращается к базе данных синхронно,
+    поэтому is_valid выполняется через sync_to_async, а чтение и запись - через асинхронный ORM
+    """
+
+    model = None
+    serializer_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True  # как у APIView: API не работает с сессионными формами
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.query_params = request.GET  # совместимость с классами пагинации DRF
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as error:
+            return json_response({"detail": error.detail}, status_code=error.status_code)
+
+    def get_model(self):
+        """Модель представления (у представлений создания берется из сериализатора)"""
+
+        return self.model or self.serializer_class.Meta.model
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("context", {"request": self.request, "view": self})
+        return self.serializer_class(*args, **kwargs)
+
+    @staticmethod
+    async def is_valid(serializer):
+        return await sync_to_async(serializer.is_valid)()
+
+    def split_many_to_many(self, validated_data):
+        """Отделяет ManyToMany поля: их значения записываются через aset после сохранения объекта"""
+
+        data = dict(validated_data)
+        fields = [field.name for field in self.get_model()._meta.many_to_many if field.name in data]
+        many = {name: data.pop(name) for name in fields}
+        return data, many
+
+    @staticmethod
+    async def set_many_to_many(instance, many):
+        for name, values in many.items():
+            await getattr(instance, name).aset(values)
+
+
+class AsyncConditionalGetMixin(ConditionalGetMixin):
+    """Условный GET для асинхронных представлений (тот же ETag, что у синхронных)"""
+
+    def etag_format(self, request):
+        return "json"
+
+    async def get(self, request, *args, **kwargs):
+        version, updated_at = await sync_to_async(get_catalog_version)()
+        etag = self.get_etag(request, version)
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await self.get_response(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class AsyncBaseListView(AsyncConditionalGetMixin, AsyncBaseView):
+    """
+    Асинхронный вариант BaseListView
+    Объекты читаются через aiterator, ManyToMany поля загружаются после них
+    (prefetch_related не поддерживается aiterator в Django 4.2)
+    pagination_class - KeysetCursorPagination или None
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    pagination_class = None
+
+    def get_queryset(self):
+        return related_queryset(self.model, self.select_related_fields, ())
+
+    async def prefetch(self, objects):
+        if self.prefetch_related_fields and objects:
+            await sync_to_async(prefetch_related_objects)(objects, *self.prefetch_related_fields)
+
+    async def get_response(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        paginator = self.pagination_class() if self.pagination_class else None
+        page = await paginator.apaginate_queryset(queryset, request, self) if paginator else None
+        if page is not None:
+            await self.prefetch(page)
+            return json_response(paginator.get_paginated_data(self.get_serializer(page, many=True).data))
+        objects = [obj async for obj in queryset.aiterator()]
+        await self.prefetch(objects)
+        return json_response(self.get_serializer(objects, many=True).data)
+
+
+class AsyncBaseDetailView(AsyncConditionalGetMixin, AsyncBaseView):
+    """Асинхронный вариант BaseDetailView (объект читается через aget)"""
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def get_queryset(self):
+        return related_queryset(self.model, self.select_related_fields, ())
+
+    async def get_response(self, request, *args, **kwargs):
+        try:
+            instance = await self.get_queryset().aget(pk=kwargs["pk"])
+        except self.model.DoesNotExist:
+            raise NotFound()
+        if self.prefetch_related_fields:
+            await sync_to_async(prefetch_related_objects)([instance], *self.prefetch_related_fields)
+        return json_response(self.get_serializer(instance).data)
+
+
+class AsyncBaseCreateView(AsyncBaseView):
+    """
+    Асинхронный вариант BaseCreateView (объект создается через acreate)
+    response, data_func - как у BaseCreateView
+    """
+
+    response = None
+    data_func = None
+
+    async def post(self, request, *args, **kwargs):
+        data = request_data(request)
+        if data is None:
+            return json_response({"error": "Некорректный JSON"}, status_code=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=data)
+        if not await self.is_valid(serializer):
+            return json_response({"error": serializer.errors}, status_code=status.HTTP_400_BAD_REQUEST)
+        await self.perform_create(serializer)
+        if self.response:
+            response = self.response
+        elif self.data_func:
+            response = self.data_func(serializer=serializer)
+        else:
+            response = "Объект создан"
+        return json_response(response, status_code=status.HTTP_201_CREATED)
+
+    async def perform_create(self, serializer):
+        data, many = self.split_many_to_many(serializer.validated_data)
+        serializer.instance = await self.get_model().objects.acreate(**data)
+        await self.set_many_to_many(serializer.instance, many)
+
+
+class AsyncBaseUpdate(AsyncBaseView):
+    """
+    Асинхронный вариант BaseUpdate (объект читается через aget и сохраняется через asave)
+    partial, data_func - как у BaseUpdate
+    """
+
+    partial = False
+    data_func = None
+
+    async def put(self, request, *args, **kwargs):
+        return await self.update(request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.update(request, *args, **kwargs)
+
+    async def update(self, request, *args, **kwargs):
+        try:
+            instance = await self.model.objects.aget(pk=kwargs["pk"])
+        except self.model.DoesNotExist:
+            response = {
+                "error": f"Ни один из объектов {self.model.__name__} не соответствует запросу."
+            }
+            return json_response(response, status_code=status.HTTP_404_NOT_FOUND)
+        data = request_data(request)
+        if data is None:
+            return json_response({"error": "Некорректный JSON"}, status_code=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(instance, data, partial=self.partial)
+        old_data = self.data_func(instance=instance) if self.data_func else None
+        if not await self.is_valid(serializer):
+            return json_response(serializer.errors, status_code=status.HTTP_400_BAD_REQUEST)
+        await self.perform_update(serializer)
+        if self.data_func:
+            new_data = self.data_func(instance=instance)
+            response = {
+                "message": f"{self.model.__name__}: old_: {old_data} обновлен на new_: {new_data}"
+            }
+        else:
+            response = {
+                "message": f"Объект {self.model.__name__} обновлен"
+            }
+        return json_response(response)
+
+    async def perform_update(self, serializer):
+        data, many = self.split_many_to_many(serializer.validated_data)
+        for attr, value in data.items():
+            setattr(serializer.instance, attr, value)
+        await serializer.instance.asave()
+        await self.set_many_to_many(serializer.instance, many)
+
+
+class AsyncBaseDeleteView(AsyncBaseView):
+    """Асинхронный вариант BaseDeleteView (объект удаляется через adelete)"""
+
+    async def delete(self, request, *args, **kwargs):
+        try:
+            instance = await self.model.objects.aget(pk=kwargs["pk"])
+        except self.model.DoesNotExist:
+            response = {
+                "error": f"Ни один {self.model.__name__.lower()} не соответствует заданному запросу"
+            }
+            return json_response(response, status_code=status.HTTP_404_NOT_FOUND)
+        description = str(instance)
+        await instance.adelete()
+        response = {
+            "message": f"Объект {self.model.__name__}: '{description}' удален."
+        }
+        return json_response(response, status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,215 @@
+from rest_framework import status
+from api.v1.serializers import (
+    LanguageSerializer, GenreSerializer, PublisherSerializer, AuthorSerializer, AllBookSerializer, BookSerializer
+)
+from book_management.export import aexport_stream
+from book_management.models import Language, Genre, Publisher, Author, Book
+from .async_utils import (
+    AsyncBaseView, AsyncBaseListView, AsyncBaseDetailView, AsyncBaseCreateView, AsyncBaseUpdate, AsyncBaseDeleteView,
+    json_response
+)
+from .pagination import KeysetCursorPagination
+from .utils import (
+    data_publisher, data_author, data_language_or_genre, data_author_create, data_publisher_create, export_response
+)
+
+# Асинхронные варианты представлений из api/v1/views.py, имена классов совпадают (от них зависит ETag)
+
+
+class ListLanguage(AsyncBaseListView):
+    """Показ всех языков"""
+
+    model = Language
+    serializer_class = LanguageSerializer
+
+
+class CreateLanguage(AsyncBaseCreateView):
+    """Добавить язык"""
+
+    serializer_class = LanguageSerializer
+    response = {
+        "message": "Язык добавлен"
+    }
+
+
+class DeleteLanguage(AsyncBaseDeleteView):
+    """Удаления языка"""
+
+    model = Language
+
+
+class UpdateLanguage(AsyncBaseUpdate):
+    """Обновление языка"""
+
+    model = Language
+    serializer_class = LanguageSerializer
+    data_func = data_language_or_genre
+
+
+class ListGenre(AsyncBaseListView):
+    """Показ всех жанров"""
+
+    model = Genre
+    serializer_class = GenreSerializer
+
+
+class CreateGenre(AsyncBaseCreateView):
+    """Создание жанра"""
+
+    serializer_class = GenreSerializer
+    response = {
+        "message": "Жанр добавлен"
+    }
+
+
+class DeleteGenre(AsyncBaseDeleteView):
+    """Удаление жанра"""
+
+    model = Genre
+
+
+class UpdateGenre(AsyncBaseUpdate):
+    """Обновление жанра"""
+
+    model = Genre
+    serializer_class = GenreSerializer
+    data_func = data_language_or_genre
+
+
+class ListPublisher(AsyncBaseListView):
+    """Показ всех издателей"""
+
+    model = Publisher
+    serializer_class = PublisherSerializer
+    pagination_class = KeysetCursorPagination
+
+
+class CreatePublisher(AsyncBaseCreateView):
+    """Добавление издателя"""
+
+    serializer_class = PublisherSerializer
+    data_func = data_publisher_create
+
+
+class DeletePublisher(AsyncBaseDeleteView):
+    """Удаление издателя"""
+
+    model = Publisher
+
+
+class PUTUpdatePublisher(AsyncBaseUpdate):
+    """Полное обновление издателя"""
+
+    serializer_class = PublisherSerializer
+    model = Publisher
+    data_func = data_publisher
+
+
+class PATCHUpdatePublisher(AsyncBaseUpdate):
+    """Частичное обновление издателя"""
+
+    serializer_class = PublisherSerializer
+    model = Publisher
+    partial = True
+    data_func = data_publisher
+
+
+class ListAuthor(AsyncBaseListView):
+    """Показать всех авторов"""
+
+    model = Author
+    serializer_class = AuthorSerializer
+    pagination_class = KeysetCursorPagination
+    cursor_ordering = ("first_name", "id")
+
+
+class CreateAuthor(AsyncBaseCreateView):
+    """Создание(добавления) автора"""
+
+    serializer_class = AuthorSerializer
+    data_func = data_author_create
+
+
+class DeleteAuthor(AsyncBaseDeleteView):
+    """Удаления автора"""
+
+    model = Author
+
+
+class PutUpdateAuthor(AsyncBaseUpdate):
+    """Полное обновление автора"""
+
+    serializer_class = AuthorSerializer
+    model = Author
+    data_func = data_author
+
+
+class PatchUpdateAuthor(AsyncBaseUpdate):
+    """Частичное обновление автора"""
+
+    serializer_class = AuthorSerializer
+    model = Author
+    data_func = data_author
+    partial = True
+
+
+class ListBook(AsyncBaseListView):
+    """Показ книг"""
+
+    model = Book
+    serializer_class = AllBookSerializer
+    pagination_class = KeysetCursorPagination
+    select_related_fields = ("publisher",)
+    prefetch_related_fields = ("author", "genre", "language")
+
+    def get_queryset(self):
+        """Показ книг только тех которые разрешены для показа"""
+        return super().get_queryset().filter(show_book=True)
+
+
+class CreateBook(AsyncBaseCreateView):
+    """Создание(добавление) книги"""
+
+    serializer_class = BookSerializer
+
+
+class ExportBook(AsyncBaseView):
+    """
+    Потоковая выгрузка всего каталога книг
+    Синхронный генератор ASGI обработчик Django собирает в список целиком, поэтому здесь - асинхронный(aexport_stream)
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            return export_response(request.query_params, aexport_stream)
+        except ValueError as error:
+            return json_response({"error": str(error)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+
+class PutUpdateBook(AsyncBaseUpdate):
+    """Полное обновление книги"""
+
+    serializer_class = BookSerializer
+    model = Book
+
+
+class PatchUpdateBook(AsyncBaseUpdate):
+    """Частичное обновление книги"""
+
+    serializer_class = BookSerializer
+    model = Book
+    partial = True
+
+
+class DeleteBook(AsyncBaseDeleteView):
+    """Удаление книги"""
+
+    model = Book
+
+
+class DetailBookView(AsyncBaseDetailView):
+    """Просмотр конкретной книги"""
+
+    serializer_class = BookSerializer
+    model = Book
+    prefetch_related_fields = ("author", "genre", "language")
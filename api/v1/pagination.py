@@ -0,0 +1,100 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from book_management.pagination import KeysetPaginator, InvalidCursor
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset(cursor) пагинация для API
+    Включается, если в запросе передан параметр cursor (пустой - первая страница) или page_size,
+    без них endpoint возвращает полный список, как и раньше
+    cursor_ordering у представления переопределяет поля сортировки (по умолчанию title, id)
+    """
+
+    page_size = 10
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("title", "id")
+
+    def __init__(self):
+        self.page = None
+        self.request = None
+
+    def get_page_size(self, request):
+        """Размер страницы из запроса, ограниченный max_page_size"""
+
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_paginator(self, queryset, request, view):
+        """KeysetPaginator для запроса или None, если пагинация не запрошена"""
+
+        if self.cursor_query_param not in request.query_params and \
+                self.page_size_query_param not in request.query_params:
+            return None
+        ordering = getattr(view, "cursor_ordering", self.ordering)
+        return KeysetPaginator(queryset, self.get_page_size(request), ordering=ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Возвращает объекты текущей страницы или None, если пагинация не запрошена"""
+
+        paginator = self.get_paginator(queryset, request, view)
+        if paginator is None:
+            return None
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound("Неверный курсор")
+        self.request = request
+        return self.page.object_list
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset (request - HttpRequest с query_params)"""
+
+        paginator = self.get_paginator(queryset, request, view)
+        if paginator is None:
+            return None
+        try:
+            self.page = await paginator.apage(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound("Неверный курсор")
+        self.request = request
+        return self.page.object_list
+
+    def _link(self, cursor):
+        """Ссылка на страницу с заданным курсором"""
+
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data
+        }
+
+    def get_paginated_response(self, data):
+        return Response(data=self.get_paginated_data(data))
+
+
+class SearchPagination(PageNumberPagination):
+    """Постраничный вывод результатов поиска (?page=N&page_size=M)"""
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
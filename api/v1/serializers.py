@@ -41,10 +41,15 @@ class AllBookSerializer(serializers.ModelSerializer):
     publisher = PublisherSerializer()
     genre = GenreSerializer(many=True)
     language = LanguageSerializer(many=True)
+    thumbnail_url = serializers.ReadOnlyField()
+    srcset = serializers.ReadOnlyField()
 
     class Meta:
         model = Book
-        fields = ["id", "title", "language", "author", "publisher", "genre", "pages", "cover", "year"]
+        fields = [
+            "id", "title", "language", "author", "publisher", "genre", "pages", "cover", "thumbnail_url", "srcset",
+            "year"
+        ]
 
 
 class BookSerializer(serializers.ModelSerializer):
@@ -52,3 +57,18 @@ class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ["title", "language", "author", "publisher", "genre", "pages", "cover", "year"]
+
+
+class BulkBookSerializer(serializers.Serializer):
+    """
+    Сериализатор одной книги при массовом добавлении
+    Связи передаются списками id, их существование проверяется одним запросом на всю пачку
+    """
+    title = serializers.CharField(max_length=200)
+    publisher = serializers.IntegerField()
+    author = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    genre = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    language = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    pages = serializers.IntegerField(default=0)
+    year = serializers.IntegerField(min_value=1000, max_value=3000)
+    show_book = serializers.BooleanField(default=True)
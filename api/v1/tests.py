@@ -1,6 +1,19 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from PIL import Image
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from django.urls import reverse
+from book_management.export import export_stream
 from book_management.models import Language, Genre, Author, Publisher, Book
+from book_management.fuzzy import author_lookup, publisher_lookup
+from book_management.versioning import get_catalog_version
 
 
 class TestLanguageAndGenre(APITestCase):
@@ -169,6 +182,33 @@ class TestPublisherAndAuthor(APITestCase):
         self.assertEquals(response_publisher.data, [])
         self.assertEquals(response_author.data, [])
 
+    def test_autocomplete(self):
+        """Нечеткий поиск авторов и издательств с опечатками и транслитерацией"""
+
+        author_lookup.reset()
+        publisher_lookup.reset()
+        url_author = reverse("api:autocomplete_author")
+        url_publisher = reverse("api:autocomplete_publisher")
+
+        response = self.client.get(url_author, {"q": "TestNmae TestLastNam"})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data[0]["id"], self.author.pk)
+
+        tolstoy = Author.objects.create(first_name="Лев", last_name="Толстой", country="Россия")
+        response = self.client.get(url_author, {"q": "Lev Tolstoi"})
+        self.assertEquals(response.data[0]["id"], tolstoy.pk)
+        self.assertEquals(response.data[0]["name"], "Лев Толстой")
+
+        response = self.client.get(url_publisher, {"q": "TestTitlePublsher"})
+        self.assertEquals(response.data[0]["id"], self.publisher.pk)
+        response = self.client.get(url_publisher, {"q": "zzzzzz"})
+        self.assertEquals(response.data, [])
+
+        tolstoy_pk = tolstoy.pk
+        tolstoy.delete()
+        response = self.client.get(url_author, {"q": "Lev Tolstoi"})
+        self.assertFalse([item for item in response.data if item["id"] == tolstoy_pk])
+
     def test_add_data(self):
         """Добавление данных в таблицу"""
 
@@ -344,6 +384,159 @@ class TestBook(APITestCase):
         self.assertEquals(response.status_code, 200)
         self.assertEquals(response.data, [])
 
+    def test_list_book_num_queries(self):
+        """Количество запросов не зависит от количества книг: книги + publisher через JOIN + 3 prefetch"""
+
+        url_book = reverse("api:list_book")
+        get_catalog_version()  # версия каталога для ETag берется из кэша, прогреваем его
+        with self.assertNumQueries(4):
+            response = self.client.get(url_book)
+        self.assertEquals(len(response.data), 1)
+
+        for idx in range(10):
+            book = Book.objects.create(title=f"QueryBook_{idx}", publisher=self.publisher, pages=10, year=2020)
+            book.author.set(self.author)
+            book.genre.set(self.genre)
+            book.language.set(self.language)
+        get_catalog_version()
+        with self.assertNumQueries(4):
+            response = self.client.get(url_book)
+        self.assertEquals(len(response.data), 11)
+        self.assertEquals(len(response.data[0]["author"]), 2)
+
+        with self.assertNumQueries(4):
+            self.client.get(url_book, {"cursor": ""})
+
+    def test_detail_book_num_queries(self):
+        """Детальный просмотр книги: сама книга + 3 prefetch"""
+
+        url_book = reverse("api:detail_book_view", kwargs={"pk": self.book.pk})
+        get_catalog_version()
+        with self.assertNumQueries(4):
+            response = self.client.get(url_book)
+        self.assertEquals(sorted(response.data["author"]), sorted(aut.pk for aut in self.author))
+
+    def test_cover_variants(self):
+        """После сохранения обложки строятся копии, до этого thumbnail_url отдает оригинал"""
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (600, 900), "red").save(buffer, format="PNG")
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root, COVER_WORKERS=0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.book.cover = SimpleUploadedFile("cover.png", buffer.getvalue(), content_type="image/png")
+                self.book.save()
+            self.assertEquals(self.book.thumbnail_url, self.book.cover.url)
+            self.assertEquals(self.book.srcset, "")
+            for callback in callbacks:
+                callback()
+
+            book = Book.objects.get(pk=self.book.pk)
+            self.assertTrue(book.thumbnail_url.endswith("_40x50.jpg"))
+            self.assertEquals(len(book.srcset.split(", ")), 3)
+            with Image.open(book.cover.storage.path(book.cover_variants["webp"]["80x100"])) as image:
+                self.assertEquals((image.format, image.size), ("WEBP", (80, 100)))
+            response = self.client.get(reverse("api:list_book"))
+            self.assertEquals(response.data[0]["thumbnail_url"], book.thumbnail_url)
+            self.assertIn("240w", response.data[0]["srcset"])
+
+            book.cover = None
+            book.save()
+            self.assertEquals(Book.objects.get(pk=book.pk).cover_variants, {})
+
+    def test_conditional_get(self):
+        """Повторный запрос с If-None-Match получает 304 без обращения к базе, изменение каталога меняет ETag"""
+
+        url_book = reverse("api:list_book")
+        url_detail = reverse("api:detail_book_view", kwargs={"pk": self.book.pk})
+        for url in (url_book, url_detail):
+            response = self.client.get(url)
+            self.assertEquals(response.status_code, 200)
+            etag = response["ETag"]
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEquals(response.status_code, 304)
+
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEquals(response.status_code, 304)
+
+            self.book.pages += 1
+            self.book.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEquals(response.status_code, 200)
+            self.assertNotEquals(response["ETag"], etag)
+
+    def test_search_book(self):
+        """Поиск книг через API с пагинацией"""
+
+        for idx in range(12):
+            Book.objects.create(title=f"Searchable {idx}", publisher=self.publisher, pages=10, year=2020)
+        url_search = reverse("api:search_book")
+        response = self.client.get(url_search, {"q": "searchable"})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data["count"], 12)
+        self.assertEquals(len(response.data["results"]), 10)
+        response = self.client.get(url_search, {"q": "searchable", "page": 2})
+        self.assertEquals(len(response.data["results"]), 2)
+
+        response = self.client.get(url_search, {"q": "PublisherTitle"})
+        self.assertEquals(response.data["count"], 13)
+        response = self.client.get(url_search, {"q": "nothing_found"})
+        self.assertEquals(response.data["count"], 0)
+
+    @override_settings(FACET_INDEX_BACKGROUND=False)
+    def test_facet_book(self):
+        """Фасетный подбор: сочетание фильтров, количество по фасетам без учета фильтра самого фасета"""
+
+        for idx in range(12):
+            book = Book.objects.create(title=f"FacetBook_{idx:02}", publisher=self.publisher, pages=10, year=2000 + idx)
+            book.genre.set([self.genre[idx % 2]])
+            book.language.set([self.language[0]])
+        url_facet = reverse("api:facet_book")
+        response = self.client.get(url_facet)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data["count"], 13)
+        genres = {item["value"]: item["count"] for item in response.data["facets"]["genre"]}
+        self.assertEquals(genres, {self.genre[0].slug: 7, self.genre[1].slug: 7})
+
+        params = {"genre": self.genre[0].slug, "year_min": 2004, "year_max": 2023}
+        response = self.client.get(url_facet, params)
+        self.assertEquals([book["title"] for book in response.data["results"]],
+                          ["FacetBook_04", "FacetBook_06", "FacetBook_08", "FacetBook_10", "TitleBook"])
+        facets = response.data["facets"]
+        genres = {item["value"]: (item["count"], item["selected"]) for item in facets["genre"]}
+        self.assertEquals(genres, {self.genre[0].slug: (5, True), self.genre[1].slug: (5, False)})
+        self.assertEquals({item["value"]: item["count"] for item in facets["language"]},
+                          {self.language[0].slug: 5, self.language[1].slug: 1})
+        self.assertEquals(len(facets["year"]), 7)
+
+        response = self.client.get(url_facet, {"genre": [self.genre[0].slug, self.genre[1].slug], "page": 2})
+        self.assertEquals(len(response.data["results"]), 3)
+        Book.objects.filter(title="FacetBook_00").delete()
+        response = self.client.get(url_facet, {"language": self.language[0].slug})
+        self.assertEquals(response.data["count"], 12)
+        response = self.client.get(url_facet, {"year_min": "abc"})
+        self.assertEquals(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        """Постраничный вывод книг по курсору"""
+
+        for idx in range(5):
+            Book.objects.create(title=f"CursorBook_{idx}", publisher=self.publisher, pages=10, year=2020)
+        url_book = reverse("api:list_book")
+        response = self.client.get(url_book, {"cursor": "", "page_size": 4})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(response.data["results"]), 4)
+        self.assertIsNone(response.data["previous"])
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEquals(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["next"])
+        self.assertIsNotNone(response.data["previous"])
+
+        response = self.client.get(url_book, {"cursor": "invalid"})
+        self.assertEquals(response.status_code, 404)
+
     def test_add_book(self):
         """Добавление книги"""
 
@@ -378,6 +571,161 @@ class TestBook(APITestCase):
         self.assertEquals(response.status_code, 400)
         self.assertEquals(Book.objects.count(), 2)
 
+    def test_bulk_add_book(self):
+        """Массовое добавление книг: корректные создаются, ошибки возвращаются по каждой книге"""
+
+        url_bulk = reverse("api:bulk_add_book")
+        book = {
+            "title": "TitleBook",
+            "language": [lang.pk for lang in self.language],
+            "author": [aut.pk for aut in self.author],
+            "publisher": self.publisher.pk,
+            "genre": [self.genre[0].pk],
+            "pages": 100,
+            "year": 2020
+        }
+        data = [book, dict(book), dict(book, author=[100]), dict(book, year=1), dict(book, title="BulkOther")]
+        response = self.client.post(url_bulk, data, format="json")
+        self.assertEquals(response.status_code, 201)
+        self.assertEquals([item["index"] for item in response.data["created"]], [0, 1, 4])
+        self.assertEquals([item["index"] for item in response.data["errors"]], [2, 3])
+        self.assertIn("author", response.data["errors"][0]["errors"])
+        self.assertIn("year", response.data["errors"][1]["errors"])
+
+        created = Book.objects.filter(pk__in=[item["id"] for item in response.data["created"]])
+        self.assertEquals(len({obj.slug for obj in created} | {self.book.slug}), 4)
+        for obj in created:
+            self.assertEquals(obj.author.count(), 2)
+            self.assertEquals(list(obj.genre.all()), [self.genre[0]])
+        response = self.client.get(reverse("api:search_book"), {"q": "BulkOther"})
+        self.assertEquals(response.data["count"], 1)
+
+        response = self.client.post(url_bulk, [dict(book, publisher=100)], format="json")
+        self.assertEquals(response.status_code, 400)
+        response = self.client.post(url_bulk, {}, format="json")
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(Book.objects.count(), 4)
+
+    def test_export_book(self):
+        """Потоковая выгрузка NDJSON/CSV, сжатие gzip и фильтр since"""
+
+        url_export = reverse("api:export_book")
+        for idx in range(3):
+            book = Book.objects.create(title=f"ExportBook_{idx}", publisher=self.publisher, pages=10, year=2020)
+            book.author.set(self.author)
+        response = self.client.get(url_export)
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEquals([row["id"] for row in rows], sorted(Book.objects.values_list("pk", flat=True)))
+        self.assertEquals(rows[0]["publisher"]["title"], "PublisherTitle")
+        self.assertEquals(len(rows[0]["authors"]), 2)
+        self.assertEquals(sorted(rows[0]["genres"]), ["test_genre_title_0", "test_genre_title_1"])
+
+        response = self.client.get(url_export, {"type": "csv", "compress": "gzip"})
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        csv_rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEquals(len(csv_rows), 4)
+        self.assertEquals(csv_rows[0]["authors"], "test_first_name_0 test_last_name_0|test_first_name_1 test_last_name_1")
+
+        since = Book.objects.get(title="ExportBook_2").updated_at.isoformat()
+        response = self.client.get(url_export, {"since": since})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEquals([row["title"] for row in rows], ["ExportBook_2"])
+        genre = self.genre[0]
+        genre.title = "RenamedGenre"
+        genre.save()
+        response = self.client.get(url_export, {"since": since})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEquals([row["title"] for row in rows], ["TitleBook", "ExportBook_2"])
+
+        since = timezone.now().isoformat()
+        Book.objects.get(title="ExportBook_0").author.remove(self.author[0])
+        response = self.client.get(url_export, {"since": since})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEquals([row["title"] for row in rows], ["ExportBook_0"])
+        since = timezone.now().isoformat()
+        self.language[0].delete()
+        response = self.client.get(url_export, {"since": since})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEquals([row["title"] for row in rows], ["TitleBook"])
+
+        self.assertEquals(self.client.get(url_export, {"since": "yesterday"}).status_code, 400)
+        self.assertEquals(self.client.get(url_export, {"type": "xml"}).status_code, 400)
+
+    @override_settings(ROOT_URLCONF="api.v1.async_urls")
+    async def test_async_views(self):
+        """Асинхронные представления: те же ответы, что у синхронных"""
+
+        response = await self.async_client.get(reverse("list_book"))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()[0]["title"], "TitleBook")
+        self.assertEquals(len(response.json()[0]["author"]), 2)
+        response = await self.async_client.get(reverse("list_book"), {"cursor": "", "page_size": 1})
+        self.assertEquals(response.json()["next"], None)
+        self.assertEquals(len(response.json()["results"]), 1)
+        etag = response["ETag"]
+        response = await self.async_client.get(
+            reverse("list_book"), {"cursor": "", "page_size": 1}, headers={"If-None-Match": etag}
+        )
+        self.assertEquals(response.status_code, 304)
+
+        data = {
+            "title": "AsyncBook",
+            "language": [self.language[0].pk],
+            "author": [aut.pk for aut in self.author],
+            "publisher": self.publisher.pk,
+            "genre": [self.genre[0].pk],
+            "pages": 100,
+            "year": 2020
+        }
+        response = await self.async_client.post(reverse("add_book"), data, content_type="application/json")
+        self.assertEquals(response.status_code, 201)
+        book = await Book.objects.aget(title="AsyncBook")
+        self.assertEquals(await book.author.acount(), 2)
+        response = await self.async_client.post(
+            reverse("add_book"), dict(data, year=1), content_type="application/json"
+        )
+        self.assertEquals(response.status_code, 400)
+        self.assertIn("year", response.json()["error"])
+
+        url_detail = reverse("detail_book_view", kwargs={"pk": book.pk})
+        response = await self.async_client.patch(
+            reverse("patch_update_book", kwargs={"pk": book.pk}), {"genre": [self.genre[1].pk]},
+            content_type="application/json"
+        )
+        self.assertEquals(response.status_code, 200)
+        response = await self.async_client.get(url_detail)
+        self.assertEquals(response.json()["genre"], [self.genre[1].pk])
+
+        response = await self.async_client.delete(reverse("delete_book", kwargs={"pk": book.pk}))
+        self.assertEquals(response.status_code, 204)
+        self.assertEquals((await self.async_client.get(url_detail)).status_code, 404)
+        response = await self.async_client.delete(reverse("delete_book", kwargs={"pk": book.pk}))
+        self.assertEquals(response.status_code, 404)
+
+    @override_settings(ROOT_URLCONF="api.v1.async_urls", EXPORT_CHUNK_SIZE=2)
+    async def test_async_export_book(self):
+        """Выгрузка под ASGI отдается асинхронным потоком пачками, содержимое то же, что у синхронной"""
+
+        for idx in range(4):
+            await Book.objects.acreate(title=f"ExportBook_{idx}", publisher=self.publisher, pages=10, year=2020)
+        url_export = reverse("export_book")
+        response = await self.async_client.get(url_export)
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEquals([row["id"] for row in rows], [book.pk async for book in Book.objects.order_by("pk")])
+        self.assertEquals(content, await sync_to_async(lambda: b"".join(export_stream()))())
+
+        response = await self.async_client.get(url_export, {"type": "csv", "compress": "gzip"})
+        self.assertTrue(response.is_async)
+        content = gzip.decompress(b"".join([chunk async for chunk in response.streaming_content]))
+        expected = await sync_to_async(lambda: b"".join(export_stream("csv")))()
+        self.assertEquals(content, expected)
+        self.assertEquals((await self.async_client.get(url_export, {"type": "xml"})).status_code, 400)
+
     def test_put_update_book(self):
         """Полное обновление записи book"""
 
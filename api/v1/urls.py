@@ -3,7 +3,8 @@ from api.v1.views import (
     ListLanguage, CreateLanguage, DeleteLanguage, UpdateLanguage, ListGenre, CreateGenre, DeleteGenre, UpdateGenre,
     ListPublisher, CreatePublisher, DeletePublisher, PUTUpdatePublisher, PATCHUpdatePublisher, ListAuthor,
     CreateAuthor, DeleteAuthor, PutUpdateAuthor, PatchUpdateAuthor, ListBook, CreateBook, PutUpdateBook,
-    PatchUpdateBook, DeleteBook, DetailBookView
+    PatchUpdateBook, DeleteBook, DetailBookView, SearchBook, AutocompleteAuthor, AutocompletePublisher, BulkCreateBook,
+    ExportBook, DatabasePoolStats, FacetBook
 )
 
 app_name = "api"
@@ -17,19 +18,26 @@ urlpatterns = [
     path("delete-genre/<int:pk>/", DeleteGenre.as_view(), name="delete_genre"),
     path("update-genre/<int:pk>/", UpdateGenre.as_view(), name="update_genre"),
     path("list-publisher/", ListPublisher.as_view(), name="list_publisher"),
+    path("autocomplete-publisher/", AutocompletePublisher.as_view(), name="autocomplete_publisher"),
     path("add-publisher/", CreatePublisher.as_view(), name="add_publisher"),
     path("delete-publisher/<int:pk>/", DeletePublisher.as_view(), name="delete_publisher"),
     path("put-update-publisher/<int:pk>/", PUTUpdatePublisher.as_view(), name="put_update_publisher"),
     path("patch-update-publisher/<int:pk>/", PATCHUpdatePublisher.as_view(), name="patch_update_publisher"),
     path("list-author/", ListAuthor.as_view(), name="list_author"),
+    path("autocomplete-author/", AutocompleteAuthor.as_view(), name="autocomplete_author"),
     path("add-author/", CreateAuthor.as_view(), name="add_author"),
     path("delete-author/<int:pk>/", DeleteAuthor.as_view(), name="delete_author"),
     path("put-update-author/<int:pk>/", PutUpdateAuthor.as_view(), name="put_update_author"),
     path("patch-update-author/<int:pk>/", PatchUpdateAuthor.as_view(), name="patch_update_author"),
     path("list-book/", ListBook.as_view(), name="list_book"),
     path("add-book/", CreateBook.as_view(), name="add_book"),
+    path("bulk-add-book/", BulkCreateBook.as_view(), name="bulk_add_book"),
+    path("export-book/", ExportBook.as_view(), name="export_book"),
     path("put-update-book/<int:pk>/", PutUpdateBook.as_view(), name="put_update_book"),
     path("patch-update-book/<int:pk>/", PatchUpdateBook.as_view(), name="patch_update_book"),
     path("delete-book/<int:pk>/", DeleteBook.as_view(), name="delete_book"),
     path("detail-book-view/<int:pk>/", DetailBookView.as_view(), name="detail_book_view"),
+    path("search-book/", SearchBook.as_view(), name="search_book"),
+    path("facet-book/", FacetBook.as_view(), name="facet_book"),
+    path("db-pool-stats/", DatabasePoolStats.as_view(), name="db_pool_stats"),
 ]
@@ -1,9 +1,16 @@
-from django.http import Http404
+import hashlib
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.generics import (
-    UpdateAPIView, ListAPIView, CreateAPIView, DestroyAPIView, RetrieveAPIView, get_object_or_404
+    UpdateAPIView, ListAPIView, CreateAPIView, DestroyAPIView, RetrieveAPIView, GenericAPIView, get_object_or_404
 )
+from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from book_management.export import EXPORT_TYPES, parse_since
+from book_management.versioning import get_catalog_version
 
 
 def data_publisher(*args, instance):
@@ -75,6 +82,73 @@ def data_publisher_create(*args, serializer):
     return response
 
 
+def related_queryset(model, select_related_fields, prefetch_related_fields):
+    """
+    Возвращает queryset модели с заранее загруженными связями,
+    чтобы сериализатор не делал отдельный запрос на каждую связь каждого объекта
+    """
+
+    queryset = model.objects.all()
+    if select_related_fields:
+        queryset = queryset.select_related(*select_related_fields)
+    if prefetch_related_fields:
+        queryset = queryset.prefetch_related(*prefetch_related_fields)
+    return queryset
+
+
+def export_response(query_params, stream_func):
+    """
+    Потоковый ответ выгрузки каталога по ?type=&since=&compress=
+    stream_func - export_stream или aexport_stream(ASGI), при ошибке в параметрах возбуждает ValueError
+    """
+
+    export_type = query_params.get("type", "ndjson")
+    if export_type not in EXPORT_TYPES:
+        raise ValueError(f"Неизвестный формат: {export_type}")
+    since = query_params.get("since")
+    since = parse_since(since) if since else None
+    compress = query_params.get("compress") == "gzip"
+    response = StreamingHttpResponse(
+        stream_func(export_type, since=since, compress=compress),
+        content_type="application/gzip" if compress else EXPORT_TYPES[export_type]
+    )
+    filename = f"books.{export_type}{'.gz' if compress else ''}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Условный GET (If-None-Match / If-Modified-Since -> 304 Not Modified)
+    ETag строится из версии каталога, адреса запроса и формата ответа,
+    поэтому ответ 304 не требует ни загрузки объектов, ни обращения к базе данных
+    """
+
+    def etag_format(self, request):
+        """Формат ответа, от которого зависит ETag"""
+
+        return request.accepted_renderer.format
+
+    def get_etag(self, request, version):
+        """ETag ответа для текущей версии каталога"""
+
+        path = f"{request.get_full_path()}|{self.etag_format(request)}"
+        digest = hashlib.md5(path.encode("utf-8")).hexdigest()[:12]
+        return f'"{self.__class__.__name__}-{version}-{digest}"'
+
+    def get(self, request, *args, **kwargs):
+        version, updated_at = get_catalog_version()
+        etag = self.get_etag(request, version)
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
 class BaseUpdate(UpdateAPIView):
     """
     Базовый класс для полного и частичного обновления
@@ -124,25 +198,34 @@ class BaseUpdate(UpdateAPIView):
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
 
-class BaseListView(ListAPIView):
+class BaseListView(ConditionalGetMixin, ListAPIView):
     """
     Базовый класс вывода всех объектов
     serializer_class - Сериализатор модели
     model = Модель у которой необходимо получить все объекты
+    pagination_class - Класс пагинации (если не указан - возвращаются все объекты)
+    select_related_fields - ForeignKey поля, которые нужны сериализатору (загружаются через JOIN)
+    prefetch_related_fields - ManyToMany поля, которые нужны сериализатору (по одному запросу на поле)
     """
 
     serializer_class = None
     model = None
+    select_related_fields = ()
+    prefetch_related_fields = ()
 
     def get_queryset(self):
         """Получение всех объектов"""
 
-        return self.model.objects.all()
+        return related_queryset(self.model, self.select_related_fields, self.prefetch_related_fields)
 
     def list(self, request, *args, **kwargs):
         """Показ всех объектов"""
 
         queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
@@ -213,11 +296,102 @@ class BaseDeleteView(DestroyAPIView):
             return Response(data=response, status=status.HTTP_404_NOT_FOUND)
 
 
-class BaseDetailView(RetrieveAPIView):
-    """Показ конкретного объекта"""
+class BaseDetailView(ConditionalGetMixin, RetrieveAPIView):
+    """
+    Показ конкретного объекта
+    select_related_fields, prefetch_related_fields - связи, которые нужны сериализатору (как у BaseListView)
+    """
 
     serializer_class = None
     model = None
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def get_queryset(self):
+        return related_queryset(self.model, self.select_related_fields, self.prefetch_related_fields)
 
     def get_object(self):
-        return get_object_or_404(self.model, pk=self.kwargs["pk"])
+        return get_object_or_404(self.get_queryset(), pk=self.kwargs["pk"])
+
+
+class BaseAutocompleteView(APIView):
+    """
+    Базовый класс автодополнения по нечеткому совпадению имени (?q=...&limit=...)
+    lookup - объект FuzzyLookup из book_management.fuzzy
+    max_limit - максимальное количество подсказок
+    """
+
+    lookup = None
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        """Возвращает похожие имена по убыванию похожести"""
+
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(data=[], status=status.HTTP_200_OK)
+        try:
+            limit = min(int(request.query_params.get("limit", 0)), self.max_limit) or None
+        except ValueError:
+            limit = None
+        return Response(data=self.lookup.search(query, limit=limit), status=status.HTTP_200_OK)
+
+
+class BaseBulkCreateView(GenericAPIView):
+    """
+    Базовый класс массового создания объектов
+    serializer_class - Сериализатор одного объекта
+    related_models - {поле: модель} для полей с id (одиночным или списком), существование проверяется пачкой
+    bulk_func - Функция, которая создает объекты по списку проверенных данных и возвращает их
+    max_items - Максимальное количество объектов в одном запросе
+    Ошибки возвращаются по каждому объекту отдельно (index - позиция в переданном списке),
+    корректные объекты создаются
+    """
+
+    serializer_class = None
+    related_models = None
+    bulk_func = None
+    max_items = 10000
+
+    def post(self, request, *args, **kwargs):
+        """Проверяет весь список за один проход и создает корректные объекты"""
+
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(data={"error": "Ожидается непустой список объектов"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            response = {
+                "error": f"Слишком много объектов: {len(items)}, максимум {self.max_items}"
+            }
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        validated = dict()
+        errors = list()
+        for idx, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                validated[idx] = serializer.validated_data
+            else:
+                errors.append({"index": idx, "errors": serializer.errors})
+
+        for field, model in (self.related_models or {}).items():
+            ids = [pk for row in validated.values() for pk in self._related_ids(row[field])]
+            known = set(model.objects.filter(pk__in=set(ids)).values_list("pk", flat=True))
+            for idx, row in list(validated.items()):
+                missing = [pk for pk in self._related_ids(row[field]) if pk not in known]
+                if missing:
+                    message = PrimaryKeyRelatedField.default_error_messages["does_not_exist"]
+                    errors.append({"index": idx, "errors": {field: [message.format(pk_value=pk) for pk in missing]}})
+                    del validated[idx]
+
+        objects = self.bulk_func(list(validated.values())) if validated else []
+        response = {
+            "created": [{"index": idx, "id": obj.pk} for idx, obj in zip(validated, objects)],
+            "errors": sorted(errors, key=lambda error: error["index"])
+        }
+        status_code = status.HTTP_201_CREATED if objects else status.HTTP_400_BAD_REQUEST
+        return Response(data=response, status=status_code)
+
+    @staticmethod
+    def _related_ids(value):
+        return value if isinstance(value, list) else [value]
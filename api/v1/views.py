@@ -1,10 +1,24 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from api.v1.serializers import (
-    LanguageSerializer, GenreSerializer, PublisherSerializer, AuthorSerializer, AllBookSerializer, BookSerializer
+    LanguageSerializer, GenreSerializer, PublisherSerializer, AuthorSerializer, AllBookSerializer, BookSerializer,
+    BulkBookSerializer
 )
 from book_management.models import Language, Genre, Publisher, Author, Book
+from book_management.search import SearchResults
+from book_management.facets import FacetResults, parse_facet_filters
+from book_management.fuzzy import author_lookup, publisher_lookup
+from book_management.bulk import bulk_create_books
+from book_management.export import export_stream
+from book_management_system.db_pool.pool import all_pool_stats
+from .pagination import KeysetCursorPagination, SearchPagination
 from .utils import (
-    BaseUpdate, BaseListView, BaseCreateView, BaseDeleteView, BaseDetailView, data_publisher, data_author,
-    data_language_or_genre, data_author_create, data_publisher_create
+    BaseUpdate, BaseListView, BaseCreateView, BaseDeleteView, BaseDetailView, BaseAutocompleteView,
+    BaseBulkCreateView, data_publisher, data_author, data_language_or_genre, data_author_create, data_publisher_create,
+    export_response
 )
 
 
@@ -73,6 +87,13 @@ class ListPublisher(BaseListView):
 
     model = Publisher
     serializer_class = PublisherSerializer
+    pagination_class = KeysetCursorPagination
+
+
+class AutocompletePublisher(BaseAutocompleteView):
+    """Подсказки издательств по нечеткому совпадению названия"""
+
+    lookup = publisher_lookup
 
 
 class CreatePublisher(BaseCreateView):
@@ -111,6 +132,14 @@ class ListAuthor(BaseListView):
 
     model = Author
     serializer_class = AuthorSerializer
+    pagination_class = KeysetCursorPagination
+    cursor_ordering = ("first_name", "id")
+
+
+class AutocompleteAuthor(BaseAutocompleteView):
+    """Подсказки авторов по нечеткому совпадению имени и фамилии"""
+
+    lookup = author_lookup
 
 
 class CreateAuthor(BaseCreateView):
@@ -146,11 +175,60 @@ class PatchUpdateAuthor(BaseUpdate):
 class ListBook(BaseListView):
     """Показ книг"""
 
+    model = Book
     serializer_class = AllBookSerializer
+    pagination_class = KeysetCursorPagination
+    select_related_fields = ("publisher",)
+    prefetch_related_fields = ("author", "genre", "language")
 
     def get_queryset(self):
         """Показ книг только тех которые разрешены для показа"""
-        return Book.objects.filter(show_book=True)
+        return super().get_queryset().filter(show_book=True)
+
+
+class SearchBook(BaseListView):
+    """Полнотекстовый поиск книг (?q=), результаты отсортированы по релевантности"""
+
+    model = Book
+    serializer_class = AllBookSerializer
+    pagination_class = SearchPagination
+    select_related_fields = ("publisher",)
+    prefetch_related_fields = ("author", "genre", "language")
+
+    def get_queryset(self):
+        """Ленивый результат поиска, книги загружаются только для текущей страницы"""
+        queryset = super().get_queryset().filter(show_book=True)
+        return SearchResults(self.request.query_params.get("q", ""), queryset)
+
+
+class FacetBook(BaseListView):
+    """
+    Фасетный подбор книг: ?genre=&language=&publisher=(можно несколько) и ?year_min=&year_max=
+    Кроме страницы книг возвращает facets - количество книг по значениям каждого фасета
+    """
+
+    model = Book
+    serializer_class = AllBookSerializer
+    pagination_class = SearchPagination
+    select_related_fields = ("publisher",)
+    prefetch_related_fields = ("author", "genre", "language")
+
+    def list(self, request, *args, **kwargs):
+        try:
+            self.filters = parse_facet_filters(request.query_params)
+        except ValueError as error:
+            return Response(data={"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """Ленивый результат по фасетному индексу, книги загружаются только для текущей страницы"""
+        self.results = FacetResults(self.filters, super().get_queryset().filter(show_book=True))
+        return self.results
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["facets"] = self.results.facets()
+        return response
 
 
 class CreateBook(BaseCreateView):
@@ -159,6 +237,33 @@ class CreateBook(BaseCreateView):
     serializer_class = BookSerializer
 
 
+class BulkCreateBook(BaseBulkCreateView):
+    """Массовое добавление книг одним запросом"""
+
+    serializer_class = BulkBookSerializer
+    related_models = {
+        "publisher": Publisher,
+        "author": Author,
+        "genre": Genre,
+        "language": Language,
+    }
+    bulk_func = staticmethod(bulk_create_books)
+    max_items = settings.BULK_CREATE_MAX_ITEMS
+
+
+class ExportBook(APIView):
+    """
+    Потоковая выгрузка всего каталога книг
+    ?type=ndjson|csv - формат, ?since=<дата> - только измененные книги, ?compress=gzip - сжатие
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return export_response(request.query_params, export_stream)
+        except ValueError as error:
+            return Response(data={"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 class PutUpdateBook(BaseUpdate):
     """Полное обновление книги"""
 
@@ -185,3 +290,13 @@ class DetailBookView(BaseDetailView):
 
     serializer_class = BookSerializer
     model = Book
+    prefetch_related_fields = ("author", "genre", "language")
+
+
+class DatabasePoolStats(APIView):
+    """Состояние пулов соединений с базой данных текущего процесса (ожидание, занятые, сверх размера)"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(data=all_pool_stats(), status=status.HTTP_200_OK)
@@ -1,5 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.template.response import TemplateResponse
 from .models import *
+from .search import get_search_backend
+from .pagination import EstimatedCountPaginator
+from .bulk import bulk_update_books
+from .forms import FormReassignPublisher
 
 
 @admin.register(Book)
@@ -15,11 +21,55 @@ class BookAdmin(admin.ModelAdmin):
 
     display_authors.short_description = "авторы"
     list_display_links = ["title", "display_authors", "publisher"]
-    list_editable = ["show_book"]
+    list_select_related = ["publisher"]
     list_filter = ["year", "show_book"]
+    actions = ["show_books", "hide_books", "reassign_publisher"]  # вместо list_editable: одним UPDATE на все книги
     search_fields = ["title", "author__first_name", "author__last_name"]
     ordering = ["title", "year"]
     raw_id_fields = ["author", "publisher"]  # Поисковый виджет для этих полей вместо выпадающего списка
+    paginator = EstimatedCountPaginator  # Оценка количества книг вместо COUNT(*) на больших таблицах
+    show_full_result_count = False  # Без второго COUNT(*) по всей таблице при фильтрации
+
+    def get_queryset(self, request):
+        """Авторы всех книг страницы загружаются одним запросом (display_authors)"""
+        return super().get_queryset(request).prefetch_related("author")
+
+    @admin.action(description="Показать выбранные книги")
+    def show_books(self, request, queryset):
+        updated = bulk_update_books(queryset, show_book=True)
+        self.message_user(request, f"Показано книг: {updated}", messages.SUCCESS)
+
+    @admin.action(description="Скрыть выбранные книги")
+    def hide_books(self, request, queryset):
+        updated = bulk_update_books(queryset, show_book=False)
+        self.message_user(request, f"Скрыто книг: {updated}", messages.SUCCESS)
+
+    @admin.action(description="Сменить издательство выбранных книг")
+    def reassign_publisher(self, request, queryset):
+        """Сначала страница выбора издательства, после подтверждения(apply) - один UPDATE"""
+        form = FormReassignPublisher(request.POST if "apply" in request.POST else None, admin_site=self.admin_site)
+        if form.is_valid():
+            publisher = form.cleaned_data["publisher"]
+            updated = bulk_update_books(queryset, publisher=publisher)
+            self.message_user(request, f"Издательство {publisher} назначено книгам: {updated}", messages.SUCCESS)
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Смена издательства",
+            "opts": self.model._meta,
+            "form": form,
+            "action": "reassign_publisher",
+            "action_checkbox_name": ACTION_CHECKBOX_NAME,
+            "selected": request.POST.getlist(ACTION_CHECKBOX_NAME),
+            "select_across": request.POST.get("select_across", "0"),
+        }
+        return TemplateResponse(request, "admin/book_management/book/reassign_publisher.html", context)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск через полнотекстовый индекс вместо LIKE по названию и именам авторов"""
+        if not search_term:
+            return queryset, False
+        return get_search_backend().filter_queryset(queryset, search_term), False
 
 
 @admin.register(Author)
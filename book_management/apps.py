@@ -6,3 +6,7 @@ class BookManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'book_management'
     verbose_name = "Менеджер книг"
+
+    def ready(self):
+        """Подключает обработчики сигналов (profiling - обертка запросов новых соединений с базой)"""
+        from . import signals, profiling  # noqa: F401
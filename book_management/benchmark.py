@@ -0,0 +1,87 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+
+def percentile(values, pct):
+    """Перцентиль pct (0-100) отсортированного списка значений (метод ближайшего ранга)"""
+
+    if not values:
+        return 0.0
+    index = max(math.ceil(pct / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def summarize(latencies, elapsed, errors=0, **extra):
+    """Сводка по замерам в секундах: количество, ошибки, запросов в секунду, p50/p95/p99/max в миллисекундах"""
+
+    latencies = sorted(latencies)
+    summary = dict(extra)
+    summary.update({
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50": round(percentile(latencies, 50) * 1000, 2),
+        "p95": round(percentile(latencies, 95) * 1000, 2),
+        "p99": round(percentile(latencies, 99) * 1000, 2),
+        "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    })
+    return summary
+
+
+def http_benchmark(url, concurrency, total, timeout=30, headers=None, method="GET", data=None):
+    """
+    Отправляет total запросов(по умолчанию GET) на url, одновременно не больше concurrency
+    Клиент на потоках, поэтому одинаково нагружает синхронный(WSGI) и асинхронный(ASGI) сервер
+    Ответ с ошибкой(4xx, 5xx) и таймаут считаются в errors
+    """
+
+    def one_request(_):
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, data=data, headers=headers or {}, method=method), timeout=timeout) as response:
+                response.read()
+        except (URLError, OSError):
+            return None
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies = [result for result in results if result is not None]
+    return summarize(latencies, elapsed, errors=len(results) - len(latencies), concurrency=concurrency)
+
+
+def format_table(rows, columns):
+    """Текстовая таблица для вывода результатов в консоль"""
+
+    widths = {column: max([len(str(column))] + [len(str(row.get(column, ""))) for row in rows]) for column in columns}
+    lines = ["  ".join(str(column).rjust(widths[column]) for column in columns)]
+    for row in rows:
+        lines.append("  ".join(str(row.get(column, "")).rjust(widths[column]) for column in columns))
+    return "\n".join(lines)
+
+
+def compare_runs(previous, current, columns=("rps", "p50", "p95", "p99", "queries")):
+    """
+    Сравнение двух запусков(результаты в формате benchmark_catalog --output) по endpoint и конкурентности
+    Для каждой колонки - значение прошлого запуска, текущего и изменение в процентах
+    """
+
+    before = {(row["endpoint"], row["concurrency"]): row for row in previous}
+    rows = list()
+    for row in current:
+        old = before.get((row["endpoint"], row["concurrency"]))
+        if old is None:
+            continue
+        compared = {"endpoint": row["endpoint"], "concurrency": row["concurrency"]}
+        for column in columns:
+            old_value, new_value = old.get(column), row.get(column)
+            compared[f"{column}_before"], compared[column] = old_value, new_value
+            if old_value and new_value is not None:
+                compared[f"{column}_diff"] = f"{(new_value - old_value) / old_value * 100:+.1f}%"
+        rows.append(compared)
+    return rows
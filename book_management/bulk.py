@@ -0,0 +1,223 @@
+import csv
+import io
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Book, Author, Publisher, Genre, Language
+from .slugs import allocate_slugs
+from .signals import catalog_bulk_changed
+
+M2M_FIELDS = ("author", "genre", "language")
+# Столбцы строки книги в COPY: все NOT NULL столбцы Book (значения по умолчанию Django в базе не существуют)
+COPY_COLUMNS = ("id", "slug", "title", "publisher_id", "pages", "year", "show_book", "updated_at", "cover_variants")
+
+
+def existing_ids(model, ids):
+    """Какие из переданных id существуют (один запрос)"""
+
+    return set(model.objects.filter(pk__in=set(ids)).values_list("pk", flat=True))
+
+
+def bulk_create_books(rows, batch_size=1000):
+    """
+    Массовое создание книг в одной транзакции
+    rows - проверенные словари: title, publisher(id), author/genre/language(списки id), pages, year, show_book
+    Slug выделяются пачкой, книги и строки промежуточных таблиц author/genre/language пишутся через bulk_create
+    Возвращает список созданных книг
+    """
+
+    if not rows:
+        return []
+    with transaction.atomic():
+        slugs = allocate_slugs(Book, [row["title"] for row in rows])
+        books = [
+            Book(
+                title=row["title"], slug=slug, publisher_id=row["publisher"], pages=row.get("pages", 0),
+                year=row["year"], show_book=row.get("show_book", True)
+            )
+            for row, slug in zip(rows, slugs)
+        ]
+        Book.objects.bulk_create(books, batch_size=batch_size)
+        for field in M2M_FIELDS:
+            through = getattr(Book, field).through
+            links = [
+                through(**{"book_id": book.pk, f"{field}_id": pk})
+                for book, row in zip(books, rows) for pk in dict.fromkeys(row[field])
+            ]
+            through.objects.bulk_create(links, batch_size=batch_size)
+        catalog_bulk_changed(
+            [book.pk for book in books],
+            publisher_ids=[row["publisher"] for row in rows],
+            author_ids=[pk for row in rows for pk in row["author"]],
+            genre_ids=[pk for row in rows for pk in row["genre"]],
+            language_ids=[pk for row in rows for pk in row["language"]],
+        )
+    return books
+
+
+def copy_books(rows):
+    """
+    Массовое создание книг через COPY (PostgreSQL), на остальных базах - bulk_create_books
+    id книг резервируются заранее из последовательности, чтобы сразу записать строки промежуточных таблиц
+    Возвращает список id созданных книг
+    """
+
+    if connection.vendor != "postgresql":
+        return [book.pk for book in bulk_create_books(rows)]
+    if not rows:
+        return []
+    table = Book._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", [table, len(rows)]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        slugs = allocate_slugs(Book, [row["title"] for row in rows])
+        now = timezone.now().isoformat()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for pk, slug, row in zip(ids, slugs, rows):
+            writer.writerow([
+                pk, slug, row["title"], row["publisher"], row.get("pages", 0), row["year"],
+                "t" if row.get("show_book", True) else "f", now, "{}"
+            ])
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH CSV", buffer)
+        for field in M2M_FIELDS:
+            through = getattr(Book, field).through
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for pk, row in zip(ids, rows):
+                for related_pk in dict.fromkeys(row[field]):
+                    writer.writerow([pk, related_pk])
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {through._meta.db_table} (book_id, {field}_id) FROM STDIN WITH CSV", buffer)
+        catalog_bulk_changed(
+            ids,
+            publisher_ids=[row["publisher"] for row in rows],
+            author_ids=[pk for row in rows for pk in row["author"]],
+            genre_ids=[pk for row in rows for pk in row["genre"]],
+            language_ids=[pk for row in rows for pk in row["language"]],
+        )
+    return ids
+
+
+def bulk_update_books(queryset, **values):
+    """
+    Изменяет поля книг queryset одним UPDATE без save(): без выделения slug и сигналов на каждую книгу
+    Поисковые документы, строки списка книг, кэш и версия каталога обновляются одним вызовом catalog_bulk_changed
+    Возвращает количество измененных книг
+    """
+
+    with transaction.atomic():
+        rows = list(queryset.order_by().values_list("pk", "publisher_id"))
+        if not rows:
+            return 0
+        book_ids = [pk for pk, _ in rows]
+        publisher_ids = {publisher_id for _, publisher_id in rows}
+        if "publisher" in values:
+            publisher_ids.add(values["publisher"].pk)
+        updated = Book.objects.filter(pk__in=queryset.values("pk")).update(updated_at=timezone.now(), **values)
+        related = {
+            f"{field}_ids": getattr(Book, field).through.objects.filter(book_id__in=book_ids).values_list(
+                f"{field}_id", flat=True
+            )
+            for field in M2M_FIELDS
+        }
+        catalog_bulk_changed(book_ids, publisher_ids=publisher_ids, **related)
+    return updated
+
+
+class CatalogLookup:
+    """
+    Кэш в памяти: имя автора(издательства, жанра, языка) -> id
+    Отсутствующие в кэше имена ищутся в базе пачкой, не найденные создаются через bulk_create
+    """
+
+    def __init__(self, query_batch=500):
+        self.query_batch = query_batch
+        self.publishers = dict()
+        self.authors = dict()
+        self.genres = dict()
+        self.languages = dict()
+
+    def resolve(self, records):
+        """
+        Заменяет имена в записях на id
+        records - словари с title, publisher, authors, genres, languages (имена), pages, year
+        Возвращает словари в формате bulk_create_books
+        """
+
+        self._resolve_titles(Publisher, self.publishers, {record["publisher"] for record in records})
+        self._resolve_titles(Genre, self.genres, {name for record in records for name in record["genres"]})
+        self._resolve_titles(Language, self.languages, {name for record in records for name in record["languages"]})
+        self._resolve_authors({name for record in records for name in record["authors"]})
+        return [
+            {
+                "title": record["title"],
+                "publisher": self.publishers[title_key(Publisher, record["publisher"])],
+                "author": [self.authors[split_author(name)] for name in record["authors"]],
+                "genre": [self.genres[title_key(Genre, name)] for name in record["genres"]],
+                "language": [self.languages[title_key(Language, name)] for name in record["languages"]],
+                "pages": record.get("pages", 0),
+                "year": record["year"],
+            }
+            for record in records
+        ]
+
+    def _batches(self, values):
+        values = list(values)
+        for idx in range(0, len(values), self.query_batch):
+            yield values[idx:idx + self.query_batch]
+
+    def _resolve_titles(self, model, cache, names):
+        """Издательства, жанры и языки ищутся по уникальному title"""
+
+        missing = {title_key(model, name) for name in names} - set(cache)
+        for batch in self._batches(missing):
+            cache.update(model.objects.filter(title__in=batch).values_list("title", "pk"))
+        missing = [name for name in missing if name not in cache]
+        if not missing:
+            return
+        objects = [model(title=name, slug=slug) for name, slug in zip(missing, allocate_slugs(model, missing))]
+        if model is Publisher:
+            for obj in objects:  # email уникален, у импортированного издательства его нет
+                obj.address = ""
+                obj.email_address = f"{obj.slug}@import.invalid"
+        model.objects.bulk_create(objects)
+        cache.update((obj.title, obj.pk) for obj in objects)
+
+    def _resolve_authors(self, names):
+        """Авторы ищутся по паре (имя, фамилия)"""
+
+        missing = {split_author(name) for name in names} - set(self.authors)
+        for batch in self._batches(missing):
+            condition = Q()
+            for first_name, last_name in batch:
+                condition |= Q(first_name=first_name, last_name=last_name)
+            for first_name, last_name, pk in Author.objects.filter(condition).values_list(
+                    "first_name", "last_name", "pk"):
+                self.authors[(first_name, last_name)] = pk
+        missing = [name for name in missing if name not in self.authors]
+        if not missing:
+            return
+        slugs = allocate_slugs(Author, [first_name for first_name, last_name in missing])
+        objects = [
+            Author(first_name=first_name, last_name=last_name, slug=slug)
+            for (first_name, last_name), slug in zip(missing, slugs)
+        ]
+        Author.objects.bulk_create(objects)
+        self.authors.update(((obj.first_name, obj.last_name), obj.pk) for obj in objects)
+
+
+def title_key(model, name):
+    """Название, обрезанное до длины поля title модели (так оно хранится в базе и в кэше CatalogLookup)"""
+
+    return name[:model._meta.get_field("title").max_length]
+
+
+def split_author(name):
+    """'Имя Фамилия' -> (имя, фамилия) с учетом длины полей модели Author"""
+
+    first_name, _, last_name = name.strip().partition(" ")
+    return first_name[:70], last_name.strip()[:100]
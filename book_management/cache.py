@@ -0,0 +1,164 @@
+import hashlib
+import re
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from .metrics import cache_access
+
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = r"\g<1>__csrf_token__\g<2>"
+
+
+def get_cache():
+    """Кэш каталога (по умолчанию файловый, общий для воркеров - Redis не нужен)"""
+
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _tag_key(tag):
+    return f"catalog:tag:{tag}"
+
+
+def response_cache_key(request):
+    """Ключ кэша страницы: путь вместе с параметрами запроса (page, cursor)"""
+
+    digest = hashlib.md5(request.get_full_path().encode("utf-8")).hexdigest()
+    return f"catalog:page:{digest}"
+
+
+def invalidate_tags(*tags):
+    """
+    Инвалидирует все записи, помеченные этими тегами
+    Версия тега просто удаляется: запись с отсутствующей версией тега считается устаревшей,
+    поэтому вытеснение тегов из кэша тоже безопасно
+    """
+
+    tags = {tag for tag in tags if tag}
+    if tags:
+        get_cache().delete_many([_tag_key(tag) for tag in tags])
+
+
+def _current_versions(cache, tags):
+    """Текущие версии тегов, отсутствующие теги получают новую версию"""
+
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = cache.get_many(list(keys))
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_cached_response(request):
+    """Возвращает HttpResponse из кэша или None, если записи нет или один из ее тегов инвалидирован"""
+
+    cache = get_cache()
+    entry = cache.get(response_cache_key(request))
+    if entry is None:
+        cache_access("page", hit=False)
+        return None
+    current = cache.get_many([_tag_key(tag) for tag in entry["tags"]])
+    for tag, version in entry["tags"].items():
+        if current.get(_tag_key(tag)) != version:
+            cache_access("page", hit=False)
+            return None
+    cache_access("page", hit=True)
+    content = entry["content"].replace("__csrf_token__", get_token(request))
+    response = HttpResponse(content, content_type=entry["content_type"])
+    response["X-Cache"] = "HIT"
+    return response
+
+
+def set_cached_response(request, response, tags, timeout=None):
+    """Сохраняет отрисованный ответ с тегами, CSRF токены заменяются заглушкой и подставляются при выдаче"""
+
+    cache = get_cache()
+    content = CSRF_INPUT_RE.sub(CSRF_PLACEHOLDER, response.content.decode(response.charset))
+    entry = {
+        "content": content,
+        "content_type": response["Content-Type"],
+        "tags": _current_versions(cache, set(tags)),
+    }
+    timeout = settings.CATALOG_CACHE_TIMEOUT if timeout is None else timeout
+    cache.set(response_cache_key(request), entry, timeout=timeout)
+    response["X-Cache"] = "MISS"
+
+
+def fragment_key(name, pk):
+    return f"catalog:fragment:{name}:{pk}"
+
+
+def get_fragments(name, pks):
+    """
+    Фрагменты шаблона name для объектов pks за два обращения к кэшу: записи и версии всех их тегов
+    Возвращает {pk: content} только для записей, ни один тег которых не инвалидирован
+    """
+
+    cache = get_cache()
+    keys = {fragment_key(name, pk): pk for pk in pks}
+    entries = cache.get_many(list(keys))
+    tag_keys = {_tag_key(tag) for entry in entries.values() for tag in entry["tags"]}
+    current = cache.get_many(list(tag_keys)) if tag_keys else dict()
+    return {
+        keys[key]: entry["content"] for key, entry in entries.items()
+        if all(current.get(_tag_key(tag)) == version for tag, version in entry["tags"].items())
+    }
+
+
+def set_fragment(name, pk, content, tags, timeout=None):
+    """Сохраняет отрисованный фрагмент с тегами (CSRF токены, как и у страниц, заменяются заглушкой)"""
+
+    cache = get_cache()
+    entry = {"content": CSRF_INPUT_RE.sub(CSRF_PLACEHOLDER, content), "tags": _current_versions(cache, set(tags))}
+    timeout = settings.CATALOG_CACHE_TIMEOUT if timeout is None else timeout
+    cache.set(fragment_key(name, pk), entry, timeout=timeout)
+
+
+def book_row_tags(book):
+    """Теги строки книги в списке: сама книга, ее издательство, жанры и авторы (берутся из prefetch)"""
+
+    tags = [f"book:{book.pk}", f"publisher:{book.publisher.slug}"]
+    tags.extend(f"genre:{genre.slug}" for genre in book.genre.all())
+    tags.extend(f"author:{author.slug}" for author in book.author.all())
+    return tags
+
+
+def listing_row_tags(listing):
+    """Теги строки списка книг BookListing (те же, что у book_row_tags, но без обращения к связям)"""
+
+    tags = [f"book:{listing.book_id}", f"publisher:{listing.publisher_slug}"]
+    tags.extend(f"genre:{genre['slug']}" for genre in listing.genres)
+    tags.extend(f"author:{author['slug']}" for author in listing.authors)
+    return tags
+
+
+def book_detail_tags(book):
+    """Теги страницы книги: сама книга(в том числе обложка), издательство, авторы и языки (берутся из prefetch)"""
+
+    tags = [f"book:{book.pk}", f"publisher:{book.publisher.slug}"]
+    tags.extend(f"author:{author.slug}" for author in book.author.all())
+    tags.extend(f"language:{language.slug}" for language in book.language.all())
+    return tags
+
+
+def book_tags(book):
+    """
+    Теги списков, в которых книга есть или появится: все книги, книги ее авторов, жанров, языков, издательства
+    Тег списка books:<модель>:<slug> отличается от тега показа <модель>:<slug>: новая книга издательства
+    меняет только список книг издательства, но не страницы, где название издательства просто выводится
+    """
+
+    tags = ["books", f"book:{book.pk}"]
+    if book.pk is None:
+        return tags
+    tags.extend(f"books:publisher:{slug}" for slug in type(book).objects.filter(pk=book.pk).values_list(
+        "publisher__slug", flat=True))
+    tags.extend(f"books:genre:{slug}" for slug in book.genre.values_list("slug", flat=True))
+    tags.extend(f"books:author:{slug}" for slug in book.author.values_list("slug", flat=True))
+    tags.extend(f"books:language:{slug}" for slug in book.language.values_list("slug", flat=True))
+    return tags
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .cache import invalidate_tags
+from .images import render_cover_variants
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "thumbs"
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+
+_lock = threading.Lock()
+_executors = dict()
+
+
+def _get_executors():
+    """
+    Пулы создаются лениво в каждом процессе веб-сервера
+    Поток читает и сохраняет файлы, а сама обработка изображения идет в пуле процессов
+    """
+
+    with _lock:
+        if not _executors:
+            _executors["threads"] = ThreadPoolExecutor(max_workers=settings.COVER_WORKERS)
+            _executors["processes"] = ProcessPoolExecutor(max_workers=settings.COVER_WORKERS)
+        return _executors["threads"], _executors["processes"]
+
+
+def variant_name(cover_name, fmt, width, height):
+    """Путь уменьшенной копии обложки в хранилище"""
+
+    root, _ = os.path.splitext(cover_name)
+    return os.path.join(VARIANTS_DIR, f"{root}_{width}x{height}.{EXTENSIONS[fmt]}")
+
+
+def schedule_cover_variants(book):
+    """
+    Ставит обработку обложки в очередь после фиксации транзакции, если обложка изменилась
+    Пока копии не готовы, thumbnail_url и srcset отдают оригинал
+    """
+
+    name = book.cover.name if book.cover else ""
+    if name == (book.cover_variants or {}).get("source", ""):
+        return
+    if not name:
+        type(book).objects.filter(pk=book.pk).update(cover_variants={})
+        book.cover_variants = {}
+        return
+    pk = book.pk
+    transaction.on_commit(lambda: submit_cover_variants(pk, name))
+
+
+def submit_cover_variants(pk, name):
+    """Запускает обработку в фоне, при COVER_WORKERS = 0 - сразу в текущем потоке"""
+
+    if not settings.COVER_WORKERS:
+        process_cover(pk, name)
+        return
+    threads, _ = _get_executors()
+    threads.submit(_process_cover_in_thread, pk, name)
+
+
+def _process_cover_in_thread(pk, name):
+    try:
+        process_cover(pk, name)
+    finally:
+        connection.close()  # у фонового потока свое соединение с базой данных
+
+
+def process_cover(pk, name):
+    """Строит и сохраняет копии обложки name книги pk и записывает их пути в Book.cover_variants"""
+
+    from .models import Book
+    from .versioning import bump_catalog_version
+
+    sizes = [tuple(size) for size in settings.COVER_SIZES]
+    paths = {
+        (fmt, width, height): variant_name(name, fmt, width, height) for fmt in EXTENSIONS for width, height in sizes
+    }
+    variants = {"source": name}
+    if all(default_storage.exists(path) for path in paths.values()):
+        # обложка хранится по хэшу содержимого: копии уже построены для другой книги с тем же файлом
+        for (fmt, width, height), path in paths.items():
+            variants.setdefault(fmt, dict())[f"{width}x{height}"] = path
+    else:
+        try:
+            with default_storage.open(name, "rb") as file:
+                data = file.read()
+            if settings.COVER_WORKERS:
+                _, processes = _get_executors()
+                rendered = processes.submit(render_cover_variants, data, sizes).result()
+            else:
+                rendered = render_cover_variants(data, sizes)
+        except Exception:
+            logger.exception("Не удалось обработать обложку %s книги %s", name, pk)
+            return
+        for key, content in rendered.items():
+            fmt, width, height = key
+            if default_storage.exists(paths[key]):
+                default_storage.delete(paths[key])
+            saved = default_storage.save(paths[key], ContentFile(content))
+            variants.setdefault(fmt, dict())[f"{width}x{height}"] = saved
+    # обложку могли заменить, пока шла обработка: тогда копии старой обложки не записываются
+    if Book.objects.filter(pk=pk, cover=name).update(cover_variants=variants):
+        invalidate_tags(f"book:{pk}")
+        bump_catalog_version()
+
+
+def thumbnail_url(book, fmt="jpeg"):
+    """Адрес самой маленькой копии обложки или оригинала, если копий еще нет"""
+
+    if not book.cover:
+        return None
+    variants = (book.cover_variants or {}).get(fmt)
+    width, height = settings.COVER_SIZES[0]
+    path = (variants or {}).get(f"{width}x{height}")
+    if not path or book.cover_variants.get("source") != book.cover.name:
+        return book.cover.url
+    return default_storage.url(path)
+
+
+def srcset(book, fmt="webp"):
+    """Значение атрибута srcset по всем копиям обложки, пустая строка - если копий еще нет"""
+
+    if not book.cover:
+        return ""
+    variants = (book.cover_variants or {}).get(fmt)
+    if not variants or book.cover_variants.get("source") != book.cover.name:
+        return ""
+    return ", ".join(
+        f"{default_storage.url(variants[f'{width}x{height}'])} {width}w"
+        for width, height in settings.COVER_SIZES if f"{width}x{height}" in variants
+    )
+
+
+def change_cover_refs(added=(), removed=()):
+    """Увеличивает счетчики ссылок на файлы обложек added и уменьшает на removed"""
+
+    from .models import CoverBlob
+
+    now = timezone.now()
+    for name in filter(None, added):
+        blob, _ = CoverBlob.objects.get_or_create(name=name, defaults={"size": _file_size(name)})
+        CoverBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") + 1, updated_at=now)
+    for name in filter(None, removed):
+        CoverBlob.objects.filter(name=name).update(refcount=F("refcount") - 1, updated_at=now)
+
+
+def _file_size(name):
+    try:
+        return default_storage.size(name)
+    except OSError:
+        return 0
+
+
+def variant_paths(name):
+    """Все возможные пути копий обложки name для текущих COVER_SIZES"""
+
+    return [variant_name(name, fmt, width, height) for fmt in EXTENSIONS for width, height in settings.COVER_SIZES]
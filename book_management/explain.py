@@ -0,0 +1,104 @@
+import re
+
+SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(?P<index> USING (?:COVERING )?INDEX \w+| VIRTUAL TABLE INDEX)?")
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+CAST_RE = re.compile(r"::\"?\w+\"?(?: varying| with(?:out)? time zone)?(?:\[\])?")
+IDENTIFIER_RE = re.compile(r"(?<![\w.])(?:\w+\.)?\"?([a-z_]\w*)\b\"?(?!\s*\()")
+KEYWORDS = {"and", "or", "not", "is", "null", "true", "false", "any", "all", "in", "like", "ilike", "between"}
+SORT_COLUMN_RE = re.compile(r"(?:\w+\.)?\"?(\w+)\"?(?:\s+DESC)?$")
+
+
+def is_select(sql):
+    return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+def filter_columns(condition):
+    """Столбцы из условия фильтра плана PostgreSQL: (show_book AND (year = 2000)) -> [show_book, year]"""
+
+    if not condition:
+        return []
+    condition = CAST_RE.sub("", LITERAL_RE.sub("?", condition))
+    columns = [column for column in IDENTIFIER_RE.findall(condition) if column.lower() not in KEYWORDS]
+    return list(dict.fromkeys(columns))
+
+
+def _walk(node, parent=None):
+    yield node, parent
+    for child in node.get("Plans", ()):
+        yield from _walk(child, node)
+
+
+def postgresql_findings(plan):
+    """
+    Последовательные чтения и сортировки без индекса из плана EXPLAIN (FORMAT JSON)
+    Для Seq Scan предлагаются столбцы индекса: сначала столбцы фильтра, затем ключи сортировки над ним
+    """
+
+    findings = list()
+    for node, parent in _walk(plan):
+        if node["Node Type"] != "Seq Scan":
+            continue
+        sort_keys = list()
+        if parent is not None and parent["Node Type"] in ("Sort", "Incremental Sort"):
+            sort_keys = [match.group(1) for key in parent.get("Sort Key", ()) if (match := SORT_COLUMN_RE.search(key))]
+        columns = filter_columns(node.get("Filter"))
+        findings.append({
+            "table": node["Relation Name"],
+            "rows": int(node.get("Plan Rows", 0)),
+            "filter": node.get("Filter", ""),
+            "sort": ", ".join(parent.get("Sort Key", ())) if sort_keys else "",
+            "columns": list(dict.fromkeys(columns + sort_keys)),
+        })
+    return findings
+
+
+def sqlite_findings(rows):
+    """Последовательные чтения из EXPLAIN QUERY PLAN (SQLite): SCAN таблицы без индекса(обычного или FTS5)"""
+
+    findings = list()
+    sort = any(detail.startswith("USE TEMP B-TREE FOR ORDER BY") for *_, detail in rows)
+    for *_, detail in rows:
+        match = SCAN_RE.match(detail)
+        if match and not match.group("index"):
+            findings.append({
+                "table": match.group(1), "rows": None, "filter": "", "sort": "ORDER BY" if sort else "", "columns": [],
+            })
+    return findings
+
+
+def explain(connection, sql, params):
+    """Последовательные чтения таблиц в плане запроса (PostgreSQL и SQLite, для остальных баз - пустой список)"""
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            return postgresql_findings(cursor.fetchone()[0][0]["Plan"])
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return sqlite_findings(cursor.fetchall())
+    return []
+
+
+def table_rows(connection, table):
+    """Количество строк таблицы: оценка планировщика для PostgreSQL, COUNT(*) для остальных баз"""
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            return max(row[0], 0) if row else 0
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+def covering_index(connection, table, columns):
+    """Имя существующего индекса, который начинается с этих столбцов, или None"""
+
+    if not columns:
+        return None
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for name, constraint in constraints.items():
+        if constraint["index"] and constraint["columns"][:len(columns)] == columns:
+            return name
+    return None
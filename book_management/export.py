@@ -0,0 +1,194 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Book
+
+EXPORT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CSV_COLUMNS = [
+    "id", "slug", "title", "authors", "publisher", "genres", "languages", "pages", "year", "show_book", "updated_at"
+]
+LIST_SEPARATOR = "|"  # как в import_catalog, чтобы выгрузку CSV можно было загрузить обратно
+BUFFER_SIZE = 64 * 1024
+
+
+def parse_since(value):
+    """Разбирает дату или дату со временем в ISO формате, при ошибке возбуждает ValueError"""
+
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Некорректная дата: {value}")
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(since=None):
+    """
+    Книги для выгрузки в порядке id
+    since - только книги, измененные после этой даты, в том числе через переименование автора, жанра и т.д.
+    """
+
+    queryset = Book.objects.order_by("pk").select_related("publisher").prefetch_related("author", "genre", "language")
+    if since is not None:
+        queryset = queryset.filter(
+            Q(updated_at__gte=since) | Q(publisher__updated_at__gte=since) | Q(author__updated_at__gte=since)
+            | Q(genre__updated_at__gte=since) | Q(language__updated_at__gte=since)
+        ).distinct()
+    return queryset
+
+
+def export_row(book):
+    """Книга для выгрузки как словарь (связи должны быть загружены через prefetch_related)"""
+
+    return {
+        "id": book.pk,
+        "slug": book.slug,
+        "title": book.title,
+        "authors": [
+            {"id": author.pk, "first_name": author.first_name, "last_name": author.last_name}
+            for author in book.author.all()
+        ],
+        "publisher": {"id": book.publisher_id, "title": book.publisher.title},
+        "genres": [genre.title for genre in book.genre.all()],
+        "languages": [language.title for language in book.language.all()],
+        "pages": book.pages,
+        "year": book.year,
+        "show_book": book.show_book,
+        "cover": book.cover.name or None,
+        "updated_at": book.updated_at.isoformat(),
+    }
+
+
+def export_rows(since=None, chunk_size=None):
+    """
+    Построчно отдает книги как словари
+    iterator(chunk_size) загружает книги пачками и делает prefetch связей на каждую пачку,
+    поэтому потребление памяти не зависит от размера каталога
+    """
+
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    for book in export_queryset(since).iterator(chunk_size=chunk_size):
+        yield export_row(book)
+
+
+def export_chunk(since, after, chunk_size):
+    """Пачка из chunk_size книг с id больше after как словари (для асинхронной выгрузки)"""
+
+    return [export_row(book) for book in export_queryset(since).filter(pk__gt=after)[:chunk_size]]
+
+
+def ndjson_lines(rows):
+    """Одна книга - одна строка JSON"""
+
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows, header=True):
+    """CSV с заголовком(header), списки записываются через LIST_SEPARATOR"""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    for row in rows:
+        writer.writerow([
+            row["id"], row["slug"], row["title"],
+            LIST_SEPARATOR.join(f"{author['first_name']} {author['last_name']}".strip() for author in row["authors"]),
+            row["publisher"]["title"], LIST_SEPARATOR.join(row["genres"]), LIST_SEPARATOR.join(row["languages"]),
+            row["pages"], row["year"], row["show_book"], row["updated_at"],
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Склеивает строки в куски по size символов и кодирует в utf-8"""
+
+    parts = list()
+    length = 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(parts).encode("utf-8")
+            parts = list()
+            length = 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+def gzip_stream(chunks):
+    """Сжимает поток байтов в формат gzip по мере генерации"""
+
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(export_type="ndjson", since=None, compress=False, chunk_size=None):
+    """Поток байтов выгрузки каталога в формате export_type (ndjson или csv)"""
+
+    lines = csv_lines if export_type == "csv" else ndjson_lines
+    stream = buffered(lines(export_rows(since, chunk_size)))
+    return gzip_stream(stream) if compress else stream
+
+
+async def aexport_chunks(export_type="ndjson", since=None, chunk_size=None):
+    """
+    Куски байтов выгрузки для асинхронного StreamingHttpResponse
+    Каждая пачка книг загружается через sync_to_async по ключу(id больше последнего), курсор между пачками
+    не держится, и в памяти одновременно только одна пачка
+    """
+
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    after = None
+    while True:
+        rows = await sync_to_async(export_chunk)(since, after or 0, chunk_size)
+        if export_type == "csv":
+            lines = csv_lines(rows, header=after is None)
+        else:
+            lines = ndjson_lines(rows)
+        for chunk in buffered(lines):
+            yield chunk
+        if len(rows) < chunk_size:
+            break
+        after = rows[-1]["id"]
+
+
+async def agzip_stream(chunks):
+    """Асинхронный вариант gzip_stream"""
+
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def aexport_stream(export_type="ndjson", since=None, compress=False, chunk_size=None):
+    """Асинхронный поток байтов выгрузки каталога (ASGI), содержимое то же, что у export_stream"""
+
+    stream = aexport_chunks(export_type, since, chunk_size)
+    return agzip_stream(stream) if compress else stream
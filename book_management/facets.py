@@ -0,0 +1,287 @@
+import threading
+from array import array
+from collections import OrderedDict
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .metrics import cache_access
+from .models import BookListing
+from .versioning import get_catalog_version
+
+FACETS = ("genre", "language", "publisher", "year")
+LIST_FACETS = ("genre", "language", "publisher")
+FACET_TITLES = {"genre": "Жанр", "language": "Язык", "publisher": "Издательство", "year": "Год издания"}
+
+
+def parse_facet_filters(params):
+    """
+    Фильтры из параметров запроса: ?genre=a&genre=b&language=c&publisher=d&year_min=1900&year_max=2000
+    Несколько значений одного фасета объединяются через ИЛИ, разные фасеты - через И
+    Возвращает {фасет: кортеж значений, "year_min": int | None, "year_max": int | None}
+    """
+
+    filters = {facet: tuple(sorted(set(value for value in params.getlist(facet) if value))) for facet in LIST_FACETS}
+    for name in ("year_min", "year_max"):
+        value = params.get(name)
+        try:
+            filters[name] = int(value) if value not in (None, "") else None
+        except ValueError:
+            raise ValueError(f"{name} должен быть числом")
+    return filters
+
+
+def filters_key(filters):
+    """Ключ набора фильтров для кэша"""
+
+    return tuple((name, filters.get(name)) for name in (*LIST_FACETS, "year_min", "year_max"))
+
+
+class FacetIndex:
+    """
+    Фасетный индекс видимых книг в памяти процесса
+    Книги пронумерованы в порядке (title, id), для каждого значения фасета хранятся номера его книг
+    (array) и, если значение встречается достаточно часто, битовая карта(int, бит N - книга N)
+    Фильтр - пересечение битовых карт, количество - bit_count(), страница результатов - позиции единичных бит,
+    поэтому ни один запрос не выполняет GROUP BY по базе данных
+    """
+
+    def __init__(self, version, book_ids, positions, titles):
+        self.version = version
+        self.book_ids = book_ids
+        self.size = len(book_ids)
+        self.positions = positions  # {фасет: {значение: array номеров книг}}
+        self.titles = titles  # {фасет: {значение: название}}
+        self.all = (1 << self.size) - 1
+        self._bitmaps = dict()
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version):
+        """
+        Строит индекс по строкам списка книг (BookListing) одним запросом
+        Строки читаются с основной базы: версия каталога берется с нее, отстающая реплика не должна попасть в индекс
+        """
+
+        book_ids = array("q")
+        positions = {facet: dict() for facet in FACETS}
+        titles = {facet: dict() for facet in FACETS}
+        rows = BookListing.objects.using(DEFAULT_DB_ALIAS).filter(show_book=True).order_by("title", "book_id")
+        rows = rows.values_list(
+            "book_id", "year", "publisher_slug", "publisher_title", "genres", "languages"
+        )
+        for position, (book_id, year, publisher_slug, publisher_title, genres, languages) in enumerate(
+                rows.iterator(chunk_size=5000)):
+            book_ids.append(book_id)
+            values = [("year", year, str(year)), ("publisher", publisher_slug, publisher_title)]
+            values.extend(("genre", item["slug"], item["title"]) for item in genres)
+            values.extend(("language", item["slug"], item["title"]) for item in languages)
+            for facet, value, title in values:
+                positions[facet].setdefault(value, array("I")).append(position)
+                titles[facet][value] = title
+        return cls(version, book_ids, positions, titles)
+
+    def _from_positions(self, positions):
+        bits = bytearray((self.size + 7) // 8)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, "little")
+
+    def bitmap(self, facet, value):
+        """
+        Битовая карта значения фасета
+        Для частых значений(не реже одной книги из 64) карта хранится, для редких строится при обращении:
+        хранить int размером во весь каталог для издательства с парой книг слишком дорого
+        """
+
+        key = (facet, value)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            positions = self.positions[facet].get(value, ())
+            bitmap = self._from_positions(positions)
+            if len(positions) * 64 >= self.size:
+                self._bitmaps[key] = bitmap
+        return bitmap
+
+    def facet_values(self, facet, filters):
+        """Значения фасета, выбранные фильтрами (для года - все годы из диапазона)"""
+
+        if facet != "year":
+            return filters.get(facet) or ()
+        year_min, year_max = filters.get("year_min"), filters.get("year_max")
+        if year_min is None and year_max is None:
+            return ()
+        return [year for year in self.positions["year"] if
+                (year_min is None or year >= year_min) and (year_max is None or year <= year_max)] or [None]
+
+    def select(self, filters, exclude=None):
+        """Битовая карта книг, подходящих под фильтры (exclude - фасет, фильтр которого не учитывается)"""
+
+        result = self.all
+        for facet in FACETS:
+            values = self.facet_values(facet, filters)
+            if facet == exclude or not values:
+                continue
+            selected = 0
+            for value in values:
+                if value is not None:
+                    selected |= self.bitmap(facet, value)
+            result &= selected
+        return result
+
+    def _count_values(self, facet, base):
+        """Количество книг каждого значения фасета среди base (только ненулевые)"""
+
+        counts = dict()
+        base_bytes = None if base == self.all else base.to_bytes((self.size + 7) // 8, "little")
+        for value, positions in self.positions[facet].items():
+            if base_bytes is None:
+                count = len(positions)
+            elif (facet, value) in self._bitmaps:
+                count = (base & self._bitmaps[facet, value]).bit_count()
+            else:
+                count = sum(base_bytes[position >> 3] >> (position & 7) & 1 for position in positions)
+            if count:
+                counts[value] = count
+        return counts
+
+    def counts(self, filters):
+        """
+        Количество книг по значениям каждого фасета для текущих фильтров
+        Фильтр самого фасета при подсчете не учитывается: видно, сколько книг даст выбор другого жанра(года...)
+        Результат кэшируется для набора фильтров, пока не изменится версия каталога
+        """
+
+        key = filters_key(filters)
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                cache_access("facet_counts", hit=True)
+                return self._counts[key]
+        cache_access("facet_counts", hit=False)
+        counts = {facet: self._count_values(facet, self.select(filters, exclude=facet)) for facet in FACETS}
+        with self._lock:
+            self._counts[key] = counts
+            while len(self._counts) > settings.FACET_CACHE_SIZE:
+                self._counts.popitem(last=False)
+        return counts
+
+    def book_ids_at(self, bitmap, start, stop):
+        """id книг с номерами единичных бит карты с start по stop (в порядке title, id)"""
+
+        bits = bin(bitmap)[:1:-1]  # младший бит - первый символ
+        chunk = 4096
+        index = skipped = 0
+        while index < len(bits):
+            ones = bits.count("1", index, index + chunk)
+            if skipped + ones > start:
+                break
+            skipped += ones
+            index += chunk
+        found = list()
+        position = index - 1
+        while len(found) < stop - start:
+            position = bits.find("1", position + 1)
+            if position < 0:
+                break
+            if skipped < start:
+                skipped += 1
+                continue
+            found.append(self.book_ids[position])
+        return found
+
+    def facets_data(self, filters):
+        """
+        Фасеты для ответа: {фасет: [{value, title, count, selected}]}
+        Для каждого фасета - не больше FACET_MAX_VALUES самых частых значений, выбранные(кроме лет) показываются всегда
+        """
+
+        data = dict()
+        for facet, counts in self.counts(filters).items():
+            selected = set(self.facet_values(facet, filters))
+            values = sorted(counts, key=lambda value: -counts[value])[:settings.FACET_MAX_VALUES]
+            if facet != "year":  # годы диапазона без книг не показываются
+                values = set(values) | {value for value in selected if value in self.titles[facet]}
+            items = [
+                {"value": value, "title": self.titles[facet][value], "count": counts.get(value, 0),
+                 "selected": value in selected}
+                for value in values
+            ]
+            items.sort(key=lambda item: item["value"] if facet == "year" else item["title"])
+            data[facet] = items
+        return data
+
+
+_index = None
+_index_lock = threading.Lock()
+_building = None  # версия, для которой индекс строится в фоне
+
+
+def _build_index(version):
+    """Строит индекс в фоновом потоке и подменяет им прежний"""
+
+    global _index, _building
+    try:
+        index = FacetIndex.build(version)
+        with _index_lock:
+            _index = index
+    finally:
+        with _index_lock:
+            _building = None
+        connections.close_all()  # соединения этого потока
+
+
+def get_facet_index():
+    """
+    Фасетный индекс для текущей версии каталога
+    Любое изменение каталога меняет его версию(versioning.py), и индекс перестраивается при следующем обращении
+    Первый индекс процесса строится сразу, следующие(FACET_INDEX_BACKGROUND) - в фоновом потоке, а запросы
+    до его готовности получают прежний индекс: запись в каталог не добавляет полный проход по BookListing
+    к времени ответа. Книги страницы загружаются из базы queryset'ом FacetResults, поэтому он должен отбирать только
+    видимые книги(show_book=True): тогда удаленные и скрытые после построения индекса на страницу не попадут
+    """
+
+    global _index, _building
+    version = get_catalog_version()  # (версия, дата изменения): после восстановления базы номер версии может повториться
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or not settings.FACET_INDEX_BACKGROUND:
+                if _index is None or _index.version != version:
+                    _index = FacetIndex.build(version)
+            elif _index.version != version and _building is None:
+                _building = version
+                threading.Thread(target=_build_index, args=(version,), name="facet-index", daemon=True).start()
+            index = _index
+    return index
+
+
+class FacetResults:
+    """
+    Ленивый результат фасетного фильтра для Paginator (как SearchResults)
+    Количество берется из битовой карты, строки загружаются из queryset только для запрошенной страницы
+    queryset - только видимые книги: индекс может быть построен до того, как книгу скрыли
+    """
+
+    def __init__(self, filters, queryset, index=None):
+        self.filters = filters
+        self.queryset = queryset
+        self.index = index or get_facet_index()
+        self.bitmap = self.index.select(filters)
+
+    def count(self):
+        return self.bitmap.bit_count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = item.stop if item.stop is not None else self.count()
+        ids = self.index.book_ids_at(self.bitmap, start, stop)
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    def facets(self):
+        return self.index.facets_data(self.filters)
@@ -1,4 +1,5 @@
 from django import forms
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
 
 from .models import Book, Publisher, Author, Language, Genre
 
@@ -58,3 +59,14 @@ class FormGenre(BaseFieldForm):
     class Meta:
         model = Genre
         fields = ["title"]
+
+
+class FormReassignPublisher(forms.Form):
+    """Форма действия админки "Сменить издательство" (издательство выбирается по id, как в raw_id_fields)"""
+
+    publisher = forms.ModelChoiceField(queryset=Publisher.objects.all(), label="Новое издательство")
+
+    def __init__(self, *args, admin_site, **kwargs):
+        super().__init__(*args, **kwargs)
+        relation = Book._meta.get_field("publisher").remote_field
+        self.fields["publisher"].widget = ForeignKeyRawIdWidget(relation, admin_site)
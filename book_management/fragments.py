@@ -0,0 +1,36 @@
+from django.db.models import prefetch_related_objects
+from django.middleware.csrf import get_token
+from .cache import get_fragments, set_fragment, listing_row_tags, book_detail_tags
+from .versioning import replica_caught_up
+
+# имя фрагмента: (теги записи, связи, которые загружаются только при отрисовке)
+FRAGMENTS = {
+    "book_row": (listing_row_tags, ()),
+    "book_detail": (book_detail_tags, ("publisher", "author", "language")),
+}
+
+
+def load_fragments(name, objects):
+    """Фрагменты name всех объектов страницы за два обращения к кэшу: {pk: content}"""
+
+    return get_fragments(name, [obj.pk for obj in objects])
+
+
+def render_fragment(name, obj, render, request, loaded=None):
+    """
+    Фрагмент name объекта obj из кэша, при промахе - render() с сохранением под тегами объекта и его связей
+    loaded - результат load_fragments для страницы, без него кэш читается для одного объекта
+    Используется шаблонами обоих движков: {% fragment %} (templatetags) и fragment() (Jinja2)
+    """
+
+    tags_func, lookups = FRAGMENTS[name]
+    content = loaded.get(obj.pk) if loaded is not None else get_fragments(name, [obj.pk]).get(obj.pk)
+    if content is None:
+        if lookups:
+            prefetch_related_objects([obj], *lookups)
+        content = render()
+        if replica_caught_up():
+            set_fragment(name, obj.pk, content, tags_func(obj))
+    elif "__csrf_token__" in content:
+        content = content.replace("__csrf_token__", get_token(request))
+    return content
@@ -0,0 +1,188 @@
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError
+from text_unidecode import unidecode
+from uuslug import slugify
+from .models import Author, Publisher
+
+
+def normalize(value):
+    """Транслитерирует (как uuslug) и приводит строку к нижнему регистру, оставляя только буквы и цифры"""
+
+    return " ".join(re.findall(r"[a-z0-9]+", unidecode(value or "").lower()))
+
+
+def trigrams(value):
+    """Множество триграмм строки по правилам pg_trgm: каждое слово дополняется двумя пробелами слева и одним справа"""
+
+    grams = set()
+    for word in normalize(value).split():
+        padded = f"  {word} "
+        grams.update(padded[idx:idx + 3] for idx in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс триграмм в памяти процесса
+    триграмма -> множество id, похожесть считается как в pg_trgm: общие / (все уникальные)
+    """
+
+    def __init__(self):
+        self.names = dict()
+        self.grams = dict()
+        self.postings = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def add(self, pk, name):
+        """Добавляет или обновляет запись"""
+
+        with self.lock:
+            self._remove(pk)
+            grams = trigrams(name)
+            self.names[pk] = name
+            self.grams[pk] = grams
+            for gram in grams:
+                self.postings[gram].add(pk)
+
+    def remove(self, pk):
+        """Удаляет запись"""
+
+        with self.lock:
+            self._remove(pk)
+
+    def _remove(self, pk):
+        for gram in self.grams.pop(pk, ()):
+            self.postings[gram].discard(pk)
+        self.names.pop(pk, None)
+
+    def search(self, query, limit, min_similarity, deadline=None):
+        """
+        Возвращает до limit пар (id, похожесть) по убыванию похожести
+        deadline - момент time.monotonic(), после которого подсчет прекращается и возвращается лучшее из найденного
+        """
+
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        shared = defaultdict(int)
+        with self.lock:
+            for gram in query_grams:
+                for pk in self.postings.get(gram, ()):
+                    shared[pk] += 1
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+            scores = (
+                (common / (len(query_grams) + len(self.grams[pk]) - common), pk) for pk, common in shared.items()
+            )
+            best = heapq.nlargest(limit, (item for item in scores if item[0] >= min_similarity))
+        return [(pk, score) for score, pk in best]
+
+
+class FuzzyLookup:
+    """
+    Нечеткий поиск по имени объекта модели
+    model - модель
+    name_sql - SQL выражение имени для pg_trgm (должно совпадать с выражением GIN индекса в миграции)
+    """
+
+    model = None
+    name_sql = None
+
+    def __init__(self):
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    def name(self, obj):
+        """Имя объекта, по которому выполняется поиск"""
+
+        return str(obj)
+
+    def name_fields(self):
+        """Поля модели, из которых строится имя"""
+
+        return ["title"]
+
+    @property
+    def index(self):
+        """Индекс строится лениво при первом обращении и дальше обновляется сигналами"""
+
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    index = TrigramIndex()
+                    for obj in self.model.objects.only("pk", *self.name_fields()).iterator(chunk_size=5000):
+                        index.add(obj.pk, self.name(obj))
+                    self._index = index
+        return self._index
+
+    def update(self, obj):
+        """Обновляет запись в индексе (вызывается из сигналов)"""
+
+        if self._index is not None:
+            self._index.add(obj.pk, self.name(obj))
+
+    def remove(self, pk):
+        if self._index is not None:
+            self._index.remove(pk)
+
+    def reset(self):
+        """Сбрасывает индекс, он будет перестроен при следующем поиске"""
+
+        self._index = None
+
+    def search(self, query, limit=None, timeout_ms=None):
+        """Возвращает список словарей {id, name, score} по убыванию похожести"""
+
+        limit = limit or settings.FUZZY_LOOKUP_LIMIT
+        timeout_ms = timeout_ms or settings.FUZZY_LOOKUP_TIMEOUT_MS
+        if connection.vendor == "postgresql":
+            return self._search_postgres(query, limit, timeout_ms)
+        deadline = time.monotonic() + timeout_ms / 1000
+        found = self.index.search(query, limit, settings.FUZZY_LOOKUP_MIN_SIMILARITY, deadline=deadline)
+        names = self.index.names
+        return [{"id": pk, "name": names.get(pk, ""), "score": round(score, 3)} for pk, score in found]
+
+    def _search_postgres(self, query, limit, timeout_ms):
+        """Поиск через GIN индекс pg_trgm по имени и по транслитерированному slug, с ограничением времени запроса"""
+
+        table = self.model._meta.db_table
+        sql = (
+            f"SELECT id, {self.name_sql}, GREATEST(similarity({self.name_sql}, %s), similarity(slug, %s)) AS score "
+            f"FROM {table} WHERE {self.name_sql} %% %s OR slug %% %s ORDER BY score DESC, id LIMIT %s"
+        )
+        slug = slugify(query)
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", [int(timeout_ms)])
+                cursor.execute("SELECT set_limit(%s)", [settings.FUZZY_LOOKUP_MIN_SIMILARITY])
+                cursor.execute(sql, [query, slug, query, slug, limit])
+                rows = cursor.fetchall()
+        except DatabaseError:  # превышен statement_timeout
+            return []
+        return [{"id": pk, "name": name, "score": round(score, 3)} for pk, name, score in rows]
+
+
+class AuthorLookup(FuzzyLookup):
+    """Нечеткий поиск авторов по имени и фамилии"""
+
+    model = Author
+    name_sql = "(first_name || ' ' || last_name)"
+
+    def name_fields(self):
+        return ["first_name", "last_name"]
+
+
+class PublisherLookup(FuzzyLookup):
+    """Нечеткий поиск издательств по названию"""
+
+    model = Publisher
+    name_sql = "title"
+
+
+author_lookup = AuthorLookup()
+publisher_lookup = PublisherLookup()
@@ -0,0 +1,26 @@
+import io
+from PIL import Image, ImageOps
+
+FORMATS = {
+    "jpeg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+}
+
+
+def render_cover_variants(data, sizes, formats=tuple(FORMATS)):
+    """
+    Строит уменьшенные копии обложки фиксированных размеров во всех форматах
+    Выполняется в отдельном процессе, поэтому не зависит от Django: принимает и возвращает байты
+    Возвращает {(формат, ширина, высота): байты}
+    """
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert("RGB")
+    variants = dict()
+    for width, height in sizes:
+        thumbnail = ImageOps.fit(image, (width, height), method=Image.Resampling.LANCZOS)
+        for name in formats:
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, **FORMATS[name])
+            variants[(name, width, height)] = buffer.getvalue()
+    return variants
@@ -0,0 +1,60 @@
+from .models import Book, BookListing
+
+
+def listing_tag(name, slug):
+    """Тег связанного объекта в BookListing.tags, пробелы по краям исключают совпадение по части slug"""
+
+    return f" {name}:{slug} "
+
+
+def build_listing(book):
+    """Собирает строку списка книг (книга загружена с select_related publisher и prefetch связей)"""
+
+    authors = [{"name": str(author), "slug": author.slug} for author in book.author.all()]
+    genres = [{"title": genre.title, "slug": genre.slug} for genre in book.genre.all()]
+    languages = [{"title": language.title, "slug": language.slug} for language in book.language.all()]
+    tags = [f"author:{item['slug']}" for item in authors]
+    tags.extend(f"genre:{item['slug']}" for item in genres)
+    tags.extend(f"language:{item['slug']}" for item in languages)
+    return BookListing(
+        book=book,
+        title=book.title,
+        slug=book.slug,
+        year=book.year,
+        show_book=book.show_book,
+        publisher_title=book.publisher.title,
+        publisher_slug=book.publisher.slug,
+        authors=authors,
+        genres=genres,
+        languages=languages,
+        tags=f" {' '.join(tags)} " if tags else "",
+    )
+
+
+def refresh_listings(book_ids, chunk_size=1000):
+    """Пересобирает строки списка указанных книг (фиксированное количество запросов на пачку)"""
+
+    book_ids = list(book_ids)
+    for idx in range(0, len(book_ids), chunk_size):
+        chunk = book_ids[idx:idx + chunk_size]
+        books = Book.objects.filter(pk__in=chunk).select_related("publisher").prefetch_related(
+            "author", "genre", "language"
+        )
+        listings = [build_listing(book) for book in books]
+        BookListing.objects.filter(book_id__in=chunk).delete()
+        BookListing.objects.bulk_create(listings)
+
+
+def listing_queryset(**related):
+    """
+    Строки списка книг, отфильтрованные по связанным объектам: listing_queryset(genre="fantastika")
+    Издательство фильтруется по своему индексированному полю, авторы, жанры и языки - по tags
+    """
+
+    queryset = BookListing.objects.all()
+    for name, slug in related.items():
+        if name == "publisher":
+            queryset = queryset.filter(publisher_slug=slug)
+        else:
+            queryset = queryset.filter(tags__contains=listing_tag(name, slug))
+    return queryset
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from book_management.benchmark import http_benchmark, format_table
+
+COLUMNS = ("target", "concurrency", "requests", "errors", "rps", "p50", "p95", "p99", "max")
+
+
+class Command(BaseCommand):
+    """Сравнение пропускной способности и задержек API на разных серверах(например, WSGI и ASGI)"""
+
+    help = (
+        "Нагружает endpoint API на каждом сервере с разной конкурентностью и выводит rps и p50/p95/p99/max (мс). "
+        "Пример: benchmark_api --target wsgi=http://localhost:8018 --target asgi=http://localhost:8019"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target", action="append", required=True, help="Сервер в виде имя=адрес, можно указать несколько"
+        )
+        parser.add_argument("--path", default="/api/v1/list-book/?cursor=", help="Путь запроса")
+        parser.add_argument("--concurrency", default="1,10,50,100", help="Уровни конкурентности через запятую")
+        parser.add_argument("--requests", type=int, default=500, help="Запросов на каждый уровень")
+        parser.add_argument("--timeout", type=float, default=30, help="Таймаут одного запроса, с")
+
+    def handle(self, *args, **options):
+        try:
+            targets = [target.split("=", 1) for target in options["target"]]
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("Неверный формат --target или --concurrency")
+        if any(len(target) != 2 for target in targets):
+            raise CommandError("--target должен иметь вид имя=адрес")
+
+        rows = list()
+        for level in levels:
+            for name, base_url in targets:
+                url = f"{base_url.rstrip('/')}{options['path']}"
+                result = http_benchmark(url, level, options["requests"], timeout=options["timeout"])
+                result["target"] = name
+                rows.append(result)
+                self.stdout.write(f"{name} c={level}: {result['rps']} rps, p99 {result['p99']} мс")
+        self.stdout.write(format_table(rows, COLUMNS))
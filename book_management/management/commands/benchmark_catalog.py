@@ -0,0 +1,187 @@
+import json
+import platform
+from contextlib import ExitStack
+from urllib.parse import urlencode, urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from api.v1 import urls as api_urls
+from book_management import urls as web_urls
+from book_management.benchmark import http_benchmark, format_table, compare_runs
+from book_management.models import Book
+from book_management.profiling import QueryRecorder
+
+COLUMNS = ("endpoint", "method", "concurrency", "requests", "errors", "rps", "p50", "p95", "p99", "max", "queries")
+COMPARE_COLUMNS = (
+    "endpoint", "concurrency", "rps_before", "rps", "rps_diff", "p95_before", "p95", "p95_diff",
+    "queries_before", "queries", "queries_diff",
+)
+SAMPLE_MODELS = ("author", "publisher", "language", "genre")  # остальные адреса с slug/pk относятся к книге
+QUERY_PARAMS = {
+    "search_book": {"q": "{word}"},
+    "facet_book": {"genre": "{genre}"},
+    "api:list_book": {"cursor": ""},
+    "api:search_book": {"q": "{word}"},
+    "api:facet_book": {"genre": "{genre}"},
+    "api:autocomplete_author": {"q": "{author_name}"},
+    "api:autocomplete_publisher": {"q": "{publisher_title}"},
+}
+SKIP = {"api:export_book"}  # выгрузка всего каталога, для нее есть export_catalog
+
+
+def catalog_samples():
+    """Видимая книга с авторами, жанрами и языками и ее связанные объекты - подставляются в адреса"""
+
+    book = Book.objects.filter(
+        show_book=True, author__isnull=False, genre__isnull=False, language__isnull=False
+    ).select_related("publisher").order_by("pk").first()
+    if book is None:
+        raise CommandError("В каталоге нет книг, сначала выполните seed_catalog")
+    author = book.author.first()
+    return {
+        "book": book,
+        "author": author,
+        "publisher": book.publisher,
+        "genre": book.genre.first(),
+        "language": book.language.first(),
+        "word": book.title.split()[0],
+        "author_name": author.last_name,
+        "publisher_title": book.publisher.title,
+    }
+
+
+def write_payloads(samples):
+    """Тела запросов на запись(--writes): создание книги через API"""
+
+    return {
+        "api:add_book": {
+            "title": f"Нагрузочный тест {samples['word']}", "publisher": samples["publisher"].pk,
+            "author": [samples["author"].pk], "genre": [samples["genre"].pk], "language": [samples["language"].pk],
+            "pages": 100, "year": 2000,
+        },
+    }
+
+
+def catalog_endpoints(samples, writes=False):
+    """
+    Все адреса book_management/urls.py и api/v1/urls.py, которые можно нагружать
+    GET - для представлений с методом get (для удаления и изменения на сайте это страница подтверждения/формы),
+    POST - только для адресов из write_payloads и только с writes, остальные изменения данных пропускаются
+    """
+
+    payloads = write_payloads(samples) if writes else dict()
+    endpoints = list()
+    for namespace, module in (("", web_urls), ("api:", api_urls)):
+        for pattern in module.urlpatterns:
+            name = f"{namespace}{pattern.name}"
+            view_class = getattr(pattern.callback, "view_class", None)
+            if name in SKIP or view_class is None:
+                continue
+            if name in payloads:
+                method, body = "POST", payloads[name]
+            elif hasattr(view_class, "get"):
+                method, body = "GET", None
+            else:
+                continue
+            kwargs = dict()
+            for argument, converter in pattern.pattern.converters.items():
+                sample = samples[next((model for model in SAMPLE_MODELS if model in pattern.name), "book")]
+                kwargs[argument] = getattr(sample, argument)
+            path = reverse(name, kwargs=kwargs)
+            if name in QUERY_PARAMS:
+                values = {key: getattr(value, "slug", value) for key, value in samples.items()}
+                query = {param: value.format(**values) for param, value in QUERY_PARAMS[name].items()}
+                path = f"{path}?{urlencode(query)}"
+            endpoints.append({"endpoint": name, "method": method, "path": path, "body": body})
+    return endpoints
+
+
+def count_queries(endpoint, host):
+    """Количество запросов к базе данных на один запрос к адресу (в этом процессе, через тестовый клиент)"""
+
+    recorder = QueryRecorder()
+    client = Client(HTTP_HOST=host)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        if endpoint["method"] == "POST":
+            client.post(endpoint["path"], endpoint["body"], content_type="application/json")
+        else:
+            client.get(endpoint["path"])
+    return recorder.count
+
+
+class Command(BaseCommand):
+    """Нагрузочный тест всех адресов сайта и API на запущенном сервере"""
+
+    help = (
+        "Нагружает каждый адрес book_management/urls.py и api/v1/urls.py с разной конкурентностью, выводит "
+        "rps, p50/p95/p99/max (мс) и количество запросов к базе на запрос. Данные берутся из базы этого проекта, "
+        "поэтому сервер должен работать с ней же. Пример: "
+        "benchmark_catalog --base-url http://localhost:8000 --output after.json --compare before.json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000", help="Адрес сервера")
+        parser.add_argument("--concurrency", default="1,10,50", help="Уровни конкурентности через запятую")
+        parser.add_argument("--requests", type=int, default=200, help="Запросов на каждый адрес и уровень")
+        parser.add_argument("--timeout", type=float, default=30, help="Таймаут одного запроса, с")
+        parser.add_argument("--only", action="append", help="Только адреса, имя которых содержит строку")
+        parser.add_argument("--writes", action="store_true", help="Нагружать и создание книги через API (POST)")
+        parser.add_argument("--output", help="Файл для результатов в JSON")
+        parser.add_argument("--compare", help="Файл JSON прошлого запуска для сравнения")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("Неверный формат --concurrency")
+        previous = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as file:
+                    previous = json.load(file)["results"]
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f"Не удалось прочитать {options['compare']}: {error}")
+
+        base_url = options["base_url"].rstrip("/")
+        endpoints = catalog_endpoints(catalog_samples(), writes=options["writes"])
+        if options["only"]:
+            endpoints = [item for item in endpoints if any(part in item["endpoint"] for part in options["only"])]
+
+        results = list()
+        for endpoint in endpoints:
+            queries = count_queries(endpoint, urlsplit(base_url).netloc)
+            headers, data = dict(), None
+            if endpoint["body"] is not None:
+                headers["Content-Type"] = "application/json"
+                data = json.dumps(endpoint["body"]).encode()
+            for level in levels:
+                result = http_benchmark(
+                    f"{base_url}{endpoint['path']}", level, options["requests"], timeout=options["timeout"],
+                    headers=headers, method=endpoint["method"], data=data
+                )
+                result.update(endpoint=endpoint["endpoint"], method=endpoint["method"], queries=queries)
+                results.append(result)
+                self.stdout.write(
+                    f"{endpoint['endpoint']} c={level}: {result['rps']} rps, p99 {result['p99']} мс, "
+                    f"запросов к базе {queries}"
+                )
+        self.stdout.write(format_table(results, COLUMNS))
+
+        if options["output"]:
+            report = {
+                "time": timezone.now().isoformat(),
+                "base_url": base_url,
+                "books": Book.objects.count(),
+                "python": platform.python_version(),
+                "requests": options["requests"],
+                "results": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
+        if previous is not None:
+            self.stdout.write(format_table(compare_runs(previous, results), COMPARE_COLUMNS))
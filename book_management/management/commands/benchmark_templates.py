@@ -0,0 +1,113 @@
+import html
+import json
+import re
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from book_management.benchmark import format_table, summarize
+from book_management.cache import CSRF_INPUT_RE, CSRF_PLACEHOLDER
+from book_management.management.commands.benchmark_catalog import catalog_endpoints, catalog_samples
+from book_management.mixins import MixinTemplateEngine
+
+ENGINES = ("django", "jinja2")
+COLUMNS = ("endpoint", "django_p50", "jinja2_p50", "django_p95", "jinja2_p95", "speedup", "html")
+SPACES_RE = re.compile(r"\s+")
+TAG_SPACES_RE = re.compile(r">\s+<")
+
+
+def normalize_html(content):
+    """HTML без различий, которые не видны в браузере: пробелы между тегами, вид экранирования, маска CSRF токена"""
+
+    content = CSRF_INPUT_RE.sub(CSRF_PLACEHOLDER, content)
+    return SPACES_RE.sub(" ", TAG_SPACES_RE.sub("><", html.unescape(content))).strip()
+
+
+def template_endpoints(samples):
+    """Адреса сайта, представления которых выбирают шаблонизатор (MixinTemplateEngine)"""
+
+    endpoints = list()
+    for endpoint in catalog_endpoints(samples):
+        match = resolve(urlsplit(endpoint["path"]).path)
+        if issubclass(getattr(match.func, "view_class", object), MixinTemplateEngine):
+            endpoints.append(dict(endpoint, match=match))
+    return endpoints
+
+
+def render_timings(endpoint, engine, repeat):
+    """
+    Отрисовывает страницу движком engine repeat раз с одним и тем же контекстом
+    Возвращает (HTML, [время отрисовки, с]). Первая отрисовка не учитывается: в ней выполняются ленивые запросы
+    Если представление ответило без шаблона (перенаправление), возвращает (None, [])
+    """
+
+    request = RequestFactory().get(endpoint["path"])
+    request.user = AnonymousUser()
+    match = endpoint["match"]
+    with override_settings(CATALOG_TEMPLATE_ENGINE=engine):
+        response = match.func(request, *match.args, **match.kwargs)
+    if not hasattr(response, "resolve_template"):
+        return None, []
+    template = response.resolve_template(response.template_name)
+    context = response.resolve_context(response.context_data)
+    content = template.render(context, request)
+    timings = list()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        template.render(context, request)
+        timings.append(time.perf_counter() - started)
+    return content, timings
+
+
+class Command(BaseCommand):
+    """Сравнение времени отрисовки страниц каталога шаблонами Django(templates/) и Jinja2(jinja2/)"""
+
+    help = (
+        "Отрисовывает каждую страницу каталога обоими шаблонизаторами с одним контекстом, выводит p50/p95 (мс), "
+        "ускорение Jinja2 и совпадение HTML. Без --with-cache кэш отключен, чтобы каждая строка отрисовывалась. "
+        "Страницы переключаются на Jinja2 через CATALOG_TEMPLATE_ENGINE=jinja2"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=200, help="Отрисовок каждой страницы каждым движком")
+        parser.add_argument("--only", action="append", help="Только адреса, имя которых содержит строку")
+        parser.add_argument("--with-cache", action="store_true", help="Не отключать кэш фрагментов")
+        parser.add_argument("--output", help="Файл для результатов в JSON")
+
+    def handle(self, *args, **options):
+        endpoints = template_endpoints(catalog_samples())
+        if options["only"]:
+            endpoints = [item for item in endpoints if any(part in item["endpoint"] for part in options["only"])]
+        caches = dict(settings.CACHES, benchmark_templates={"BACKEND": "django.core.cache.backends.dummy.DummyCache"})
+        cache_alias = settings.CATALOG_CACHE_ALIAS if options["with_cache"] else "benchmark_templates"
+
+        results = list()
+        with override_settings(CACHES=caches, CATALOG_CACHE_ALIAS=cache_alias, QUERY_PROFILING_SAMPLE_RATE=0):
+            for endpoint in endpoints:
+                rendered = {engine: render_timings(endpoint, engine, options["repeat"]) for engine in ENGINES}
+                if any(content is None for content, _ in rendered.values()):
+                    self.stdout.write(f"{endpoint['endpoint']}: ответ без шаблона, пропущен")
+                    continue
+                result = {"endpoint": endpoint["endpoint"], "speedup": 0}
+                for engine, (_, timings) in rendered.items():
+                    summary = summarize(timings, sum(timings))
+                    result.update({f"{engine}_p50": summary["p50"], f"{engine}_p95": summary["p95"]})
+                if result["jinja2_p50"]:
+                    result["speedup"] = round(result["django_p50"] / result["jinja2_p50"], 2)
+                result["html"] = "=" if len({normalize_html(content) for content, _ in rendered.values()}) == 1 else "!="
+                results.append(result)
+                self.stdout.write(
+                    f"{endpoint['endpoint']}: django {result['django_p50']} мс, jinja2 {result['jinja2_p50']} мс, "
+                    f"HTML {result['html']}"
+                )
+        self.stdout.write(format_table(results, COLUMNS))
+
+        if options["output"]:
+            report = {"time": timezone.now().isoformat(), "repeat": options["repeat"], "results": results}
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
@@ -0,0 +1,32 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from book_management.export import EXPORT_TYPES, export_stream, parse_since
+
+
+class Command(BaseCommand):
+    """Потоковая выгрузка каталога книг в NDJSON/CSV"""
+
+    help = "Выгружает все книги с авторами, жанрами, языками и издательством в файл или stdout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", choices=tuple(EXPORT_TYPES), default="ndjson", help="Формат выгрузки")
+        parser.add_argument("--since", help="Только книги, измененные после даты (ISO формат)")
+        parser.add_argument("--gzip", action="store_true", help="Сжать выгрузку gzip")
+        parser.add_argument("--output", help="Файл выгрузки (по умолчанию stdout)")
+        parser.add_argument("--chunk-size", type=int, help="Количество книг в одной пачке")
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options["since"]) if options["since"] else None
+        except ValueError as error:
+            raise CommandError(error)
+        stream = export_stream(options["type"], since=since, compress=options["gzip"], chunk_size=options["chunk_size"])
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for chunk in stream:
+                output.write(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,95 @@
+import os
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from book_management.covers import variant_paths
+from book_management.models import Book, CoverBlob
+from book_management.storage import COVERS_DIR
+
+
+class Command(BaseCommand):
+    """Удаление файлов обложек, на которые не ссылается ни одна книга"""
+
+    help = "Удаляет файлы обложек с нулевым счетчиком ссылок и их копии, а также файлы без записи CoverBlob"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours", type=float, default=24,
+            help="Не удалять файлы, изменявшиеся позже этого срока (загрузка еще может быть не завершена)"
+        )
+        parser.add_argument("--recount", action="store_true", help="Пересчитать счетчики ссылок по таблице книг")
+        parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет удалено")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        deadline = timezone.now() - timedelta(hours=options["grace_hours"])
+        if options["recount"]:
+            self.recount()
+
+        removed = 0
+        candidates = CoverBlob.objects.filter(refcount__lte=0, updated_at__lt=deadline)
+        for pk, name in list(candidates.values_list("pk", "name")):
+            if dry_run:
+                self.stdout.write(f"Удаление {name}")
+            elif not self.delete_blob(pk):
+                continue
+            removed += 1
+
+        known = set(CoverBlob.objects.values_list("name", flat=True))
+        for name in self.stored_covers():
+            if name in known or os.path.getmtime(default_storage.path(name)) > deadline.timestamp():
+                continue
+            self.stdout.write(f"Удаление файла без записи {name}")
+            if not dry_run:
+                self.delete_files(name)
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f"Удалено обложек: {removed}{' (dry run)' if dry_run else ''}"))
+
+    def delete_blob(self, pk):
+        """
+        Удаляет запись и файлы обложки, если на нее все еще никто не ссылается
+        Между выборкой и удалением та же обложка могла быть загружена снова(счетчик увеличен),
+        поэтому условие проверяется повторно под блокировкой строки
+        """
+
+        with transaction.atomic():
+            blob = CoverBlob.objects.select_for_update().filter(pk=pk, refcount__lte=0).first()
+            if blob is None:
+                return False
+            deleted, _ = CoverBlob.objects.filter(pk=blob.pk, refcount__lte=0).delete()
+            if deleted:
+                self.stdout.write(f"Удаление {blob.name}")
+                self.delete_files(blob.name)
+        return bool(deleted)
+
+    def recount(self):
+        """Счетчики ссылок по фактическим обложкам книг"""
+
+        counts = dict(
+            Book.objects.exclude(cover="").exclude(cover__isnull=True).values("cover").annotate(
+                refcount=Count("pk")).values_list("cover", "refcount")
+        )
+        now = timezone.now()
+        for blob in CoverBlob.objects.iterator():
+            refcount = counts.pop(blob.name, 0)
+            if blob.refcount != refcount:
+                CoverBlob.objects.filter(pk=blob.pk).update(refcount=refcount, updated_at=now)
+        CoverBlob.objects.bulk_create([CoverBlob(name=name, refcount=refcount) for name, refcount in counts.items()])
+
+    @staticmethod
+    def stored_covers():
+        """Файлы обложек в хранилище (covers/ab/cd/<хэш>), временные файлы загрузок тоже"""
+
+        root = default_storage.path(COVERS_DIR)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                yield os.path.relpath(os.path.join(directory, filename), default_storage.location).replace(os.sep, "/")
+
+    @staticmethod
+    def delete_files(name):
+        for path in [name, *variant_paths(name)]:
+            if default_storage.exists(path):
+                default_storage.delete(path)
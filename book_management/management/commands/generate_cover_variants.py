@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from book_management.covers import process_cover
+from book_management.models import Book
+
+
+class Command(BaseCommand):
+    """Построение копий обложек для книг, у которых их еще нет(например, загруженных до появления обработки)"""
+
+    help = "Строит уменьшенные копии и WebP варианты обложек книг"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Перестроить копии для всех обложек")
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(cover="").exclude(cover__isnull=True).only("pk", "cover", "cover_variants")
+        total = 0
+        for book in books.order_by("pk").iterator():
+            if options["all"] or book.cover_variants.get("source") != book.cover.name:
+                process_cover(book.pk, book.cover.name)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f"Обработано обложек: {total}"))
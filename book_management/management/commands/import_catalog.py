@@ -0,0 +1,139 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from book_management.bulk import CatalogLookup, copy_books
+
+LIST_FIELDS = ("authors", "genres", "languages")
+
+
+def read_csv(path, delimiter, list_separator):
+    """Построчно читает CSV (первая строка - заголовок), списки разделены list_separator"""
+
+    with open(path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file, delimiter=delimiter):
+            for field in LIST_FIELDS:
+                row[field] = (row.get(field) or "").split(list_separator)
+            yield row
+
+
+def read_jsonl(path, list_separator):
+    """Построчно читает JSONL, списки могут быть массивами или строками с list_separator"""
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            for field in LIST_FIELDS:
+                if isinstance(row.get(field), str):
+                    row[field] = row[field].split(list_separator)
+            yield row
+
+
+def clean_record(row):
+    """Проверяет и нормализует строку файла, при ошибке возбуждает ValueError"""
+
+    record = {
+        "title": str(row.get("title") or "").strip()[:200],
+        "publisher": str(row.get("publisher") or "").strip(),
+        "pages": int(row.get("pages") or 0),
+        "year": int(row.get("year") or 0),
+    }
+    for field in LIST_FIELDS:
+        record[field] = [str(name).strip() for name in row.get(field) or [] if str(name).strip()]
+    if not record["title"] or not record["publisher"]:
+        raise ValueError("не указано название книги или издательство")
+    if not 1000 <= record["year"] <= 3000:
+        raise ValueError(f"некорректный год: {record['year']}")
+    for field in LIST_FIELDS:
+        if not record[field]:
+            raise ValueError(f"пустое поле {field}")
+    return record
+
+
+class Command(BaseCommand):
+    """Потоковый импорт каталога книг из CSV/JSONL"""
+
+    help = (
+        "Импортирует книги из CSV или JSONL (title, authors, publisher, genres, languages, pages, year). "
+        "Отсутствующие авторы, издательства, жанры и языки создаются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу CSV или JSONL")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Формат файла (по умолчанию - по расширению)")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Количество книг в одной пачке")
+        parser.add_argument("--delimiter", default=",", help="Разделитель колонок CSV")
+        parser.add_argument("--list-separator", default="|", help="Разделитель списков (авторы, жанры, языки)")
+        parser.add_argument("--checkpoint", help="Файл контрольной точки (по умолчанию <path>.checkpoint)")
+        parser.add_argument("--restart", action="store_true", help="Игнорировать контрольную точку и начать сначала")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"Файл не найден: {path}")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size должен быть больше 0")
+        file_format = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        if file_format == "csv":
+            rows = read_csv(path, options["delimiter"], options["list_separator"])
+        else:
+            rows = read_jsonl(path, options["list_separator"])
+
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint"
+        skip = 0 if options["restart"] else self.read_checkpoint(checkpoint_path)
+        if skip:
+            self.stdout.write(f"Продолжение с контрольной точки: пропущено строк {skip}")
+            rows = islice(rows, skip, None)
+
+        lookup = CatalogLookup()
+        processed, created, errors = skip, 0, 0
+        started = time.monotonic()
+        while True:
+            chunk = list(islice(rows, options["chunk_size"]))
+            if not chunk:
+                break
+            records = list()
+            for number, row in enumerate(chunk, start=processed + 1):
+                try:
+                    records.append(clean_record(row))
+                except (TypeError, ValueError) as error:
+                    errors += 1
+                    self.stderr.write(f"Строка {number}: {error}")
+            created += len(copy_books(lookup.resolve(records)))
+            processed += len(chunk)
+            self.write_checkpoint(checkpoint_path, processed)
+            elapsed = time.monotonic() - started
+            rate = (processed - skip) / elapsed if elapsed else 0
+            self.stdout.write(f"Обработано строк: {processed}, создано книг: {created}, {rate:.0f} строк/с")
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Импорт завершен: создано книг {created}, ошибок {errors}, за {time.monotonic() - started:.1f} с"
+        ))
+
+    @staticmethod
+    def read_checkpoint(path):
+        """Количество уже импортированных строк из контрольной точки"""
+
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)["rows"]
+
+    @staticmethod
+    def write_checkpoint(path, rows):
+        """
+        Записывает контрольную точку после фиксации пачки (через временный файл, чтобы не оставить его битым)
+        Если процесс упадет между фиксацией и записью, последняя пачка будет импортирована повторно
+        """
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"rows": rows}, file)
+        os.replace(tmp_path, path)
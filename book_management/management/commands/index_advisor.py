@@ -0,0 +1,99 @@
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from book_management.explain import covering_index, explain, is_select, table_rows
+from book_management.management.commands.benchmark_catalog import catalog_endpoints, catalog_samples
+from book_management.profiling import fingerprint
+
+
+class SelectCapture:
+    """Обертка execute: первый SELECT каждого отпечатка с параметрами и количество его повторов"""
+
+    def __init__(self):
+        self.queries = dict()  # {отпечаток: [alias, sql, params, количество]}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and is_select(sql):
+            entry = self.queries.setdefault(fingerprint(sql), [context["connection"].alias, sql, params, 0])
+            entry[3] += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    """Поиск последовательных чтений больших таблиц в запросах, которые выполняют страницы сайта"""
+
+    help = (
+        "Открывает каждый адрес book_management/urls.py (с --api и api/v1/urls.py), записывает его SELECT запросы, "
+        "выполняет для них EXPLAIN и выводит последовательные чтения таблиц от --min-rows строк "
+        "с предлагаемыми столбцами индекса. Кэш страниц на время проверки отключен"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--api", action="store_true", help="Проверять и адреса API")
+        parser.add_argument("--only", action="append", help="Только адреса, имя которых содержит строку")
+        parser.add_argument("--min-rows", type=int, default=10000, help="Не показывать чтения таблиц меньше этого")
+
+    def handle(self, *args, **options):
+        endpoints = [
+            item for item in catalog_endpoints(catalog_samples())
+            if options["api"] or not item["endpoint"].startswith("api:")
+        ]
+        if options["only"]:
+            endpoints = [item for item in endpoints if any(part in item["endpoint"] for part in options["only"])]
+        caches = dict(settings.CACHES, index_advisor={"BACKEND": "django.core.cache.backends.dummy.DummyCache"})
+
+        suggestions = dict()  # {(таблица, столбцы): [адреса]}
+        rows_cache = dict()
+        with override_settings(CACHES=caches, CATALOG_CACHE_ALIAS="index_advisor", QUERY_PROFILING_SAMPLE_RATE=0):
+            client = Client()
+            for endpoint in endpoints:
+                capture = SelectCapture()
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(capture))
+                    client.get(endpoint["path"])
+                lines = list()
+                for alias, sql, params, count in capture.queries.values():
+                    connection = connections[alias]
+                    for finding in explain(connection, sql, params):
+                        key = (alias, finding["table"])
+                        if key not in rows_cache:
+                            rows_cache[key] = table_rows(connection, finding["table"])
+                        if rows_cache[key] < options["min_rows"]:
+                            continue
+                        lines.extend(self.describe(connection, finding, rows_cache[key], sql, count))
+                        if finding["columns"]:
+                            suggestions.setdefault((finding["table"], tuple(finding["columns"])), []).append(
+                                endpoint["endpoint"]
+                            )
+                status = self.style.WARNING("последовательные чтения") if lines else self.style.SUCCESS("OK")
+                self.stdout.write(
+                    f"{endpoint['endpoint']} {endpoint['path']}: SELECT {len(capture.queries)} видов, {status}"
+                )
+                for line in lines:
+                    self.stdout.write(line)
+
+        if suggestions:
+            self.stdout.write("\nПредлагаемые индексы:")
+            for (table, columns), names in sorted(suggestions.items()):
+                self.stdout.write(f"  {table}({', '.join(columns)}) - {', '.join(sorted(set(names)))}")
+
+    @staticmethod
+    def describe(connection, finding, rows, sql, count):
+        """Строки отчета по одному последовательному чтению"""
+
+        lines = [f"  Seq Scan {finding['table']} (~{rows} строк), выполнений за запрос: {count}"]
+        if finding["filter"]:
+            lines.append(f"    фильтр: {finding['filter']}")
+        if finding["sort"]:
+            lines.append(f"    сортировка: {finding['sort']}")
+        if finding["columns"]:
+            existing = covering_index(connection, finding["table"], finding["columns"])
+            if existing:
+                lines.append(f"    индекс {existing} есть, но не выбран планировщиком (ANALYZE, селективность)")
+            else:
+                lines.append(f"    нет индекса: {finding['table']}({', '.join(finding['columns'])})")
+        lines.append(f"    {sql[:300]}")
+        return lines
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from book_management.models import Book
+from book_management.listing import refresh_listings
+
+
+class Command(BaseCommand):
+    """Полная пересборка строк списка книг (BookListing)"""
+
+    help = "Пересобирает строки списка всех книг"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Количество книг в одной пачке")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        chunk = list()
+        total = 0
+        for pk in Book.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size):
+            chunk.append(pk)
+            if len(chunk) >= chunk_size:
+                refresh_listings(chunk)
+                total += len(chunk)
+                chunk = list()
+        refresh_listings(chunk)
+        total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Пересобрано строк списка книг: {total}"))
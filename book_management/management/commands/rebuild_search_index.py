@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from book_management.models import Book
+from book_management.search import reindex_books
+
+
+class Command(BaseCommand):
+    """Полная пересборка поисковых документов книг"""
+
+    help = "Пересобирает поисковые документы всех книг"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Количество книг в одной пачке")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        chunk = list()
+        total = 0
+        for pk in Book.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size):
+            chunk.append(pk)
+            if len(chunk) >= chunk_size:
+                reindex_books(chunk)
+                total += len(chunk)
+                chunk = list()
+        reindex_books(chunk)
+        total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Переиндексировано книг: {total}"))
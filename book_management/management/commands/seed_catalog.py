@@ -0,0 +1,72 @@
+import random
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from book_management.bulk import copy_books
+from book_management.seeding import CatalogGenerator, create_reference, parse_range
+
+
+class Command(BaseCommand):
+    """Генерация синтетического каталога для нагрузочного тестирования"""
+
+    help = (
+        "Создает N книг со случайными авторами, издательствами, жанрами и языками. "
+        "Пример: seed_catalog --books 1000000 --authors-per-book 1-3 --genres-per-book 1-2"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, required=True, help="Количество книг")
+        parser.add_argument("--authors", type=int, help="Количество авторов (по умолчанию books / 10)")
+        parser.add_argument("--publishers", type=int, help="Количество издательств (по умолчанию books / 500)")
+        parser.add_argument("--genres", type=int, default=30, help="Количество жанров")
+        parser.add_argument("--languages", type=int, default=10, help="Количество языков")
+        parser.add_argument("--authors-per-book", default="1-2", help="Авторов на книгу: число или диапазон 1-3")
+        parser.add_argument("--genres-per-book", default="1-3", help="Жанров на книгу: число или диапазон")
+        parser.add_argument("--languages-per-book", default="1", help="Языков на книгу: число или диапазон")
+        parser.add_argument("--skew", type=float, default=1.0, help="Показатель закона Ципфа для популярности")
+        parser.add_argument("--hidden-share", type=float, default=0.02, help="Доля скрытых книг (show_book=False)")
+        parser.add_argument("--seed", type=int, help="Начальное значение генератора (повторяемый каталог)")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Количество книг в одной пачке")
+
+    def handle(self, *args, **options):
+        books = options["books"]
+        if books < 1 or options["chunk_size"] < 1:
+            raise CommandError("--books и --chunk-size должны быть больше 0")
+        try:
+            fan_out = {
+                "author": parse_range(options["authors_per_book"]),
+                "genre": parse_range(options["genres_per_book"]),
+                "language": parse_range(options["languages_per_book"]),
+            }
+        except ValueError as error:
+            raise CommandError(str(error))
+        count = {
+            "author": options["authors"] or max(books // 10, 1),
+            "publisher": options["publishers"] or max(books // 500, 1),
+            "genre": options["genres"],
+            "language": options["languages"],
+        }
+        if min(count.values()) < 1:
+            raise CommandError("Количество авторов, издательств, жанров и языков должно быть больше 0")
+
+        started = time.monotonic()
+        rng = random.Random(options["seed"])
+        ids = create_reference(count, rng)
+        self.stdout.write(
+            f"Создано авторов {count['author']}, издательств {count['publisher']}, "
+            f"жанров {count['genre']}, языков {count['language']}"
+        )
+
+        generator = CatalogGenerator(ids, fan_out, options["skew"], options["hidden_share"], seed=rng.random())
+        rows = generator.rows(books)
+        created = 0
+        while True:
+            chunk = list(islice(rows, options["chunk_size"]))
+            if not chunk:
+                break
+            created += len(copy_books(chunk))
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"Создано книг: {created}/{books}, {created / elapsed:.0f} книг/с")
+        self.stdout.write(self.style.SUCCESS(
+            f"Каталог создан: {created} книг за {time.monotonic() - started:.1f} с"
+        ))
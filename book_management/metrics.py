@@ -0,0 +1,372 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from book_management_system.db_pool.pool import all_pool_stats
+from .profiling import observe_queries
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+POOL_UPDATE_INTERVAL = 1.0  # Как часто (с) записывать состояние пулов соединений
+
+
+class MmapDict:
+    """
+    Словарь ключ(str) -> float в файле, отображенном в память (mmap)
+    Запись: длина ключа(int32), ключ в UTF-8 с выравниванием до 8 байт, значение(double)
+    Первые 8 байт - занятый размер. Пишет только процесс-владелец файла, читать могут все остальные
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a+b")
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            size = self.INITIAL_SIZE
+            self._file.truncate(size)
+        self._capacity = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used = struct.unpack_from("q", self._mmap, 0)[0]
+        if not self._used:
+            self._used = 8
+            struct.pack_into("q", self._mmap, 0, self._used)
+        self._positions = {key: position for key, _, position in self.read_entries(self._mmap, self._used)}
+
+    @staticmethod
+    def read_entries(data, used=None):
+        """(ключ, значение, позиция значения) всех записей буфера"""
+
+        used = struct.unpack_from("q", data, 0)[0] if used is None else used
+        position = 8
+        while position < used:
+            length = struct.unpack_from("i", data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode("utf-8")
+            position += 4 + length + (-(4 + length) % 8)
+            yield key, struct.unpack_from("d", data, position)[0], position
+            position += 8
+
+    @classmethod
+    def read_file(cls, path):
+        """Все записи файла без mmap (для сбора метрик из файлов других процессов)"""
+
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) < 8:
+            return dict()
+        return {key: value for key, value, _ in cls.read_entries(data)}
+
+    def _add_key(self, key):
+        encoded = key.encode("utf-8")
+        padding = -(4 + len(encoded)) % 8
+        size = 4 + len(encoded) + padding + 8
+        while self._used + size > self._capacity:
+            self._capacity *= 2
+            self._mmap.close()
+            self._file.truncate(self._capacity)
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        position = self._used
+        struct.pack_into(f"i{len(encoded)}s{padding}x", self._mmap, position, len(encoded), encoded)
+        value_position = position + size - 8
+        struct.pack_into("d", self._mmap, value_position, 0.0)
+        self._used += size
+        struct.pack_into("q", self._mmap, 0, self._used)  # длина меняется после записи ключа и значения
+        self._positions[key] = value_position
+        return value_position
+
+    def increment(self, key, amount):
+        position = self._positions.get(key) or self._add_key(key)
+        value = struct.unpack_from("d", self._mmap, position)[0]
+        struct.pack_into("d", self._mmap, position, value + amount)
+
+    def set(self, key, value):
+        position = self._positions.get(key) or self._add_key(key)
+        struct.pack_into("d", self._mmap, position, value)
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class MemoryDict(dict):
+    """Хранилище метрик в памяти процесса, если METRICS_DIR не задан (один процесс, runserver)"""
+
+    def increment(self, key, amount):
+        self[key] = self.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        self[key] = value
+
+
+class MetricsStore:
+    """
+    Метрики текущего процесса: счетчики и гистограммы в counter_<pid>.db, значения(gauge) в gauge_<pid>.db
+    Файлы счетчиков остаются и после завершения процесса(воркер gunicorn перезапущен) - суммы не уменьшаются,
+    значения завершенных процессов при сборе не учитываются
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.counters = MmapDict(os.path.join(directory, f"counter_{self.pid}.db"))
+            self.gauges = MmapDict(os.path.join(directory, f"gauge_{self.pid}.db"))
+        else:
+            self.counters = MemoryDict()
+            self.gauges = MemoryDict()
+        self.pools_updated = 0.0
+
+    def increment(self, key, amount):
+        with self.lock:
+            self.counters.increment(key, amount)
+
+    def set(self, key, value):
+        with self.lock:
+            self.gauges.set(key, value)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Хранилище метрик процесса, после fork(воркеры gunicorn) у потомка - свои файлы"""
+
+    global _store
+    directory = settings.METRICS_DIR
+    store = _store
+    if store is None or store.pid != os.getpid() or store.directory != directory:
+        with _store_lock:
+            if _store is None or _store.pid != os.getpid() or _store.directory != directory:
+                _store = MetricsStore(directory)
+            store = _store
+    return store
+
+
+def sample_key(name, labels, le=None):
+    return json.dumps([name, sorted(labels.items()), le], ensure_ascii=False)
+
+
+class Metric:
+    """Семейство метрик: name, тип(counter, gauge, histogram), описание и границы корзин гистограммы"""
+
+    registry = dict()
+
+    def __init__(self, name, kind, documentation, buckets=()):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.buckets = buckets
+        Metric.registry[name] = self
+
+    def inc(self, amount=1, **labels):
+        get_store().increment(sample_key(self.name, labels), amount)
+
+    def set(self, value, **labels):
+        get_store().set(sample_key(self.name, labels), value)
+
+    def observe(self, value, **labels):
+        """Значение гистограммы: в файле хранится количество по корзинам, накопительные суммы - при выводе"""
+
+        index = bisect_left(self.buckets, value)
+        le = self.buckets[index] if index < len(self.buckets) else "+Inf"
+        store = get_store()
+        with store.lock:
+            store.counters.increment(sample_key(self.name, labels, le), 1)
+            store.counters.increment(sample_key(f"{self.name}_sum", labels), value)
+
+
+REQUEST_LATENCY = Metric(
+    "http_request_duration_seconds", "histogram", "Время ответа по имени адреса", LATENCY_BUCKETS
+)
+REQUESTS = Metric("http_requests_total", "counter", "Количество запросов по имени адреса и статусу ответа")
+RESPONSE_SIZE = Metric("http_response_size_bytes", "histogram", "Размер ответа(кроме потоковых)", SIZE_BUCKETS)
+DB_QUERIES = Metric("db_queries_total", "counter", "Количество запросов к базе данных по имени адреса")
+DB_DURATION = Metric("db_query_duration_seconds_total", "counter", "Время запросов к базе данных по имени адреса")
+CACHE_REQUESTS = Metric("cache_requests_total", "counter", "Обращения к кэшам: result=hit|miss")
+CACHE_HIT_RATIO = Metric("cache_hit_ratio", "gauge", "Доля попаданий в кэш (по всем процессам с их запуска)")
+DB_POOL = Metric("db_pool", "gauge", "Состояние пулов соединений (сумма по работающим процессам)")
+
+
+def cache_access(cache, hit):
+    """Учитывает обращение к кэшу (page, catalog_version, facet_counts)"""
+
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def update_pool_gauges(store):
+    """Записывает состояние пулов соединений процесса, не чаще раза в POOL_UPDATE_INTERVAL секунд"""
+
+    now = time.monotonic()
+    if now - store.pools_updated < POOL_UPDATE_INTERVAL:
+        return
+    store.pools_updated = now
+    for pool, stats in all_pool_stats().items():
+        for stat, value in stats.items():
+            DB_POOL.set(value, pool=pool, stat=stat)
+
+
+class QueryCounter:
+    """Обертка execute: только количество и время запросов (без отпечатков, как в profiling.QueryRecorder)"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Метрики каждого запроса с меткой view - имя адреса(home, detail_book, api:list_book):
+    время ответа, размер ответа, количество и время запросов к базе данных
+    Для потоковых ответов(выгрузка каталога) время - до начала отдачи, размер не учитывается
+    Работает и синхронно, и асинхронно (под ASGI цепочка middleware не уходит в sync_to_async)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with observe_queries(counter):
+            response = self.get_response(request)
+        return self.observe(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with observe_queries(counter):
+            response = await self.get_response(request)
+        return self.observe(request, response, counter, started)
+
+    @staticmethod
+    def observe(request, response, counter, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match is not None else "unmatched"
+        REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        REQUESTS.inc(view=view, method=request.method, status=str(response.status_code))
+        DB_QUERIES.inc(counter.count, view=view)
+        DB_DURATION.inc(counter.duration, view=view)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view=view)
+        update_pool_gauges(get_store())
+        return response
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """
+    Суммы значений по всем процессам: {ключ: значение}
+    Счетчики берутся из всех файлов, значения(gauge) - только работающих процессов, файлы остальных удаляются
+    """
+
+    store = get_store()
+    if not store.directory:
+        with store.lock:
+            return {**store.counters, **store.gauges}
+    samples = dict()
+    for kind in ("counter", "gauge"):
+        for path in glob.glob(os.path.join(store.directory, f"{kind}_*.db")):
+            if kind == "gauge":
+                pid = int(os.path.basename(path)[len("gauge_"):-len(".db")])
+                if not pid_alive(pid):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+            try:
+                values = MmapDict.read_file(path)
+            except OSError:
+                continue
+            for key, value in values.items():
+                samples[key] = samples.get(key, 0.0) + value
+    return samples
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def exposition():
+    """Метрики всех процессов в текстовом формате Prometheus"""
+
+    families = dict()
+    for key, value in collect().items():
+        name, labels, le = json.loads(key)
+        family = name[:-len("_sum")] if name.endswith("_sum") and name[:-len("_sum")] in Metric.registry else name
+        families.setdefault(family, dict()).setdefault(tuple(map(tuple, labels)), dict())[(name, le)] = value
+
+    hits = dict()
+    for labels, values in families.get(CACHE_REQUESTS.name, dict()).items():
+        labels = dict(labels)
+        total = hits.setdefault(labels["cache"], [0.0, 0.0])
+        total[0] += values[(CACHE_REQUESTS.name, None)] if labels["result"] == "hit" else 0.0
+        total[1] += values[(CACHE_REQUESTS.name, None)]
+    families[CACHE_HIT_RATIO.name] = {
+        (("cache", cache),): {(CACHE_HIT_RATIO.name, None): hit / total} for cache, (hit, total) in hits.items()
+    }
+
+    lines = list()
+    for name in sorted(families):
+        metric = Metric.registry.get(name)
+        if metric is None:
+            continue
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels in sorted(families[name]):
+            values = families[name][labels]
+            if metric.kind != "histogram":
+                lines.append(f"{name}{format_labels(labels)} {format_value(values[(name, None)])}")
+                continue
+            cumulative = 0.0
+            for le in (*metric.buckets, "+Inf"):
+                cumulative += values.get((name, le), 0.0)
+                lines.append(f"{name}_bucket{format_labels((*labels, ('le', str(le))))} {format_value(cumulative)}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(values.get((f'{name}_sum', None), 0.0))}")
+            lines.append(f"{name}_count{format_labels(labels)} {format_value(cumulative)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.4 on 2026-10-18 14:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+DOC_TABLE = "book_management_booksearchdocument"
+FTS_TABLE = f"{DOC_TABLE}_fts"
+
+
+def create_search_index(apps, schema_editor):
+    """GIN индекс по tsvector на PostgreSQL, FTS5 таблица с триггерами на SQLite"""
+
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX book_search_document_gin ON {DOC_TABLE} USING gin (to_tsvector('simple', document))"
+        )
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            if "ENABLE_FTS5" not in {row[0] for row in cursor.fetchall()}:
+                return  # без FTS5 поиск работает через LIKE
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"document, content='{DOC_TABLE}', content_rowid='book_id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.book_id, new.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.book_id, old.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.book_id, old.document); "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.book_id, new.document); END"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS book_search_document_gin")
+    elif connection.vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def fill_search_documents(apps, schema_editor):
+    """Строит поисковые документы для уже существующих книг"""
+
+    Book = apps.get_model("book_management", "Book")
+    BookSearchDocument = apps.get_model("book_management", "BookSearchDocument")
+    books = Book.objects.select_related("publisher").prefetch_related("author", "genre").order_by("pk")
+    batch = list()
+    for book in books.iterator(chunk_size=2000):
+        parts = [book.title]
+        parts.extend(f"{author.first_name} {author.last_name}" for author in book.author.all())
+        parts.append(book.publisher.title)
+        parts.extend(genre.title for genre in book.genre.all())
+        batch.append(BookSearchDocument(book_id=book.pk, document=" ".join(parts)))
+        if len(batch) >= 2000:
+            BookSearchDocument.objects.bulk_create(batch)
+            batch = list()
+    BookSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_management', '0002_alter_book_cover_alter_genre_title'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchDocument',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='book_management.book', verbose_name='Книга')),
+                ('document', models.TextField(verbose_name='Поисковый документ')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    ("author_name_trgm", "book_management_author", "(first_name || ' ' || last_name)"),
+    ("author_slug_trgm", "book_management_author", "slug"),
+    ("publisher_title_trgm", "book_management_publisher", "title"),
+    ("publisher_slug_trgm", "book_management_publisher", "slug"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """GIN индексы pg_trgm для нечеткого поиска (на остальных базах используется индекс в памяти)"""
+
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f"CREATE INDEX {name} ON {table} USING gin (({expression}) gin_trgm_ops)")
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_management', '0003_book_search_document'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
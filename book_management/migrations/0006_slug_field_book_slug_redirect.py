@@ -0,0 +1,51 @@
+# Generated by Django 4.2.4 on 2026-10-18 14:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_management', '0005_updated_at_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='author',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=250, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=250, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=250, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='language',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=250, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='publisher',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=250, unique=True),
+        ),
+        migrations.CreateModel(
+            name='BookSlugRedirect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_slug', models.CharField(max_length=250, unique=True, verbose_name='Старый slug')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slug_redirects', to='book_management.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Перенаправление книги',
+                'verbose_name_plural': 'Перенаправления книг',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_management', '0006_slug_field_book_slug_redirect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Копии обложки'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.4 on 2026-10-18 14:57
+
+import book_management.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def create_cover_blobs(apps, schema_editor):
+    """Счетчики ссылок для уже загруженных обложек"""
+
+    Book = apps.get_model("book_management", "Book")
+    CoverBlob = apps.get_model("book_management", "CoverBlob")
+    counts = Book.objects.exclude(cover="").exclude(cover__isnull=True).values("cover").annotate(refcount=Count("pk"))
+    CoverBlob.objects.bulk_create(
+        [CoverBlob(name=row["cover"], refcount=row["refcount"]) for row in counts], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_management', '0007_book_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Файл')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Размер')),
+                ('refcount', models.IntegerField(default=0, verbose_name='Количество книг')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Файл обложки',
+                'verbose_name_plural': 'Файлы обложек',
+            },
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='cover',
+            field=models.ImageField(blank=True, null=True, storage=book_management.storage.cover_storage, upload_to='covers', verbose_name='Обложка'),
+        ),
+        migrations.RunPython(create_cover_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.4 on 2026-10-18 15:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+LISTING_TABLE = "book_management_booklisting"
+
+
+def fill_book_listing(apps, schema_editor):
+    """Строит строки списка для уже существующих книг"""
+
+    Book = apps.get_model("book_management", "Book")
+    BookListing = apps.get_model("book_management", "BookListing")
+    books = Book.objects.select_related("publisher").prefetch_related("author", "genre", "language").order_by("pk")
+    batch = list()
+    for book in books.iterator(chunk_size=2000):
+        authors = [{"name": f"{author.first_name} {author.last_name}", "slug": author.slug}
+                   for author in book.author.all()]
+        genres = [{"title": genre.title, "slug": genre.slug} for genre in book.genre.all()]
+        languages = [{"title": language.title, "slug": language.slug} for language in book.language.all()]
+        tags = [f"author:{item['slug']}" for item in authors]
+        tags.extend(f"genre:{item['slug']}" for item in genres)
+        tags.extend(f"language:{item['slug']}" for item in languages)
+        batch.append(BookListing(
+            book_id=book.pk, title=book.title, slug=book.slug, year=book.year, show_book=book.show_book,
+            publisher_title=book.publisher.title, publisher_slug=book.publisher.slug, authors=authors,
+            genres=genres, languages=languages, tags=f" {' '.join(tags)} " if tags else "",
+        ))
+        if len(batch) >= 2000:
+            BookListing.objects.bulk_create(batch)
+            batch = list()
+    BookListing.objects.bulk_create(batch)
+
+
+def create_tags_index(apps, schema_editor):
+    """GIN индекс pg_trgm для фильтрации по tags (LIKE '%...%'), на остальных базах - без индекса"""
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"CREATE INDEX book_listing_tags_trgm ON {LISTING_TABLE} USING gin (tags gin_trgm_ops)")
+
+
+def drop_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS book_listing_tags_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_management', '0008_content_addressed_covers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookListing',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='book_management.book', verbose_name='Книга')),
+                ('title', models.CharField(max_length=200, verbose_name='Название книги')),
+                ('slug', models.CharField(max_length=250, verbose_name='Slug книги')),
+                ('year', models.IntegerField(verbose_name='Год издания')),
+                ('show_book', models.BooleanField(default=True, verbose_name='Показать книгу')),
+                ('publisher_title', models.CharField(max_length=100, verbose_name='Издательство')),
+                ('publisher_slug', models.CharField(db_index=True, max_length=250, verbose_name='Slug издательства')),
+                ('authors', models.JSONField(default=list, verbose_name='Авторы')),
+                ('genres', models.JSONField(default=list, verbose_name='Жанры')),
+                ('languages', models.JSONField(default=list, verbose_name='Языки')),
+                ('tags', models.TextField(default='', verbose_name='Теги')),
+            ],
+            options={
+                'verbose_name': 'Строка списка книг',
+                'verbose_name_plural': 'Строки списка книг',
+                'indexes': [models.Index(fields=['show_book', 'title', 'book'], name='book_listing_show_title')],
+            },
+        ),
+        migrations.RunPython(create_tags_index, drop_tags_index),
+        migrations.RunPython(fill_book_listing, migrations.RunPython.noop),
+    ]
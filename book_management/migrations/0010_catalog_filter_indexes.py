@@ -0,0 +1,42 @@
+# Generated by Django 4.2.4 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_management', '0009_book_listing'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booklisting',
+            name='publisher_slug',
+            field=models.CharField(max_length=250, verbose_name='Slug издательства'),
+        ),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['first_name', 'id'], name='author_first_name_id'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('show_book', True)), fields=['title', 'id'], name='book_visible_title'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'year'], name='book_title_year'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['year'], name='book_year'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['updated_at'], name='book_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='booklisting',
+            index=models.Index(fields=['publisher_slug', 'title', 'book'], name='book_listing_publisher_title'),
+        ),
+    ]
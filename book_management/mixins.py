@@ -1,5 +1,12 @@
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.messages import get_messages
+from django.http import Http404
 from django.shortcuts import redirect
+from .models import BookListing
+from .pagination import KeysetPaginator, InvalidCursor, EstimatedCountPaginator
+from .cache import get_cached_response, set_cached_response, book_row_tags, listing_row_tags
+from .versioning import replica_caught_up
 
 
 class MixinCreateView:
@@ -26,3 +33,71 @@ class MixinCreateView:
         """Если форма не валидна будет показ сообщения"""
         messages.error(self.request, self.error_message)
         return super().form_invalid(form)
+
+
+class MixinCursorPagination:
+    """
+    Миксин keyset-пагинации для ListView
+    cursor_ordering - поля сортировки, последнее поле должно быть уникальным
+    Старые ссылки вида ?page=N продолжают работать через EstimatedCountPaginator
+    """
+    paginator_class = EstimatedCountPaginator
+    cursor_ordering = ("title", "id")
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        """Возвращает (paginator, page, object_list, is_paginated) как и ListView"""
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise Http404("Неверный курсор страницы")
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class MixinResponseCache:
+    """
+    Миксин кэширования страницы списка книг с тегами
+    Запись кэша помечается тегом представления (get_cache_tags) и тегами всех книг на странице,
+    сигналы инвалидируют только затронутые записи (book_management/signals.py)
+    Страницы с непоказанными сообщениями не кэшируются и не берутся из кэша,
+    прочитанные с отстающей реплики - не кэшируются (versioning.replica_caught_up)
+    """
+
+    def get_cache_tags(self):
+        """Теги, общие для всех страниц этого представления"""
+        return ["books"]
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != "GET" or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        cached = get_cached_response(request)
+        if cached is not None:
+            return cached
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(self._store_response)
+        return response
+
+    def _store_response(self, response):
+        """Сохраняет отрисованную страницу вместе с тегами строк"""
+        if not replica_caught_up():
+            response["X-Cache"] = "MISS"
+            return
+        tags = list(self.get_cache_tags())
+        for book in response.context_data.get("object_list", ()):
+            tags.extend(listing_row_tags(book) if isinstance(book, BookListing) else book_row_tags(book))
+        set_cached_response(self.request, response, tags)
+
+
+class MixinTemplateEngine:
+    """
+    Миксин выбора шаблонизатора страниц каталога: settings.CATALOG_TEMPLATE_ENGINE (django или jinja2)
+    Шаблоны jinja2/ повторяют templates/ с тем же контекстом, сравнить время отрисовки - benchmark_templates
+    """
+
+    @property
+    def template_engine(self):
+        return settings.CATALOG_TEMPLATE_ENGINE
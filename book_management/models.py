@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from .utils import BaseModelWithSlug, path_cover_for_book
+from .utils import BaseModelWithSlug, path_cover_for_book  # noqa: F401 path_cover_for_book нужен старым миграциям
+from .storage import COVERS_DIR, cover_storage
+from . import covers
 from django.urls import reverse_lazy
 
 
@@ -14,7 +16,10 @@ class Book(BaseModelWithSlug):
     genre = models.ManyToManyField("Genre", related_name="genre", verbose_name="Жанр")
     language = models.ManyToManyField("Language", related_name="language", verbose_name="Язык книги")
     pages = models.IntegerField(default=0, verbose_name="Страницы")
-    cover = models.ImageField(upload_to=path_cover_for_book, verbose_name="Обложка", blank=True, null=True)
+    cover = models.ImageField(
+        upload_to=COVERS_DIR, storage=cover_storage, verbose_name="Обложка", blank=True, null=True
+    )
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Копии обложки")
     year = models.IntegerField(
         verbose_name="Год издания",
         validators=[
@@ -30,6 +35,13 @@ class Book(BaseModelWithSlug):
         """
         verbose_name = "Книга"
         verbose_name_plural = "Книги"
+        indexes = [
+            # видимые книги по названию(API list-book, курсор title, id) - скрытые книги в индекс не попадают
+            models.Index(fields=["title", "id"], condition=models.Q(show_book=True), name="book_visible_title"),
+            models.Index(fields=["title", "year"], name="book_title_year"),  # сортировка в админке
+            models.Index(fields=["year"], name="book_year"),  # фильтр по году в админке
+            models.Index(fields=["updated_at"], name="book_updated_at"),  # выгрузка ?since=
+        ]
 
     def get_absolute_url(self):
         """Согласно конвенции абсолютный путь к конкретной книге"""
@@ -38,16 +50,28 @@ class Book(BaseModelWithSlug):
         }
         return reverse_lazy("detail_book", kwargs=context)
 
+    @property
+    def thumbnail_url(self):
+        """Маленькая копия обложки(до ее готовности - оригинал)"""
+        return covers.thumbnail_url(self)
+
+    @property
+    def srcset(self):
+        """srcset копий обложки в формате WebP"""
+        return covers.srcset(self)
+
+    def slug_changed(self, old_slug):
+        """Старый адрес книги перенаправляется на новый"""
+        BookSlugRedirect.objects.filter(old_slug=self.slug).delete()
+        BookSlugRedirect.objects.update_or_create(old_slug=old_slug, defaults={"book": self})
+
 
 class Author(BaseModelWithSlug):
     """Модель таблицы для автора книги"""
     first_name = models.CharField(max_length=70, verbose_name="Имя автора")
     last_name = models.CharField(max_length=100, verbose_name="Фамилия автора")
     country = models.CharField(max_length=168, blank=True, verbose_name="Страна")
-
-    def save(self, *args, **kwargs):
-        self.slug_field = self.first_name
-        super().save(*args, **kwargs)
+    slug_source_field = "first_name"
 
     def __str__(self):
         """Преобразует объект в строку"""
@@ -62,6 +86,9 @@ class Author(BaseModelWithSlug):
         verbose_name = "Автор"
         verbose_name_plural = "Авторы"
         ordering = ["first_name"]
+        indexes = [
+            models.Index(fields=["first_name", "id"], name="author_first_name_id"),  # курсор списка авторов
+        ]
 
 
 class Publisher(BaseModelWithSlug):
@@ -103,3 +130,113 @@ class Language(BaseModelWithSlug):
         """
         verbose_name = "Язык книги"
         verbose_name_plural = "Языки книги"
+
+
+class BookSearchDocument(models.Model):
+    """
+    Денормализованный поисковый документ книги
+    (название, авторы, издательство, жанры в одной строке)
+    Обновляется сигналами, индексируется tsvector+GIN на PostgreSQL или FTS5 на SQLite
+    """
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name="search_document", verbose_name="Книга"
+    )
+    document = models.TextField(verbose_name="Поисковый документ")
+
+    class Meta:
+        verbose_name = "Поисковый документ"
+        verbose_name_plural = "Поисковые документы"
+
+    def __str__(self):
+        return self.document
+
+
+class BookListing(models.Model):
+    """
+    Денормализованная строка книги для страниц списков (index.html)
+    Авторы, жанры, языки и издательство хранятся в самой строке, поэтому страница списка - один запрос без JOIN
+    tags - " author:<slug> genre:<slug> language:<slug> " для фильтрации по связанным объектам
+    Обновляется сигналами, полная пересборка - команда rebuild_book_listing
+    """
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name="listing", verbose_name="Книга"
+    )
+    title = models.CharField(max_length=200, verbose_name="Название книги")
+    slug = models.CharField(max_length=250, verbose_name="Slug книги")
+    year = models.IntegerField(verbose_name="Год издания")
+    show_book = models.BooleanField(default=True, verbose_name="Показать книгу")
+    publisher_title = models.CharField(max_length=100, verbose_name="Издательство")
+    publisher_slug = models.CharField(max_length=250, verbose_name="Slug издательства")
+    authors = models.JSONField(default=list, verbose_name="Авторы")  # [{"name": ..., "slug": ...}]
+    genres = models.JSONField(default=list, verbose_name="Жанры")  # [{"title": ..., "slug": ...}]
+    languages = models.JSONField(default=list, verbose_name="Языки")  # [{"title": ..., "slug": ...}]
+    tags = models.TextField(default="", verbose_name="Теги")
+
+    class Meta:
+        verbose_name = "Строка списка книг"
+        verbose_name_plural = "Строки списка книг"
+        indexes = [
+            models.Index(fields=["show_book", "title", "book"], name="book_listing_show_title"),
+            # книги издательства по названию (фильтр и сортировка одним индексом)
+            models.Index(fields=["publisher_slug", "title", "book"], name="book_listing_publisher_title"),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        """Адрес книги, как у Book.get_absolute_url"""
+        return reverse_lazy("detail_book", kwargs={"slug": self.slug})
+
+
+class CatalogVersion(models.Model):
+    """
+    Версия всего каталога (одна строка)
+    Увеличивается при любом изменении книг, авторов, издательств, жанров и языков,
+    используется для ETag/Last-Modified без загрузки самих объектов
+    """
+    version = models.BigIntegerField(default=0, verbose_name="Версия")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Версия каталога"
+        verbose_name_plural = "Версия каталога"
+
+    def __str__(self):
+        return f"{self.version}"
+
+
+class BookSlugRedirect(models.Model):
+    """Старые slug книги после переименования, чтобы ссылки на detail_book продолжали работать"""
+    old_slug = models.CharField(max_length=250, unique=True, verbose_name="Старый slug")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="slug_redirects", verbose_name="Книга")
+
+    class Meta:
+        """
+        Русские название разделов
+        в единственном и множественном числе
+        """
+        verbose_name = "Перенаправление книги"
+        verbose_name_plural = "Перенаправления книг"
+
+    def __str__(self):
+        """Преобразует объект в строку"""
+        return self.old_slug
+
+
+class CoverBlob(models.Model):
+    """
+    Файл обложки в хранилище по хэшу содержимого и количество книг, которые на него ссылаются
+    Файлы с нулевым счетчиком удаляет команда gc_covers
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Файл")
+    size = models.BigIntegerField(default=0, verbose_name="Размер")
+    refcount = models.IntegerField(default=0, verbose_name="Количество книг")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Файл обложки"
+        verbose_name_plural = "Файлы обложек"
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,250 @@
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, Page, PageNotAnInteger, EmptyPage
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    """Курсор не удалось разобрать (подделан или устарел)"""
+
+
+def encode_cursor(values, reverse=False):
+    """
+    Кодирует позицию курсора в непрозрачную строку
+    values - значения полей сортировки последнего(первого) объекта страницы
+    reverse - True, если курсор указывает на предыдущую страницу
+    """
+
+    payload = json.dumps({"v": list(values), "r": int(reverse)}, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Декодирует строку курсора, возвращает (values, reverse)"""
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return list(payload["v"]), bool(payload["r"])
+    except (binascii.Error, ValueError, UnicodeError, KeyError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+class KeysetPage:
+    """
+    Страница keyset-пагинации
+    Повторяет интерфейс django.core.paginator.Page, который используется в шаблонах
+    (has_next, has_previous, has_other_pages), но вместо номеров страниц хранит курсоры
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу (keyset/cursor) вместо OFFSET
+    queryset - набор объектов
+    per_page - количество объектов на странице
+    ordering - поля сортировки, последнее поле должно быть уникальным (обычно id)
+    Каждая страница стоит одинаково независимо от глубины: WHERE (title, id) > (...) ORDER BY title, id LIMIT n+1,
+    COUNT(*) не выполняется
+    """
+
+    def __init__(self, queryset, per_page, ordering=("title", "id")):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def _position_filter(self, values, reverse):
+        """Строит условие (f1, f2, ...) > (v1, v2, ...) через OR, так как кортежное сравнение не переносимо"""
+
+        lookup = "lt" if reverse else "gt"
+        condition = Q()
+        for idx, field in enumerate(self.ordering):
+            step = Q(**{f"{field}__{lookup}": values[idx]})
+            for prev_field, prev_value in zip(self.ordering[:idx], values[:idx]):
+                step &= Q(**{prev_field: prev_value})
+            condition |= step
+        return condition
+
+    def _values(self, obj):
+        """Значения полей сортировки объекта"""
+
+        return [getattr(obj, field) for field in self.ordering]
+
+    def _clean_values(self, values, cursor):
+        """Приводит значения курсора к типам полей сортировки, значение неверного типа - InvalidCursor"""
+
+        opts = self.queryset.model._meta
+        try:
+            values = [opts.get_field(field).to_python(value) for field, value in zip(self.ordering, values)]
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+        return values
+
+    def _page_queryset(self, cursor):
+        """Возвращает (queryset на per_page + 1 объект, значения курсора, reverse)"""
+
+        values, reverse = (None, False)
+        if cursor:
+            values, reverse = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            values = self._clean_values(values, cursor)
+
+        ordering = [f"-{field}" for field in self.ordering] if reverse else list(self.ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._position_filter(values, reverse))
+        return queryset[:self.per_page + 1], values, reverse
+
+    def _build_page(self, objects, values, reverse):
+        """Собирает KeysetPage из загруженных объектов"""
+
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if reverse:
+            objects.reverse()
+
+        next_cursor = previous_cursor = None
+        if objects:
+            if has_more or reverse:
+                next_cursor = encode_cursor(self._values(objects[-1]))
+            if (has_more and reverse) or (values is not None and not reverse):
+                previous_cursor = encode_cursor(self._values(objects[0]), reverse=True)
+        return KeysetPage(objects, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        """Возвращает страницу KeysetPage для курсора (None - первая страница)"""
+
+        queryset, values, reverse = self._page_queryset(cursor)
+        return self._build_page(list(queryset), values, reverse)
+
+    async def apage(self, cursor=None):
+        """Асинхронный вариант page (queryset без prefetch_related, его не поддерживает aiterator)"""
+
+        queryset, values, reverse = self._page_queryset(cursor)
+        return self._build_page([obj async for obj in queryset.aiterator()], values, reverse)
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк по статистике планировщика PostgreSQL (None на других базах)
+    Без фильтров - pg_class.reltuples таблицы, с фильтрами - оценка строк из EXPLAIN
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    query = queryset.query
+    with connection.cursor() as cursor:
+        if not query.where and not query.distinct and query.low_mark == 0 and query.high_mark is None:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            if row is None or row[0] < 0:  # таблица еще не анализировалась
+                return None
+            return int(row[0])
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedPage(Page):
+    """
+    Страница EstimatedCountPaginator
+    При оценочном количестве наличие следующей страницы определяется по одной лишней загруженной строке
+    """
+
+    def __init__(self, object_list, number, paginator, has_more=None):
+        super().__init__(object_list, number, paginator)
+        self._has_more = has_more
+
+    def has_next(self):
+        if self._has_more is not None:
+            return self._has_more
+        return super().has_next()
+
+    @property
+    def page_window(self):
+        """Номера страниц рядом с текущей (по две с каждой стороны) для _paginate.html"""
+
+        last = self.paginator.num_pages
+        if self._has_more is not None:
+            last = self.number + 2 if self._has_more else self.number
+        return range(max(1, self.number - 2), min(last, self.number + 2) + 1)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator без COUNT(*) на больших таблицах
+    Если оценка планировщика(estimate_count) не меньше PAGINATOR_ESTIMATE_THRESHOLD, используется она
+    (estimated = True, в шаблоне - "about N pages"), иначе - точный COUNT(*)
+    Номер страницы за пределами оценки не считается ошибкой: оценка может быть меньше реального количества
+    """
+
+    estimated = False
+
+    def estimate(self):
+        if isinstance(self.object_list, QuerySet):
+            return estimate_count(self.object_list)
+        return None  # например, SearchResults: количество считает поисковый backend
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is not None and estimate >= settings.PAGINATOR_ESTIMATE_THRESHOLD:
+            self.estimated = True
+            return estimate
+        return super().count
+
+    def validate_number(self, number):
+        if not self.estimated:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Номер страницы не является числом")
+        if number < 1:
+            raise EmptyPage("Номер страницы меньше 1")
+        return number
+
+    def page(self, number):
+        if not (self.count and self.estimated):  # количество определяет режим
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return EstimatedPage(objects[:self.per_page], number, self, has_more=len(objects) > self.per_page)
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedPage(*args, **kwargs)
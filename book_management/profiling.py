@@ -0,0 +1,242 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r"\bIN \((?:%s, )*%s\)")
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """Отпечаток запроса: литералы и списки IN (...) заменены, чтобы запросы одного вида совпадали"""
+
+    sql = IN_LIST_RE.sub("IN (...)", sql)
+    return LITERAL_RE.sub("?", sql)
+
+
+class QueryRecorder:
+    """Обертка execute (connection.execute_wrapper): время и отпечатки запросов одного запроса к сайту"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+            self.statements[(sql, repr(params))] += 1
+
+
+_observers = ContextVar("query_observers", default=())
+
+
+def observed_execute(execute, sql, params, many, context):
+    """
+    Обертка execute каждого соединения: передает запрос наблюдателям текущего контекста (observe_queries)
+    Контекст копируется в потоки sync_to_async, поэтому под ASGI учитываются и запросы асинхронных представлений,
+    хотя соединения в этих потоках другие, чем в цикле событий
+    """
+
+    for observer in _observers.get():
+        execute = partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_observer(connection, **kwargs):
+    """Ставит observed_execute первой оберткой: execute_wrapper() снимает свои обертки с конца списка"""
+
+    if observed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, observed_execute)
+
+
+@contextmanager
+def observe_queries(observer):
+    """Передает observer(обертку execute, как QueryRecorder) все запросы к базе данных в этом контексте"""
+
+    for connection in connections.all(initialized_only=True):
+        install_observer(connection)
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
+
+
+class ProfileBuffer:
+    """Кольцевой буфер последних записей профилирования в памяти процесса"""
+
+    def __init__(self, size):
+        self.records = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def all(self):
+        with self.lock:
+            return list(self.records)
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_profile_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ProfileBuffer(settings.QUERY_PROFILING_BUFFER_SIZE)
+    return _buffer
+
+
+def view_name(request):
+    """Имя представления: класс(AllBookView, ListBook), BookAdmin.changelist_view для админки или функция"""
+
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return ""
+    func = match.func
+    model_admin = getattr(func, "model_admin", None)
+    if model_admin is not None:
+        return f"{type(model_admin).__name__}.{func.__name__}"
+    view_class = getattr(func, "view_class", None) or getattr(func, "cls", None)
+    return getattr(view_class or func, "__name__", match.view_name)
+
+
+def build_record(request, response, recorder, total):
+    """
+    Запись профилирования запроса
+    duplicates - одинаковый SQL с одинаковыми параметрами, n_plus_one - отпечаток, повторенный
+    не меньше QUERY_PROFILING_N_PLUS_ONE раз (обычно обращение к связи в цикле без prefetch_related)
+    """
+
+    threshold = settings.QUERY_PROFILING_N_PLUS_ONE
+    duplicates = Counter()
+    for (sql, _), count in recorder.statements.items():
+        if count > 1:
+            duplicates[fingerprint(sql)] += count
+    return {
+        "time": timezone.now().isoformat(),
+        "view": view_name(request),
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "queries": recorder.count,
+        "db_ms": round(recorder.duration * 1000, 2),
+        "total_ms": round(total * 1000, 2),
+        "duplicates": [{"fingerprint": sql, "count": count} for sql, count in duplicates.most_common(5)],
+        "n_plus_one": [
+            {"fingerprint": sql, "count": count} for sql, count in recorder.fingerprints.most_common(5)
+            if count >= threshold
+        ],
+    }
+
+
+class QueryProfilingMiddleware:
+    """
+    Выборочное профилирование запросов к базе данных (вместо debug_toolbar, работает и с DEBUG = False)
+    Профилируется доля QUERY_PROFILING_SAMPLE_RATE запросов: количество и время запросов, дубликаты, N+1,
+    имя представления. Запись попадает в кольцевой буфер процесса (страница admin/query-profile/)
+    и в лог book_management.profiling одной строкой JSON
+    Остальные запросы обрабатываются без записи: стоимость - random() и чтение ContextVar на запрос к базе
+    Работает и синхронно, и асинхронно (под ASGI цепочка middleware не уходит в sync_to_async)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def sampled():
+        rate = settings.QUERY_PROFILING_SAMPLE_RATE
+        return rate and random.random() < rate
+
+    @staticmethod
+    def save(request, response, recorder, started):
+        record = build_record(request, response, recorder, time.perf_counter() - started)
+        get_profile_buffer().add(record)
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with observe_queries(recorder):
+            response = self.get_response(request)
+        self.save(request, response, recorder, started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with observe_queries(recorder):
+            response = await self.get_response(request)
+        self.save(request, response, recorder, started)
+        return response
+
+
+def worst_endpoints(records, order="queries", limit=50):
+    """
+    Сводка по представлениям, худшие - первыми
+    order - queries(среднее количество запросов), db_ms(среднее время в базе), total_ms(максимальное время ответа)
+    """
+
+    groups = dict()
+    for record in records:
+        groups.setdefault(record["view"] or record["path"], []).append(record)
+    summary = list()
+    for name, items in groups.items():
+        n_plus_one = Counter()
+        for item in items:
+            for entry in item["n_plus_one"]:
+                n_plus_one[entry["fingerprint"]] += 1
+        summary.append({
+            "view": name,
+            "samples": len(items),
+            "queries": round(sum(item["queries"] for item in items) / len(items), 1),
+            "max_queries": max(item["queries"] for item in items),
+            "db_ms": round(sum(item["db_ms"] for item in items) / len(items), 2),
+            "total_ms": max(item["total_ms"] for item in items),
+            "duplicates": sum(1 for item in items if item["duplicates"]),
+            "n_plus_one": n_plus_one.most_common(1)[0][0] if n_plus_one else "",
+        })
+    summary.sort(key=lambda item: item[order], reverse=True)
+    return summary[:limit]
@@ -0,0 +1,187 @@
+import re
+from functools import lru_cache
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from .models import Book, BookSearchDocument
+
+SEARCH_CONFIG = "simple"  # конфигурация tsvector, должна совпадать с выражением GIN индекса в миграции
+FTS_TABLE = f"{BookSearchDocument._meta.db_table}_fts"
+
+
+def build_document(book):
+    """Собирает поисковый документ книги: название, авторы, издательство, жанры"""
+
+    parts = [book.title]
+    parts.extend(f"{author.first_name} {author.last_name}" for author in book.author.all())
+    parts.append(book.publisher.title)
+    parts.extend(genre.title for genre in book.genre.all())
+    return " ".join(parts)
+
+
+def reindex_books(book_ids, chunk_size=1000):
+    """Пересобирает поисковые документы указанных книг (фиксированное количество запросов на пачку)"""
+
+    book_ids = list(book_ids)
+    for idx in range(0, len(book_ids), chunk_size):
+        chunk = book_ids[idx:idx + chunk_size]
+        books = Book.objects.filter(pk__in=chunk).select_related("publisher").prefetch_related("author", "genre")
+        documents = [BookSearchDocument(book=book, document=build_document(book)) for book in books]
+        BookSearchDocument.objects.filter(book_id__in=chunk).delete()
+        BookSearchDocument.objects.bulk_create(documents)
+
+
+def search_terms(query):
+    """Разбивает строку запроса на слова"""
+
+    return re.findall(r"\w+", query or "")
+
+
+class BaseSearchBackend:
+    """
+    Базовый поисковый backend (LIKE по денормализованному документу, без ранжирования)
+    Используется, если база данных не поддерживает полнотекстовый индекс
+    """
+
+    doc_table = BookSearchDocument._meta.db_table
+    book_table = Book._meta.db_table
+
+    def match_sql(self, terms):
+        """Возвращает (sql, params) условия совпадения для таблицы документов с псевдонимом d"""
+
+        sql = " AND ".join("UPPER(d.document) LIKE UPPER(%s)" for _ in terms)
+        return sql, [f"%{term}%" for term in terms]
+
+    def rank_sql(self):
+        """Выражение ранжирования (чем меньше - тем выше в выдаче)"""
+
+        return "b.title"
+
+    def extra_from(self):
+        """Дополнительные таблицы для FROM"""
+
+        return ""
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def search(self, query, limit, offset=0):
+        """Возвращает id видимых книг, отсортированные по релевантности"""
+
+        terms = search_terms(query)
+        if not terms:
+            return []
+        match, params = self.match_sql(terms)
+        sql = (
+            f"SELECT d.book_id FROM {self.doc_table} d JOIN {self.book_table} b ON b.id = d.book_id{self.extra_from()} "
+            f"WHERE {match} AND b.show_book ORDER BY {self.rank_sql()}, d.book_id LIMIT %s OFFSET %s"
+        )
+        return [row[0] for row in self._execute(sql, params + [limit, offset])]
+
+    def count(self, query):
+        """Количество найденных видимых книг"""
+
+        terms = search_terms(query)
+        if not terms:
+            return 0
+        match, params = self.match_sql(terms)
+        sql = (
+            f"SELECT COUNT(*) FROM {self.doc_table} d JOIN {self.book_table} b ON b.id = d.book_id{self.extra_from()} "
+            f"WHERE {match} AND b.show_book"
+        )
+        return self._execute(sql, params)[0][0]
+
+    def filter_queryset(self, queryset, query):
+        """Фильтрует queryset книг по совпадению с запросом (без учета show_book, для админки)"""
+
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        match, params = self.match_sql(terms)
+        sql = f"SELECT d.book_id FROM {self.doc_table} d{self.extra_from()} WHERE {match}"
+        return queryset.filter(pk__in=RawSQL(sql, params))
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Полнотекстовый поиск PostgreSQL: to_tsvector по документу с GIN индексом, ранжирование ts_rank"""
+
+    vector = f"to_tsvector('{SEARCH_CONFIG}', d.document)"
+
+    def match_sql(self, terms):
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return f"{self.vector} @@ to_tsquery('{SEARCH_CONFIG}', %s)", [tsquery]
+
+    def search(self, query, limit, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        match, params = self.match_sql(terms)
+        sql = (
+            f"SELECT d.book_id FROM {self.doc_table} d JOIN {self.book_table} b ON b.id = d.book_id "
+            f"WHERE {match} AND b.show_book "
+            f"ORDER BY ts_rank({self.vector}, to_tsquery('{SEARCH_CONFIG}', %s)) DESC, d.book_id LIMIT %s OFFSET %s"
+        )
+        return [row[0] for row in self._execute(sql, params + params + [limit, offset])]
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """Полнотекстовый поиск SQLite FTS5 (локальный запуск), ранжирование bm25"""
+
+    def extra_from(self):
+        return f" JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = d.book_id"
+
+    def match_sql(self, terms):
+        fts_query = " ".join(f'"{term}"*' for term in terms)
+        return f"{FTS_TABLE} MATCH %s", [fts_query]
+
+    def rank_sql(self):
+        return f"bm25({FTS_TABLE})"
+
+
+@lru_cache(maxsize=None)
+def _backend_for(vendor, has_fts):
+    if vendor == "postgresql":
+        return PostgresSearchBackend()
+    if vendor == "sqlite" and has_fts:
+        return SQLiteSearchBackend()
+    return BaseSearchBackend()
+
+
+def get_search_backend():
+    """Возвращает поисковый backend для текущей базы данных"""
+
+    has_fts = False
+    if connection.vendor == "sqlite":
+        has_fts = FTS_TABLE in connection.introspection.table_names()
+    return _backend_for(connection.vendor, has_fts)
+
+
+class SearchResults:
+    """
+    Ленивый результат поиска для Paginator
+    Считает количество и загружает книги только для запрошенной страницы, сохраняя порядок релевантности
+    """
+
+    def __init__(self, query, queryset, backend=None):
+        self.query = query
+        self.queryset = queryset
+        self.backend = backend or get_search_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = item.stop if item.stop is not None else self.count()
+        ids = self.backend.search(self.query, limit=max(stop - start, 0), offset=start)
+        books = self.queryset.in_bulk(ids)
+        return [books[pk] for pk in ids if pk in books]
@@ -0,0 +1,140 @@
+import random
+from itertools import accumulate
+from django.utils import timezone
+from .models import Author, Publisher, Genre, Language
+from .slugs import allocate_slugs
+
+TITLE_WORDS = (
+    "тайна", "дорога", "город", "ночь", "море", "звезда", "тень", "сад", "остров", "зима", "лето", "дом", "ветер",
+    "огонь", "время", "память", "сердце", "река", "небо", "песня", "письмо", "ключ", "маяк", "лес", "мост", "окно",
+    "путь", "сон", "берег", "война", "мир", "свет", "камень", "голос", "последний", "забытый", "северный", "золотой",
+    "тихий", "долгий", "черный", "белый", "старый", "новый", "далекий", "первый", "чужой", "ледяной", "красный",
+)
+FIRST_NAMES = (
+    "Александр", "Мария", "Иван", "Анна", "Сергей", "Елена", "Дмитрий", "Ольга", "Андрей", "Наталья", "Михаил",
+    "Татьяна", "Николай", "Ирина", "Владимир", "Светлана", "Алексей", "Екатерина", "Павел", "Юлия", "John", "Emma",
+)
+LAST_NAMES = (
+    "Иванов", "Петрова", "Смирнов", "Кузнецова", "Попов", "Васильева", "Соколов", "Михайлова", "Новиков", "Федорова",
+    "Морозов", "Волкова", "Алексеев", "Лебедева", "Семенов", "Егорова", "Павлов", "Козлова", "Степанов", "Smith",
+)
+COUNTRIES = ("Россия", "Беларусь", "Украина", "Казахстан", "США", "Великобритания", "Франция", "Германия")
+GENRES = (
+    "Роман", "Фантастика", "Фэнтези", "Детектив", "Триллер", "Ужасы", "Приключения", "Поэзия", "Драма", "Сказки",
+    "История", "Биография", "Наука", "Психология", "Философия", "Бизнес", "Программирование", "Кулинария", "Путешествия",
+)
+LANGUAGES = (
+    "Русский", "Белорусский", "Украинский", "Английский", "Немецкий", "Французский", "Испанский", "Итальянский",
+    "Польский", "Китайский", "Японский",
+)
+
+
+def parse_range(value):
+    """Диапазон из строки: "2" -> (2, 2), "1-3" -> (1, 3)"""
+
+    low, _, high = str(value).partition("-")
+    low, high = int(low), int(high or low)
+    if low < 1 or high < low:
+        raise ValueError(f"неверный диапазон: {value}")
+    return low, high
+
+
+def unique_names(model, values, count, limit):
+    """count новых уникальных названий: сначала из списка values, дальше - с номером (не длиннее limit символов)"""
+
+    taken = set(model.objects.values_list("title", flat=True))
+    names = [value for value in values if value not in taken][:count]
+    number = 0
+    while len(names) < count:
+        number += 1
+        suffix = f" {number}"
+        name = f"{values[number % len(values)][:limit - len(suffix)]}{suffix}"
+        if name not in taken:
+            taken.add(name)
+            names.append(name)
+    return names
+
+
+def create_reference(count, rng):
+    """
+    Создает авторов, издательства, жанры и языки через bulk_create (slug выделяются пачкой)
+    count - {"author": N, "publisher": N, "genre": N, "language": N}
+    Возвращает {"author": [id], ...}
+    """
+
+    authors = [
+        Author(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), country=rng.choice(COUNTRIES))
+        for _ in range(count["author"])
+    ]
+    publishers = [
+        Publisher(title=title, address=f"г. {rng.choice(TITLE_WORDS).title()}, ул. {rng.randint(1, 200)}")
+        for title in unique_names(
+            Publisher, [f"Издательство {word.title()}" for word in TITLE_WORDS], count["publisher"], 100
+        )
+    ]
+    genres = [Genre(title=title) for title in unique_names(Genre, GENRES, count["genre"], 50)]
+    languages = [Language(title=title) for title in unique_names(Language, LANGUAGES, count["language"], 30)]
+
+    ids = dict()
+    for name, model, objects in (
+            ("author", Author, authors), ("publisher", Publisher, publishers),
+            ("genre", Genre, genres), ("language", Language, languages)
+    ):
+        for obj, slug in zip(objects, allocate_slugs(model, [obj.slug_source() for obj in objects])):
+            obj.slug = slug
+            if model is Publisher:
+                obj.email_address = f"{slug}@example.com"  # email уникален, пустой допустим только у одного
+        model.objects.bulk_create(objects, batch_size=1000)
+        ids[name] = [obj.pk for obj in objects]
+    return ids
+
+
+class CatalogGenerator:
+    """
+    Генератор строк книг для bulk_create_books/copy_books
+    Популярность авторов, издательств и жанров распределена по закону Ципфа(skew - показатель):
+    у немногих авторов тысячи книг, у большинства - по одной-две, как в настоящем каталоге
+    fan_out - {"author": (min, max), "genre": (min, max), "language": (min, max)} связей на книгу
+    """
+
+    def __init__(self, ids, fan_out, skew=1.0, hidden_share=0.02, seed=None):
+        self.rng = random.Random(seed)
+        self.ids = ids
+        self.fan_out = fan_out
+        self.hidden_share = hidden_share
+        self.year = timezone.now().year
+        self.weights = {
+            name: list(accumulate(1 / rank ** skew for rank in range(1, len(values) + 1)))
+            for name, values in ids.items()
+        }
+
+    def pick(self, name, count):
+        """count разных id связанной модели с учетом популярности"""
+
+        values = self.ids[name]
+        count = min(count, len(values))
+        picked = dict()
+        while len(picked) < count:
+            picked[self.rng.choices(values, cum_weights=self.weights[name])[0]] = None
+        return list(picked)
+
+    def title(self):
+        words = self.rng.sample(TITLE_WORDS, self.rng.randint(1, 4))
+        return " ".join(words).capitalize()
+
+    def row(self):
+        rng = self.rng
+        row = {
+            "title": self.title(),
+            "publisher": self.pick("publisher", 1)[0],
+            "pages": min(max(int(rng.lognormvariate(5.6, 0.5)), 16), 2000),
+            "year": int(rng.triangular(1800, self.year, self.year)),  # новых книг больше, чем старых
+            "show_book": rng.random() >= self.hidden_share,
+        }
+        for name, (low, high) in self.fan_out.items():
+            row[name] = self.pick(name, rng.randint(low, high))
+        return row
+
+    def rows(self, count):
+        for _ in range(count):
+            yield self.row()
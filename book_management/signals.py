@@ -0,0 +1,250 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Book, Author, Publisher, Genre, Language
+from .cache import invalidate_tags, book_tags
+from .versioning import bump_catalog_version
+from .search import reindex_books
+from .listing import refresh_listings
+from .fuzzy import author_lookup, publisher_lookup
+from .covers import schedule_cover_variants, change_cover_refs
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, **kwargs):
+    """Обновляет поисковый документ после сохранения книги"""
+
+    reindex_books([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def book_listing_saved(sender, instance, **kwargs):
+    """Обновляет строку списка книг после сохранения книги"""
+
+    refresh_listings([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def book_cover_saved(sender, instance, raw=False, **kwargs):
+    """Ставит в очередь построение копий новой обложки"""
+
+    if not raw:
+        schedule_cover_variants(instance)
+
+
+@receiver(pre_save, sender=Book)
+def book_cover_before(sender, instance, **kwargs):
+    """Запоминает старый файл обложки для счетчика ссылок"""
+
+    instance._cover_before = ""
+    if instance.pk is not None:
+        instance._cover_before = sender.objects.filter(pk=instance.pk).values_list("cover", flat=True).first() or ""
+
+
+@receiver(post_save, sender=Book)
+def book_cover_refs(sender, instance, **kwargs):
+    """Обновляет счетчики ссылок на файлы обложек при замене обложки"""
+
+    cover = instance.cover.name or ""
+    before = getattr(instance, "_cover_before", "")
+    if cover != before:
+        change_cover_refs(added=[cover], removed=[before])
+
+
+@receiver(post_delete, sender=Book)
+def book_cover_released(sender, instance, **kwargs):
+    """Удаленная книга больше не ссылается на файл обложки"""
+
+    change_cover_refs(removed=[instance.cover.name])
+
+
+SEARCH_MODELS = (Author, Publisher, Genre)  # их названия входят в поисковый документ книги
+
+
+def related_book_ids(instance):
+    """id книг автора(издательства, жанра, языка): обратная связь называется как модель"""
+
+    return list(getattr(instance, instance._meta.model_name).values_list("pk", flat=True))
+
+
+def touch_books(book_ids):
+    """Дата изменения книг(выгрузка ?since=) при изменении связей, которые не сохраняют саму книгу"""
+
+    if book_ids:
+        Book.objects.filter(pk__in=list(book_ids)).update(updated_at=timezone.now())
+
+
+def books_relations_changed(book_ids, search=True, touch=True):
+    """
+    Все, что строится по связям книг book_ids: поисковые документы(search - если изменение в них входит),
+    строки списка книг и дата изменения книги(touch)
+    """
+
+    if search:
+        reindex_books(book_ids)
+    refresh_listings(book_ids)
+    if touch:
+        touch_books(book_ids)
+
+
+@receiver(m2m_changed, sender=Book.author.through)
+@receiver(m2m_changed, sender=Book.genre.through)
+@receiver(m2m_changed, sender=Book.language.through)
+def book_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Изменение авторов, жанров или языков книги: поисковые документы, строки списка, дата изменения книг,
+    кэш страниц и версия каталога
+    reverse=True - изменение со стороны автора(жанра, языка), instance - автор(жанр, язык), pk_set - id книг
+    Тег списка книг связанного объекта имеет вид books:<имя модели>:<slug>, например books:genre:fantastika
+    """
+
+    if action == "pre_clear":  # после очистки связанные объекты уже не найти, при post_clear pk_set пуст
+        instance._cleared_pks = related_book_ids(instance) if reverse else list(
+            getattr(instance, model._meta.model_name).values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    pks = pk_set if pk_set is not None else getattr(instance, "_cleared_pks", ())
+    book_ids = pks if reverse else [instance.pk]
+    books_relations_changed(book_ids, search=sender is not Book.language.through)
+    if reverse:
+        tags = [f"books:{instance._meta.model_name}:{instance.slug}"]
+        tags.extend(f"book:{pk}" for pk in pks)
+    else:
+        tags = [f"book:{instance.pk}"]
+        tags.extend(f"books:{model._meta.model_name}:{slug}" for slug in
+                    model.objects.filter(pk__in=pks).values_list("slug", flat=True))
+    invalidate_tags(*tags)
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+def related_saved(sender, instance, created, **kwargs):
+    """Имя и slug автора(издательства, жанра, языка) хранятся в поисковых документах и строках списка его книг"""
+
+    if not created:
+        books_relations_changed(related_book_ids(instance), search=sender in SEARCH_MODELS, touch=False)
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Language)
+def related_before_delete(sender, instance, **kwargs):
+    """Запоминает книги удаляемого автора(жанра, языка): связи удаляются каскадно без m2m_changed"""
+
+    instance._book_ids = related_book_ids(instance)
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Language)
+def related_deleted(sender, instance, **kwargs):
+    """Пересобирает документы и строки списка книг удаленного автора(жанра, языка), они попадают в выгрузку ?since="""
+
+    books_relations_changed(getattr(instance, "_book_ids", ()), search=sender in SEARCH_MODELS)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+def fuzzy_index_saved(sender, instance, **kwargs):
+    """Обновляет индекс нечеткого поиска автора(издательства)"""
+
+    lookup = author_lookup if sender is Author else publisher_lookup
+    lookup.update(instance)
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Publisher)
+def fuzzy_index_deleted(sender, instance, **kwargs):
+    """Удаляет автора(издательство) из индекса нечеткого поиска"""
+
+    lookup = author_lookup if sender is Author else publisher_lookup
+    lookup.remove(instance.pk)
+
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_delete, sender=Book)
+def book_cache_tags_before(sender, instance, **kwargs):
+    """Запоминает теги книги до изменения: старое издательство, старые связи"""
+
+    instance._cache_tags_before = book_tags(instance) if instance.pk else []
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_cache_invalidate(sender, instance, **kwargs):
+    """Инвалидирует кэш страниц, на которых книга была или появится"""
+
+    tags = getattr(instance, "_cache_tags_before", [])
+    if kwargs.get("signal") is post_save:
+        tags = tags + book_tags(instance)
+    invalidate_tags(*tags)
+
+
+@receiver(pre_save, sender=Author)
+@receiver(pre_save, sender=Publisher)
+@receiver(pre_save, sender=Genre)
+@receiver(pre_save, sender=Language)
+def related_cache_slug_before(sender, instance, **kwargs):
+    """Запоминает старый slug: страница по старому адресу тоже должна уйти из кэша"""
+
+    instance._cache_slug_before = None
+    if instance.pk:
+        instance._cache_slug_before = sender.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Publisher)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Language)
+def related_cache_invalidate(sender, instance, **kwargs):
+    """Инвалидирует страницы автора(жанра, языка, издательства) и все строки книг, где он показан"""
+
+    name = sender._meta.model_name
+    tags = list()
+    for slug in {instance.slug, getattr(instance, "_cache_slug_before", None)}:
+        if slug:
+            tags.extend([f"{name}:{slug}", f"books:{name}:{slug}"])
+    invalidate_tags(*tags)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Publisher)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Language)
+def catalog_changed(sender, **kwargs):
+    """Любое изменение каталога увеличивает его версию (ETag/Last-Modified в API)"""
+
+    bump_catalog_version()
+
+
+def catalog_bulk_changed(book_ids, publisher_ids=(), author_ids=(), genre_ids=(), language_ids=()):
+    """
+    То же, что делают сигналы, но для массовых операций (bulk_create, update), которые сигналы не отправляют:
+    поисковые документы, строки списка книг, инвалидация кэша списков и версия каталога
+    """
+
+    reindex_books(book_ids)
+    refresh_listings(book_ids)
+    tags = ["books"]
+    tags.extend(f"book:{pk}" for pk in book_ids)
+    for model, pks in ((Publisher, publisher_ids), (Author, author_ids), (Genre, genre_ids), (Language, language_ids)):
+        if pks:
+            name = model._meta.model_name
+            tags.extend(f"books:{name}:{slug}" for slug in
+                        model.objects.filter(pk__in=set(pks)).values_list("slug", flat=True))
+    invalidate_tags(*tags)
+    bump_catalog_version()
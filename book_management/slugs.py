@@ -0,0 +1,82 @@
+import re
+from django.db.models import Q
+from uuslug import slugify
+
+SEPARATOR = "-"
+
+
+def base_slug(model, value, slug_field="slug"):
+    """Базовый slug без суффикса, так же как его строит uuslug"""
+
+    max_length = model._meta.get_field(slug_field).max_length
+    return slugify(value, max_length=max_length, separator=SEPARATOR) or model._meta.model_name
+
+
+def slug_suffix(slug, base):
+    """Числовой суффикс slug относительно базового: base -> 0, base-3 -> 3, иначе None"""
+
+    if slug == base:
+        return 0
+    match = re.fullmatch(rf"{re.escape(base)}{SEPARATOR}(\d+)", slug)
+    return int(match.group(1)) if match else None
+
+
+def allocate_slugs(model, values, slug_field="slug", bases_per_query=100):
+    """
+    Выделяет уникальные slug для списка исходных строк (названий)
+    Занятые slug читаются одним запросом на пачку базовых slug (slug LIKE 'base%'),
+    по ним находится максимальный суффикс, новые slug получают следующие за ним номера
+    Возвращает список slug в том же порядке, что и values
+    """
+
+    bases = [base_slug(model, value, slug_field) for value in values]
+    unique_bases = list(dict.fromkeys(bases))
+    taken = {base: set() for base in unique_bases}
+    counters = dict()
+    for idx in range(0, len(unique_bases), bases_per_query):
+        chunk = unique_bases[idx:idx + bases_per_query]
+        condition = Q()
+        for base in chunk:
+            condition |= Q(**{f"{slug_field}__startswith": base})
+        for slug in model.objects.filter(condition).values_list(slug_field, flat=True):
+            for base in chunk:
+                if slug.startswith(base):
+                    taken[base].add(slug)
+                    suffix = slug_suffix(slug, base)
+                    if suffix is not None:
+                        counters[base] = max(counters.get(base, 0), suffix + 1)
+
+    max_length = model._meta.get_field(slug_field).max_length
+    slugs = list()
+    for base in bases:
+        counter = counters.get(base, 0)
+        candidate = base if not counter else None
+        while candidate is None or candidate in taken[base]:  # обрезанный под max_length slug может быть занят
+            counter = max(counter, 1)
+            suffix = f"{SEPARATOR}{counter}"
+            candidate = f"{base[:max_length - len(suffix)]}{suffix}"
+            counter += 1
+        counters[base] = max(counter, 1)
+        taken[base].add(candidate)
+        slugs.append(candidate)
+    return slugs
+
+
+def assign_slug(instance):
+    """
+    Выставляет slug объекту перед сохранением, только если он новый или изменилось исходное поле
+    Если новый базовый slug совпадает с текущим (например, изменился только регистр), slug не меняется
+    Возвращает старый slug, если он был заменен, иначе None
+    """
+
+    source = instance.slug_source()
+    if instance.slug and getattr(instance, "_slug_source", source) == source:
+        return None
+    model = type(instance)
+    if instance.slug and slug_suffix(instance.slug, base_slug(model, source)) is not None:
+        instance._slug_source = source
+        return None
+    old_slug = instance.slug if instance.pk is not None else None
+    instance.slug = allocate_slugs(model, [source])[0]
+    instance._slug_source = source
+    return old_slug
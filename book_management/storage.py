@@ -0,0 +1,56 @@
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+COVERS_DIR = "covers"
+
+
+def hashed_name(digest, extension, prefix=COVERS_DIR):
+    """Путь файла по его sha256: covers/ab/cd/abcd....jpg (два уровня каталогов, чтобы не копить файлы в одном)"""
+
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла - хэш его содержимого
+    Файл хэшируется во время записи на диск, одинаковые файлы хранятся один раз,
+    а имя никогда не указывает на другое содержимое(поэтому nginx может отдавать их с immutable)
+    """
+
+    prefix = COVERS_DIR
+
+    def get_available_name(self, name, max_length=None):
+        """Подбирать свободное имя не нужно: итоговое имя определяется содержимым в _save"""
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        tmp_dir = self.path(os.path.join(self.prefix, "tmp"))
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, "wb") as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = hashed_name(digest.hexdigest(), extension, self.prefix)
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(tmp_path)  # такой файл уже есть
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+                os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+def cover_storage():
+    """Хранилище обложек книг (вызывается Django при загрузке модели, поэтому настройки MEDIA_ROOT учитываются)"""
+    return ContentAddressedStorage()
@@ -0,0 +1,46 @@
+from django import template
+from ..fragments import load_fragments as load, render_fragment
+
+register = template.Library()
+LOADED_KEY = "catalog_fragments"
+
+
+@register.simple_tag(takes_context=True)
+def load_fragments(context, name, objects):
+    """
+    Загружает фрагменты name всех объектов страницы за два обращения к кэшу (ставится перед циклом по строкам)
+    Без него каждый {% fragment %} обращается к кэшу сам
+    """
+
+    context.render_context.setdefault(LOADED_KEY, dict())[name] = load(name, list(objects))
+    return ""
+
+
+class FragmentNode(template.Node):
+    def __init__(self, name, obj, nodelist):
+        self.name = name
+        self.obj = obj
+        self.nodelist = nodelist
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        loaded = context.render_context.get(LOADED_KEY, dict()).get(name)
+        return render_fragment(
+            name, self.obj.resolve(context), lambda: self.nodelist.render(context), context.request, loaded
+        )
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    {% fragment "book_row" object %}...{% endfragment %} - кэш отрисованной части шаблона для объекта
+    Запись помечается тегами объекта и его связей(fragments.FRAGMENTS) и устаревает вместе с ними
+    (сигналы book_management), поэтому заново отрисовываются только измененные строки
+    """
+
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError("Использование: {% fragment имя объект %}...{% endfragment %}")
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(parser.compile_filter(bits[1]), parser.compile_filter(bits[2]), nodelist)
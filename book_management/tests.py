@@ -1,6 +1,34 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+from asgiref.sync import iscoroutinefunction
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Book, Author, Publisher, Genre, Language
+from .benchmark import compare_runs
+from .bulk import COPY_COLUMNS
+from .cache import get_fragments
+from .management.commands.benchmark_catalog import catalog_endpoints, catalog_samples, count_queries
+from .management.commands.gc_covers import Command as GcCoversCommand
+from .models import Book, Author, Publisher, Genre, Language, CoverBlob, BookListing
+from .admin import BookAdmin
+from . import facets
+from .explain import covering_index, postgresql_findings
+from .metrics import MetricsMiddleware, MmapDict, sample_key
+from .pagination import EstimatedCountPaginator, encode_cursor
+from .profiling import QueryProfilingMiddleware, get_profile_buffer, fingerprint
+from book_management_system.db_pool.pool import ConnectionPool, PoolTimeout
+from book_management_system.replicas import PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter, RoutingState
 
 
 class TestBook(TestCase):
@@ -68,6 +96,513 @@ class TestBook(TestCase):
         self.assertNotContains(response, "Next")
         self.assertContains(response, "TitleBook_1")
 
+    def test_cursor_pagination(self):
+        """Keyset-пагинация: обход всех страниц по курсорам вперед и назад"""
+
+        for idx in range(2, 25):
+            Book.objects.create(title=f"TitleBook_{idx:02}", publisher=self.publisher, pages=10, year=2020)
+        url_book = reverse("home")
+        titles = list()
+        cursor = ""
+        pages = list()
+        while True:
+            response = self.client.get(url_book, {"cursor": cursor} if cursor else {})
+            self.assertEquals(response.status_code, 200)
+            page = response.context["page_obj"]
+            pages.append(page)
+            titles.extend(book.title for book in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEquals(len(pages), 3)
+        self.assertEquals(titles, list(Book.objects.order_by("title", "id").values_list("title", flat=True)))
+
+        response = self.client.get(url_book, {"cursor": pages[-1].previous_cursor})
+        self.assertEquals([book.title for book in response.context["page_obj"]], [book.title for book in pages[1]])
+
+        response = self.client.get(url_book, {"cursor": "invalid"})
+        self.assertEquals(response.status_code, 404)
+        for values in (["a", "x"], ["a", None], ["a", [1]]):
+            response = self.client.get(url_book, {"cursor": encode_cursor(values)})
+            self.assertEquals(response.status_code, 404)
+        response = self.client.get(reverse("api:list_book"), {"cursor": encode_cursor(["a", "x"])})
+        self.assertEquals(response.status_code, 404)
+        response = self.client.get(url_book, {"page": 2})
+        self.assertEquals(response.status_code, 200)
+
+    @override_settings(PAGINATOR_ESTIMATE_THRESHOLD=20)
+    def test_estimated_pagination(self):
+        """Ниже порога - точное количество, выше - оценка планировщика без COUNT(*)"""
+
+        for idx in range(2, 25):
+            Book.objects.create(title=f"TitleBook_{idx:02}", publisher=self.publisher, pages=10, year=2020)
+        queryset = BookListing.objects.order_by("title", "book_id")
+        with mock.patch.object(EstimatedCountPaginator, "estimate", return_value=5):
+            paginator = EstimatedCountPaginator(queryset, 10)
+            self.assertEquals((paginator.count, paginator.estimated), (25, False))
+
+        with mock.patch.object(EstimatedCountPaginator, "estimate", return_value=20):
+            paginator = EstimatedCountPaginator(queryset, 10)
+            self.assertEquals((paginator.num_pages, paginator.estimated), (2, True))
+            page = paginator.page(3)  # оценка меньше реального количества
+            self.assertEquals((len(page), page.has_next(), list(page.page_window)), (5, False, [1, 2, 3]))
+            self.assertTrue(paginator.page(2).has_next())
+            response = self.client.get(reverse("home"), {"page": 2})
+            self.assertContains(response, "about 2 pages")
+
+    @override_settings(FACET_INDEX_BACKGROUND=False)
+    def test_facet_view(self):
+        """Фасетный подбор книг: фильтры сохраняются в ссылках пагинации"""
+
+        for idx in range(2, 14):
+            book = Book.objects.create(title=f"TitleBook_{idx:02}", publisher=self.publisher, pages=10, year=2020)
+            book.genre.set([self.genre[1]])
+        url_facet = reverse("facet_book")
+        response = self.client.get(url_facet, {"genre": self.genre[1].slug, "year_min": 2020})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context["paginator"].count, 13)
+        self.assertContains(response, f"?genre={self.genre[1].slug}&amp;year_min=2020&page=2")
+        self.assertContains(response, "test_genre_title_0 (2)")
+        response = self.client.get(url_facet, {"year_min": "abc"})
+        self.assertEquals(response.context["paginator"].count, 14)
+
+    def test_facet_index_background(self):
+        """После изменения каталога индекс перестраивается в фоне, до готовности отдается прежний"""
+
+        built = threading.Event()
+        release = threading.Event()
+
+        def build(version):
+            if version == (2, None):
+                built.set()
+                release.wait(5)
+            return mock.Mock(version=version)
+
+        with mock.patch.object(facets, "_index", None), \
+                mock.patch.object(facets.FacetIndex, "build", side_effect=build) as build_mock, \
+                mock.patch.object(facets, "get_catalog_version", return_value=(1, None)) as version_mock:
+            self.assertEquals(facets.get_facet_index().version, (1, None))
+            version_mock.return_value = (2, None)
+            self.assertEquals(facets.get_facet_index().version, (1, None))
+            self.assertTrue(built.wait(5))
+            self.assertEquals(facets.get_facet_index().version, (1, None))
+            self.assertEquals(build_mock.call_count, 2)  # второй фоновый поток не запускается
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == "facet-index":
+                    thread.join(5)
+            self.assertEquals(facets.get_facet_index().version, (2, None))
+            self.assertEquals(build_mock.call_count, 2)
+
+    def test_facet_stale_index_hidden(self):
+        """Книга, скрытая после построения индекса, не попадает на страницу, пока индекс перестраивается"""
+
+        url_facet, url_api = reverse("facet_book"), reverse("api:facet_book")
+        with override_settings(FACET_INDEX_BACKGROUND=False):
+            self.assertContains(self.client.get(url_facet), "TitleBook_0")
+        book = Book.objects.get(title="TitleBook_0")
+        book.show_book = False
+        book.save()
+        with mock.patch.object(facets, "_build_index") as build_mock:
+            self.assertNotContains(self.client.get(url_facet), "TitleBook_0")
+            response = self.client.get(url_api)
+            self.assertEquals([item["title"] for item in response.data["results"]], ["TitleBook_1"])
+        self.assertTrue(build_mock.called)  # индекс устарел, перестройка запущена в фоне
+
+    def test_search(self):
+        """Полнотекстовый поиск по названию, автору и жанру, документ обновляется сигналами"""
+
+        url_search = reverse("search_book")
+        response = self.client.get(url_search, {"q": "TitleBook_1"})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals([book.title for book in response.context["object_list"]], ["TitleBook_1"])
+
+        response = self.client.get(url_search, {"q": "test_genre_title_0"})
+        self.assertEquals(len(response.context["object_list"]), 2)
+
+        author = self.author[0]
+        author.last_name = "Достоевский"
+        author.save()
+        response = self.client.get(url_search, {"q": "достоевский"})
+        self.assertEquals(len(response.context["object_list"]), 2)
+
+        self.book.author.remove(author)
+        response = self.client.get(url_search, {"q": "Достоевский"})
+        self.assertEquals([book.title for book in response.context["object_list"]], ["TitleBook_0"])
+
+        response = self.client.get(url_search, {"q": ""})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(response.context["object_list"]), 0)
+
+    def test_response_cache(self):
+        """Кэш страниц списков книг и инвалидация по тегам"""
+
+        url_book = reverse("home")
+        url_genre = reverse("all_genre_book", kwargs={"slug": self.genre[0].slug})
+        self.assertEquals(self.client.get(url_book)["X-Cache"], "MISS")
+        response = self.client.get(url_book)
+        self.assertEquals(response["X-Cache"], "HIT")
+        self.assertContains(response, "TitleBook_0")
+        self.assertNotContains(response, "__csrf_token__")
+        self.client.get(url_genre)
+        self.assertEquals(self.client.get(url_genre)["X-Cache"], "HIT")
+
+        new_book = Book.objects.create(title="CachedNewBook", publisher=self.publisher, pages=10, year=2020)
+        response = self.client.get(url_book)
+        self.assertEquals(response["X-Cache"], "MISS")
+        self.assertContains(response, "CachedNewBook")
+        self.assertEquals(self.client.get(url_genre)["X-Cache"], "HIT")
+
+        new_book.genre.add(self.genre[0])
+        response = self.client.get(url_genre)
+        self.assertEquals(response["X-Cache"], "MISS")
+        self.assertContains(response, "CachedNewBook")
+
+        self.client.get(url_book)
+        genre = self.genre[1]
+        genre.title = "RenamedGenre"
+        genre.save()
+        response = self.client.get(url_book)
+        self.assertEquals(response["X-Cache"], "MISS")
+        self.assertContains(response, "RenamedGenre")
+
+    def test_fragment_cache(self):
+        """Кэш фрагментов строк и страницы книги: повторная отрисовка без запросов связей, инвалидация по тегам"""
+
+        url_book = reverse("detail_book", kwargs={"slug": self.book.slug})
+        self.client.get(url_book)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url_book)
+        self.assertContains(response, "test_language_title_1")
+        self.assertFalse([query for query in queries if "book_management_language" in query["sql"]])
+
+        language = self.language[1]
+        language.title = "RenamedLanguage"
+        language.save()
+        self.assertContains(self.client.get(url_book), "RenamedLanguage")
+
+        self.client.get(reverse("home"))
+        self.assertEquals(len(get_fragments("book_row", [book.pk for book in Book.objects.all()])), 2)
+        self.book.title = "UpdatedTitle"
+        self.book.save()
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "UpdatedTitle")
+        self.assertContains(response, "TitleBook_0")
+        self.assertNotContains(response, "__csrf_token__")
+
+    def test_replica_lag_cache(self):
+        """Страницы и фрагменты, прочитанные с отстающей реплики, не попадают в кэш"""
+
+        def lagging(alias):
+            return 1 if alias == "replica_1" else 2
+
+        state = RoutingState(use_replicas=True)
+        state.replica = "replica_1"
+        url_book = reverse("home")
+        Book.objects.create(title="LagBook", publisher=self.publisher, pages=10, year=2020)
+        with mock.patch("book_management.versioning.get_routing_state", return_value=state), \
+                mock.patch("book_management.versioning.read_version", side_effect=lagging):
+            self.assertEquals(self.client.get(url_book)["X-Cache"], "MISS")
+            state.replica_current = None
+            self.assertEquals(self.client.get(url_book)["X-Cache"], "MISS")
+        self.assertEquals(get_fragments("book_row", list(Book.objects.values_list("pk", flat=True))), dict())
+        self.assertEquals(self.client.get(url_book)["X-Cache"], "MISS")
+        self.assertEquals(self.client.get(url_book)["X-Cache"], "HIT")
+
+    def test_jinja2_templates(self):
+        """Страницы каталога на Jinja2 с тем же HTML, что и шаблоны Django (benchmark_templates)"""
+
+        with override_settings(CATALOG_TEMPLATE_ENGINE="jinja2"):
+            response = self.client.get(reverse("search_book"), {"q": "TitleBook"})
+            self.assertContains(response, "TitleBook_1")
+            self.assertContains(response, "csrfmiddlewaretoken")
+            response = self.client.get(reverse("detail_book", kwargs={"slug": self.book.slug}))
+            self.assertContains(response, "test_language_title_0")
+
+        out = io.StringIO()
+        call_command("benchmark_templates", "--repeat", "1", stdout=out)
+        self.assertIn("detail_book", out.getvalue())
+        self.assertIn("all_publisher", out.getvalue())
+        self.assertNotIn("!=", out.getvalue())
+
+    def test_import_catalog(self):
+        """Импорт из CSV и JSONL: существующие издательства и жанры используются, новые создаются"""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path_csv = os.path.join(tmp, "books.csv")
+            with open(path_csv, "w", encoding="utf-8") as file:
+                file.write("title,authors,publisher,genres,languages,pages,year\n")
+                file.write("ImportedBook_0,Лев Толстой|test_first_name_0 test_last_name_0,PublisherTitle_0,"
+                           "test_genre_title_0,Русский,100,1869\n")
+                file.write("BrokenBook,Лев Толстой,PublisherTitle_0,test_genre_title_0,Русский,100,99\n")
+                file.write("ImportedBook_1,Лев Толстой,NewPublisher,Роман|test_genre_title_1,Русский,200,1877\n")
+                file.write(f"LongNamesBook,Иван Петров,{'P' * 150},{'G' * 80},{'L' * 40},10,1900\n")
+            call_command("import_catalog", path_csv, chunk_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+            self.assertFalse(os.path.exists(f"{path_csv}.checkpoint"))
+
+            path_jsonl = os.path.join(tmp, "books.jsonl")
+            with open(path_jsonl, "w", encoding="utf-8") as file:
+                for idx in range(3):
+                    file.write(json.dumps({
+                        "title": f"JsonBook_{idx}", "authors": ["Лев Толстой"], "publisher": "NewPublisher",
+                        "genres": "Роман", "languages": ["Русский"], "year": 1900
+                    }) + "\n")
+            with open(f"{path_jsonl}.checkpoint", "w", encoding="utf-8") as file:
+                json.dump({"rows": 1}, file)
+            call_command("import_catalog", path_jsonl, stdout=io.StringIO())
+
+        self.assertEquals(Author.objects.filter(first_name="Лев", last_name="Толстой").count(), 1)
+        self.assertEquals(Publisher.objects.filter(title="NewPublisher").count(), 1)
+        self.assertFalse(Book.objects.filter(title__in=["BrokenBook", "JsonBook_0"]).exists())
+        book = Book.objects.get(title="ImportedBook_0")
+        self.assertEquals(book.publisher.title, "PublisherTitle_0")
+        self.assertEquals(book.author.count(), 2)
+        self.assertEquals(
+            sorted(Book.objects.get(title="ImportedBook_1").genre.values_list("title", flat=True)),
+            ["test_genre_title_1", "Роман"]
+        )
+        self.assertEquals(Book.objects.filter(title__startswith="JsonBook_").count(), 2)
+        book = Book.objects.get(title="LongNamesBook")
+        self.assertEquals(book.publisher.title, "P" * 100)
+        self.assertEquals(list(book.genre.values_list("title", flat=True)), ["G" * 50])
+        self.assertEquals(list(book.language.values_list("title", flat=True)), ["L" * 30])
+        response = self.client.get(reverse("search_book"), {"q": "Толстой"})
+        self.assertEquals(len(response.context["object_list"]), 4)
+
+    def test_copy_columns(self):
+        """COPY книг (PostgreSQL) заполняет все NOT NULL столбцы Book"""
+
+        required = {field.column for field in Book._meta.concrete_fields if not field.null}
+        self.assertEquals(required - set(COPY_COLUMNS), set())
+
+    def test_seed_catalog(self):
+        """Синтетический каталог: связи в заданных пределах, адреса для нагрузочного теста и число запросов"""
+
+        call_command(
+            "seed_catalog", books=60, authors=10, publishers=3, genres=25, languages=2, authors_per_book="1-3",
+            genres_per_book="2", seed=1, chunk_size=25, stdout=io.StringIO()
+        )
+        self.assertEquals(Book.objects.count(), 62)
+        self.assertEquals(Genre.objects.filter(title="Роман").count(), 1)
+        self.assertEquals(Genre.objects.count(), 27)
+        for book in Book.objects.exclude(title__startswith="TitleBook_").prefetch_related("author", "genre"):
+            self.assertTrue(1 <= len(book.author.all()) <= 3)
+            self.assertEquals(len(book.genre.all()), 2)
+        self.assertEquals(BookListing.objects.count(), 62)
+
+        samples = catalog_samples()
+        endpoints = {item["endpoint"]: item for item in catalog_endpoints(samples, writes=True)}
+        self.assertEquals(
+            endpoints["all_author_book"]["path"], reverse("all_author_book", args=[samples["author"].slug])
+        )
+        self.assertEquals(endpoints["api:add_book"]["method"], "POST")
+        self.assertNotIn("api:delete_book", endpoints)
+        self.assertNotIn("api:export_book", endpoints)
+        self.assertGreater(count_queries(endpoints["home"], "testserver"), 0)
+
+        before = [{"endpoint": "home", "concurrency": 10, "rps": 100.0, "p95": 20.0, "queries": 4}]
+        after = [{"endpoint": "home", "concurrency": 10, "rps": 150.0, "p95": 10.0, "queries": 4}]
+        compared = compare_runs(before, after)[0]
+        self.assertEquals((compared["rps_diff"], compared["p95_diff"], compared["queries_diff"]),
+                          ("+50.0%", "-50.0%", "+0.0%"))
+
+    def test_cover_storage(self):
+        """Одинаковые обложки хранятся один раз по хэшу, файлы без ссылок удаляет gc_covers"""
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root, COVER_WORKERS=0):
+            first, second = Book.objects.order_by("pk")
+            for book in (first, second):
+                book.cover = SimpleUploadedFile("Обложка/../cover.PNG", b"same image", content_type="image/png")
+                book.save()
+            self.assertEquals(first.cover.name, second.cover.name)
+            self.assertRegex(first.cover.name, r"^covers/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+            path = first.cover.path
+            self.assertEquals(CoverBlob.objects.get(name=first.cover.name).refcount, 2)
+
+            first.delete()
+            call_command("gc_covers", grace_hours=0, stdout=io.StringIO())
+            self.assertTrue(os.path.exists(path))
+            second.cover = SimpleUploadedFile("other.png", b"other image", content_type="image/png")
+            second.save()
+            self.assertEquals(CoverBlob.objects.get(name=first.cover.name).refcount, 0)
+
+            delete_blob = GcCoversCommand.delete_blob
+
+            def upload_during_gc(command, pk):  # та же обложка загружена после выборки кандидатов
+                CoverBlob.objects.filter(pk=pk).update(refcount=1)
+                return delete_blob(command, pk)
+
+            with mock.patch.object(GcCoversCommand, "delete_blob", upload_during_gc):
+                call_command("gc_covers", grace_hours=0, stdout=io.StringIO())
+            self.assertTrue(os.path.exists(path))
+            self.assertTrue(CoverBlob.objects.filter(name=first.cover.name).exists())
+            CoverBlob.objects.filter(name=first.cover.name).update(refcount=0)
+            call_command("gc_covers", grace_hours=0, stdout=io.StringIO())
+            self.assertFalse(os.path.exists(path))
+            self.assertFalse(CoverBlob.objects.filter(name=first.cover.name).exists())
+            self.assertTrue(os.path.exists(second.cover.path))
+
+    def test_book_listing(self):
+        """Строки списка книг обновляются сигналами, списки по жанру, языку и автору строятся по ним"""
+
+        listing = BookListing.objects.get(book=self.book)
+        self.assertEquals(listing.publisher_slug, self.publisher.slug)
+        self.assertEquals([genre["title"] for genre in listing.genres], ["test_genre_title_0", "test_genre_title_1"])
+
+        genre = self.genre[0]
+        genre.title = "renamed_genre"
+        genre.save()
+        self.assertIn("renamed_genre", [item["title"] for item in BookListing.objects.get(book=self.book).genres])
+        response = self.client.get(reverse("all_genre_book", kwargs={"slug": genre.slug}))
+        self.assertContains(response, "renamed_genre")
+        self.assertContains(response, "TitleBook_1")
+
+        self.book.language.remove(self.language[0])
+        response = self.client.get(reverse("all_language_book", kwargs={"slug": self.language[0].slug}))
+        self.assertNotContains(response, "TitleBook_1")
+        self.assertContains(response, "TitleBook_0")
+
+        self.author[0].delete()
+        self.assertEquals(len(BookListing.objects.get(book=self.book).authors), 1)
+        BookListing.objects.all().delete()
+        call_command("rebuild_book_listing", stdout=io.StringIO())
+        self.assertEquals(BookListing.objects.count(), 2)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("all_author_book", kwargs={"slug": self.author[1].slug}))
+        self.assertContains(response, "test_first_name_1 test_last_name_1")
+
+    @override_settings(QUERY_PROFILING_SAMPLE_RATE=1, QUERY_PROFILING_N_PLUS_ONE=2)
+    def test_query_profiling(self):
+        """Профилирование: количество запросов, N+1 и страница администратора с худшими представлениями"""
+
+        self.assertEquals(fingerprint("SELECT 'a' FROM t WHERE id IN (%s, %s) AND x = 10"),
+                          "SELECT ? FROM t WHERE id IN (...) AND x = ?")
+        buffer = get_profile_buffer()
+        buffer.clear()
+        with self.assertLogs("book_management.profiling") as logs:
+            self.client.get(reverse("home"))
+        self.assertEquals(json.loads(logs.records[0].getMessage())["view"], "AllBookView")
+        record = buffer.all()[-1]
+        self.assertEquals((record["view"], record["status"]), ("AllBookView", 200))
+        self.assertGreater(record["queries"], 0)
+
+        User.objects.create_superuser("admin", "admin@test.com", "password")
+        self.client.login(username="admin", password="password")
+        # без prefetch_related авторов (как было до BookAdmin.get_queryset) display_authors дает N+1
+        with self.assertLogs("book_management.profiling"), \
+                mock.patch.object(BookAdmin, "get_queryset", ModelAdmin.get_queryset):
+            self.client.get(reverse("admin:book_management_book_changelist"))
+        record = buffer.all()[-1]
+        self.assertEquals(record["view"], "BookAdmin.changelist_view")
+        self.assertTrue(any("book_management_author" in item["fingerprint"] for item in record["n_plus_one"]))
+
+        with override_settings(QUERY_PROFILING_SAMPLE_RATE=0):
+            response = self.client.get(reverse("query_profile"), {"order": "db_ms"})
+        self.assertContains(response, "AllBookView")
+        self.assertEquals(response.context["endpoints"][0]["samples"], 1)
+        self.client.logout()
+        with override_settings(QUERY_PROFILING_SAMPLE_RATE=0):
+            self.assertEquals(self.client.get(reverse("query_profile")).status_code, 302)
+
+    def test_metrics(self):
+        """Метрики суммируются по файлам всех процессов, значения завершенных процессов не учитываются"""
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(METRICS_DIR=tmp):
+            self.client.get(reverse("home"))
+            self.client.get(reverse("home"))
+            other_worker = MmapDict(os.path.join(tmp, "counter_999999.db"))
+            key = sample_key("http_requests_total", {"view": "home", "method": "GET", "status": "200"})
+            other_worker.increment(key, 3)
+            other_worker.close()
+            dead_worker = MmapDict(os.path.join(tmp, "gauge_999999.db"))
+            dead_worker.set(sample_key("db_pool", {"pool": "default", "stat": "in_use"}), 5)
+            dead_worker.close()
+
+            response = self.client.get(reverse("metrics"))
+            self.assertEquals(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+            self.assertContains(response, 'http_requests_total{method="GET",status="200",view="home"} 5\n')
+            self.assertContains(response, 'http_request_duration_seconds_count{method="GET",view="home"} 2\n')
+            self.assertContains(response, 'http_request_duration_seconds_bucket{method="GET",view="home",le="+Inf"} 2')
+            self.assertContains(response, 'cache_hit_ratio{cache="page"} 0.5\n')
+            self.assertContains(response, 'db_queries_total{view="home"}')
+            self.assertContains(response, "# TYPE http_response_size_bytes histogram")
+            self.assertNotContains(response, 'stat="in_use"} 5')
+            self.assertFalse(os.path.exists(os.path.join(tmp, "gauge_999999.db")))
+
+    async def test_async_middleware(self):
+        """Под ASGI профилирование и метрики остаются асинхронными и учитывают запросы асинхронных представлений"""
+
+        async def get_response(request):
+            return HttpResponse("ok")
+
+        for middleware in (QueryProfilingMiddleware, MetricsMiddleware):
+            handler = middleware(get_response)
+            self.assertTrue(iscoroutinefunction(handler))
+            self.assertEquals((await handler(RequestFactory().get("/"))).status_code, 200)
+
+        buffer = get_profile_buffer()
+        buffer.clear()
+        with override_settings(ROOT_URLCONF="api.v1.async_urls", QUERY_PROFILING_SAMPLE_RATE=1):
+            response = await self.async_client.get(reverse("list_book"))
+        self.assertEquals(response.status_code, 200)
+        self.assertGreater(buffer.all()[-1]["queries"], 0)
+
+    def test_index_advisor(self):
+        """Разбор плана PostgreSQL, поиск существующего индекса и отчет по адресам сайта"""
+
+        plan = {"Node Type": "Limit", "Plans": [{
+            "Node Type": "Sort", "Sort Key": ["book_management_book.title", "book_management_book.id"],
+            "Plans": [{"Node Type": "Seq Scan", "Relation Name": "book_management_book", "Plan Rows": 1000,
+                       "Filter": "(show_book AND ((year)::integer >= 2000))"}],
+        }]}
+        finding = postgresql_findings(plan)[0]
+        self.assertEquals((finding["table"], finding["rows"]), ("book_management_book", 1000))
+        self.assertEquals(finding["columns"], ["show_book", "year", "title", "id"])
+        self.assertEquals(covering_index(connection, "book_management_book", ["title", "id"]), "book_visible_title")
+        self.assertIsNone(covering_index(connection, "book_management_book", ["pages"]))
+
+        out = io.StringIO()
+        call_command("index_advisor", min_rows=0, only=["all_publisher_book", "all_author_book"], stdout=out)
+        report = out.getvalue()
+        self.assertRegex(report, r"all_publisher_book /all-publisher-book/[\w-]+/: SELECT 1 видов, OK")
+        self.assertIn("Seq Scan book_management_booklisting", report)  # авторы фильтруются по tags (LIKE)
+
+    def test_admin_changelist(self):
+        """Список книг в админке - фиксированное количество запросов, действия выполняются одним UPDATE"""
+
+        User.objects.create_superuser("admin", "admin@test.com", "password")
+        self.client.login(username="admin", password="password")
+        url = reverse("admin:book_management_book_changelist")
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for idx in range(4):
+            book = Book.objects.create(title=f"AdminBook_{idx}", publisher=self.publisher, pages=10, year=2000)
+            book.author.set(self.author)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertContains(response, "test_first_name_1 test_last_name_1")
+        self.assertEquals(len(after), len(before))
+
+        books = [self.book.pk, Book.objects.get(title="AdminBook_0").pk]
+        slug = self.book.slug
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {"action": "hide_books", ACTION_CHECKBOX_NAME: books})
+        updates = [query for query in queries if query["sql"].startswith('UPDATE "book_management_book"')]
+        self.assertEquals(len(updates), 1)
+        self.assertEquals(Book.objects.filter(show_book=False).count(), 2)
+        self.assertEquals(Book.objects.get(pk=self.book.pk).slug, slug)
+        self.assertFalse(BookListing.objects.get(book=self.book).show_book)
+        self.assertNotContains(self.client.get(reverse("home")), self.book.title)
+
+        other = Publisher.objects.get(title="PublisherTitle_0")
+        data = {"action": "reassign_publisher", ACTION_CHECKBOX_NAME: books}
+        response = self.client.post(url, data)
+        self.assertTemplateUsed(response, "admin/book_management/book/reassign_publisher.html")
+        self.assertContains(response, "Выбрано книг: 2")
+        self.client.post(url, {**data, "apply": "1", "publisher": other.pk})
+        self.assertEquals(Book.objects.filter(publisher=other).count(), 3)
+        self.assertEquals(BookListing.objects.get(book=self.book).publisher_slug, other.slug)
+
     def test_add_book(self):
         """Добавление книги"""
 
@@ -136,6 +671,29 @@ class TestBook(TestCase):
         response = self.client.get(url_book)
         self.assertEquals(response.status_code, 404)
 
+    def test_slug_rename_redirect(self):
+        """Slug меняется только при изменении названия, старый адрес книги перенаправляет на новый"""
+
+        book = Book.objects.get(title="TitleBook_0")
+        old_slug = book.slug
+        book.pages = 300
+        book.save()
+        self.assertEquals(book.slug, old_slug)
+        book.title = "TITLEBOOK_0"
+        book.save()
+        self.assertEquals(book.slug, old_slug)
+
+        twin = Book.objects.create(title="TitleBook 0", publisher=self.publisher, pages=1, year=2020)
+        self.assertEquals(twin.slug, f"{old_slug}-1")
+        book.title = "Война и мир"
+        book.save()
+        self.assertEquals(book.slug, "voina-i-mir")
+        response = self.client.get(reverse("detail_book", kwargs={"slug": old_slug}))
+        self.assertRedirects(response, book.get_absolute_url(), status_code=301)
+        self.assertEquals(
+            self.client.get(reverse("detail_book", kwargs={"slug": twin.slug})).context["object"], twin
+        )
+
 
 class TestAuthorAndPublisher(TestCase):
     """Тестирование представлений для модели Author и Publisher"""
@@ -212,3 +770,95 @@ class TestAuthorAndPublisher(TestCase):
             self.assertFalse(Publisher.objects.filter(slug=pub.slug))
             response_publisher = self.client.delete(url_publisher)
             self.assertEquals(response_publisher.status_code, 404)
+
+
+class FakeConnection:
+    """Соединение для тестов пула"""
+
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool(SimpleTestCase):
+    """Тестирование пула соединений с базой данных"""
+
+    def test_pool(self):
+        """Повторное использование, соединения сверх размера, ожидание, проверка и закрытие простаивающих"""
+
+        pool = ConnectionPool(FakeConnection, size=1, max_overflow=1, timeout=0.01, max_idle=60, check=lambda c: None)
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(pool.getconn(), first)
+        overflow = pool.getconn()
+        self.assertEquals(pool.stats()["overflow_in_use"], 1)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        pool.putconn(overflow)
+        self.assertTrue(overflow.closed)
+        stats = pool.stats()
+        self.assertEquals((stats["in_use"], stats["idle"], stats["timeouts"], stats["waits"]), (1, 0, 1, 0))
+
+        first.close()
+        pool.putconn(first)
+        self.assertIsNot(pool.getconn(), first)
+
+        pool = ConnectionPool(FakeConnection, size=2, max_idle=0, check_idle_after=0, check=lambda c: None)
+        connections = [pool.getconn(), pool.getconn()]
+        for connection in connections:
+            pool.putconn(connection)
+        self.assertEquals(pool.stats()["reaped"], 2)
+        self.assertTrue(all(connection.closed for connection in connections))
+
+        def failing_check(connection):
+            raise ValueError
+
+        pool = ConnectionPool(FakeConnection, size=1, check_idle_after=0, check=failing_check)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertEquals(pool.stats()["health_check_failures"], 1)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], REPLICA_PIN_SECONDS=5)
+class TestReplicaRouter(SimpleTestCase):
+    """Тестирование маршрутизации чтения на реплики"""
+
+    def route(self, request, write=False):
+        """Возвращает (база для чтения до записи, база для чтения после нее, ответ)"""
+
+        router = ReplicaRouter()
+        used = []
+
+        def get_response(request):
+            used.append(router.db_for_read(Book))
+            if write:
+                router.db_for_write(Book)
+            used.append(router.db_for_read(Book))
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(get_response)(request)
+        return used[0], used[1], response
+
+    def test_routing(self):
+        """Чтение с реплики, запись и чтение после нее - с основной базы, закрепление после POST"""
+
+        factory = RequestFactory()
+        router = ReplicaRouter()
+        self.assertEquals(router.db_for_read(Book), "default")  # вне запроса
+
+        before, after, response = self.route(factory.get("/"), write=True)
+        self.assertEquals((before, after), ("replica_1", "default"))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        before, after, response = self.route(factory.post("/"), write=True)
+        self.assertEquals((before, after), ("default", "default"))
+        self.assertEquals(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+        request = factory.get("/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        self.assertEquals(self.route(request)[:2], ("default", "default"))
+        self.assertEquals(router.db_for_read(Book), "default")
+        self.assertFalse(router.allow_migrate("replica_1", "book_management"))
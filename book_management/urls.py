@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (
     CreateBook, AllBookView, DetailBookView, UpdateBook, DeleteBook, AllAuthorView, AllAuthrBook, CreatePublisher,
     AllPublisherView, AllPublisherBook, CreateAuthor, DeletePublisher, UpdatePublisher, CreateLanguage, AllLanguageView,
-    AllLanguageBook, DeleteLanguage, CreateGenre, AllGenreBook, AllGenreView, DeleteGenre
+    AllLanguageBook, DeleteLanguage, CreateGenre, AllGenreBook, AllGenreView, DeleteGenre, SearchBookView, FacetBookView
 )
 
 urlpatterns = [
@@ -27,4 +27,6 @@ urlpatterns = [
     path("all-book-genre/<str:slug>/", AllGenreBook.as_view(), name="all_genre_book"),
     path("all-genre/", AllGenreView.as_view(), name="all_genre"),
     path("delete-genre/<str:slug>/", DeleteGenre.as_view(), name="delete_genre"),
+    path("search/", SearchBookView.as_view(), name="search_book"),
+    path("facets/", FacetBookView.as_view(), name="facet_book"),
 ]
@@ -1,7 +1,6 @@
 import os
 from django.db import models
-from autoslug import AutoSlugField
-from uuslug import uuslug
+from .slugs import assign_slug
 
 
 def instance_field(instance):
@@ -24,23 +23,39 @@ def path_cover_for_book(instance, filename):
 class BaseModelWithSlug(models.Model):
     """
     Базовая модель от которой наследуются остальные модели
-    Эта базовая модель добавляет поля slug, сортировку объектов по умолчанию(поля title),
-    генерирует slug из указанного поля
+    Эта базовая модель добавляет поля slug, updated_at, сортировку объектов по умолчанию(поля title),
+    генерирует slug из поля slug_source_field только для новых объектов и при изменении этого поля
     """
-    slug = AutoSlugField(
-        max_length=250, unique=True, db_index=True, populate_from=instance_field, slugify=slugify_value
-    )
+    slug_source_field = "title"  # поле, из которого формируется slug
+    slug = models.SlugField(max_length=250, unique=True, db_index=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
 
     def __str__(self):
         """Преобразует объект в строку"""
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает исходное поле slug, чтобы при сохранении понять, изменилось ли оно"""
+        instance = super().from_db(db, field_names, values)
+        if cls.slug_source_field not in instance.get_deferred_fields():
+            instance._slug_source = instance.slug_source()
+        return instance
+
+    def slug_source(self):
+        """Значение, из которого формируется slug"""
+        return getattr(self, self.slug_source_field)
+
+    def slug_changed(self, old_slug):
+        """Вызывается после сохранения, если slug объекта изменился"""
+
     def save(self, *args, **kwargs):
-        if hasattr(self, "slug_field"):  # проверяет, имеется ли у объекта атрибут с заданным именем - "slug_field"
-            self.slug = uuslug(self.slug_field, instance=self)  # Генерируем slug на основе этого поля
-        else:
-            self.slug = uuslug(self.title, instance=self)  # Генерируем slug на основе этого поля title
+        old_slug = assign_slug(self)  # slug выделяется без отдельной проверки каждого варианта(как у uuslug)
+        if old_slug and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "slug"}
         super().save(*args, **kwargs)
+        if old_slug and old_slug != self.slug:
+            self.slug_changed(old_slug)
 
     class Meta:
         abstract = True  # Указывает что это класс абстрактный и для него не будет создана таблица в базе данных
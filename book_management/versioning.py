@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+from book_management_system.replicas import get_routing_state
+from .cache import get_cache
+from .metrics import cache_access
+from .models import CatalogVersion
+
+VERSION_KEY = "catalog:version"
+
+
+def get_catalog_version():
+    """
+    Возвращает (версия, дата изменения) каталога
+    Обычно берется из кэша без обращения к базе данных, при промахе читается строка CatalogVersion
+    """
+
+    cache = get_cache()
+    value = cache.get(VERSION_KEY)
+    cache_access("catalog_version", hit=value is not None)
+    if value is None:
+        # с основной базы: версия с отстающей реплики попала бы в кэш, и API отвечал бы 304 на старые данные
+        catalog = CatalogVersion.objects.using(DEFAULT_DB_ALIAS).filter(pk=1).first()
+        if catalog is None:
+            catalog, _ = CatalogVersion.objects.get_or_create(pk=1)
+        value = (catalog.version, catalog.updated_at)
+        cache.set(VERSION_KEY, value, timeout=settings.CATALOG_VERSION_TIMEOUT)
+    return value
+
+
+def read_version(alias):
+    """Номер версии каталога в базе alias (без кэша)"""
+
+    return CatalogVersion.objects.using(alias).filter(pk=1).values_list("version", flat=True).first()
+
+
+def replica_caught_up():
+    """
+    Можно ли сохранять в кэш страниц и фрагментов то, что прочитано в текущем запросе
+    Если запрос читал с реплики, версия каталога на ней должна совпадать с основной базой: иначе реплика отстает,
+    и строки до изменения попали бы в кэш под уже новыми версиями тегов до CATALOG_CACHE_TIMEOUT
+    Проверка(два запроса) выполняется один раз за запрос и только при промахе кэша
+    """
+
+    state = get_routing_state()
+    if state is None or state.replica is None:
+        return True
+    if state.replica_current is None:
+        state.replica_current = read_version(state.replica) == read_version(DEFAULT_DB_ALIAS)
+    return state.replica_current
+
+
+def bump_catalog_version():
+    """
+    Увеличивает версию каталога
+    Кэш сбрасывается сразу и еще раз после фиксации транзакции, чтобы параллельный запрос
+    не закэшировал старую версию, прочитанную до фиксации (окно ограничено CATALOG_VERSION_TIMEOUT)
+    """
+
+    updated = CatalogVersion.objects.filter(pk=1).update(version=F("version") + 1, updated_at=timezone.now())
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    cache = get_cache()
+    cache.delete(VERSION_KEY)
+    transaction.on_commit(lambda: cache.delete(VERSION_KEY))
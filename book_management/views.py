@@ -1,10 +1,21 @@
 from .forms import FormBook, FormPublisher, FormAuthor, FormLanguage, FormGenre
-from django.views.generic import CreateView, ListView, DetailView
+from django.views.generic import CreateView, ListView, DetailView, TemplateView, View
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.decorators import method_decorator
 from django.contrib import messages
-from .models import Book, Author, Publisher, Language, Genre
+from django.http import Http404, HttpResponse, QueryDict
+from django.shortcuts import redirect
+from .models import Book, Author, Publisher, Language, Genre, BookSlugRedirect, BookListing
 from django.views.generic.edit import UpdateView, DeleteView
 from django.urls import reverse_lazy
-from .mixins import MixinCreateView
+from django.conf import settings
+from .mixins import MixinCreateView, MixinCursorPagination, MixinResponseCache, MixinTemplateEngine
+from .search import SearchResults
+from .listing import listing_queryset
+from .pagination import EstimatedCountPaginator
+from .profiling import get_profile_buffer, worst_endpoints
+from .metrics import exposition
+from .facets import FacetResults, FACET_TITLES, LIST_FACETS, parse_facet_filters
 
 
 class CreateBook(MixinCreateView, CreateView):
@@ -27,17 +38,16 @@ class CreateBook(MixinCreateView, CreateView):
         return context
 
 
-class AllBookView(ListView):
-    """Показ всех книг"""
-    model = Book
+class AllBookView(MixinTemplateEngine, MixinResponseCache, MixinCursorPagination, ListView):
+    """Показ всех книг (строки списка BookListing, без JOIN и prefetch)"""
+    model = BookListing
     template_name = "book_management/index.html"
     paginate_by = 10
+    cursor_ordering = ("title", "book_id")
 
     def get_queryset(self):
         """Показывает только те книги которые разрешены к показу"""
-        return Book.objects.filter(show_book=True).order_by("title").select_related("publisher").prefetch_related(
-            "genre", "author"
-        )
+        return BookListing.objects.filter(show_book=True).order_by("title", "book_id")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -45,11 +55,68 @@ class AllBookView(ListView):
         return context
 
 
-class DetailBookView(DetailView):
+class SearchBookView(MixinTemplateEngine, ListView):
+    """Полнотекстовый поиск книг, результаты отсортированы по релевантности"""
+    template_name = "book_management/index.html"
+    paginate_by = 10
+    paginator_class = EstimatedCountPaginator
+
+    def get_queryset(self):
+        return SearchResults(self.request.GET.get("q", ""), BookListing.objects.all())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["title"] = "Поиск книг"
+        context["q"] = self.request.GET.get("q", "")
+        context["page_query"] = QueryDict.fromkeys(["q"], context["q"]).urlencode() if context["q"] else ""
+        return context
+
+
+class FacetBookView(ListView):
+    """Фасетный просмотр книг: любое сочетание жанров, языков, издательств и диапазона лет с количеством книг"""
+    template_name = "book_management/facets.html"
+    paginate_by = 10
+    paginator_class = EstimatedCountPaginator
+
+    def get_queryset(self):
+        try:
+            self.filters = parse_facet_filters(self.request.GET)
+        except ValueError as error:
+            messages.error(self.request, f"{error}")
+            self.filters = parse_facet_filters(QueryDict())
+        self.results = FacetResults(self.filters, BookListing.objects.filter(show_book=True))
+        return self.results
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        facets = self.results.facets()
+        context["title"] = "Подбор книг"
+        context["filters"] = self.filters
+        context["facet_groups"] = [
+            {"name": facet, "title": FACET_TITLES[facet], "items": facets[facet]} for facet in LIST_FACETS
+        ]
+        context["year_facet"] = facets["year"]
+        query = self.request.GET.copy()
+        query.pop(self.page_kwarg, None)
+        context["page_query"] = query.urlencode()
+        return context
+
+
+class DetailBookView(MixinTemplateEngine, DetailView):
     """Детальный просмотр книги"""
     model = Book
     template_name = "book_management/book_detail.html"
 
+    def get(self, request, *args, **kwargs):
+        """Если книга с таким slug не найдена, но была переименована - перенаправляет на новый адрес"""
+        try:
+            return super().get(request, *args, **kwargs)
+        except Http404:
+            slug_redirect = BookSlugRedirect.objects.filter(old_slug=kwargs.get("slug")).select_related("book").first()
+            if slug_redirect is None:
+                raise
+            return redirect(slug_redirect.book, permanent=True)
+
 
 class UpdateBook(MixinCreateView, UpdateView):
     """Обновление информации о книге"""
@@ -82,11 +149,12 @@ class DeleteBook(DeleteView):
         return super().form_valid(form)
 
 
-class AllAuthorView(ListView):
+class AllAuthorView(MixinTemplateEngine, MixinCursorPagination, ListView):
     """Показ списка всех авторов"""
     model = Author
     template_name = "book_management/list_objects.html"
     paginate_by = 10
+    cursor_ordering = ("first_name", "id")
 
     def get_queryset(self):
         return Author.objects.all()
@@ -98,15 +166,18 @@ class AllAuthorView(ListView):
         return context
 
 
-class AllAuthrBook(ListView):
+class AllAuthrBook(MixinTemplateEngine, MixinResponseCache, MixinCursorPagination, ListView):
     """Получение списка книг только конкретного автора"""
-    model = Book
+    model = BookListing
     template_name = "book_management/index.html"
     paginate_by = 10
+    cursor_ordering = ("title", "book_id")
+
+    def get_cache_tags(self):
+        return [f"books:author:{self.kwargs['slug']}"]
 
     def get_queryset(self):
-        return Book.objects.filter(author__slug=self.kwargs["slug"], show_book=True).order_by("title").select_related(
-            "publisher").prefetch_related("genre", "author")
+        return listing_queryset(author=self.kwargs["slug"]).filter(show_book=True).order_by("title", "book_id")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -153,7 +224,7 @@ class CreatePublisher(MixinCreateView, CreateView):
         return super().form_invalid(form)
 
 
-class AllPublisherView(ListView):
+class AllPublisherView(MixinTemplateEngine, ListView):
     """Показать список издательств"""
     model = Publisher
     template_name = "book_management/list_objects.html"
@@ -168,16 +239,18 @@ class AllPublisherView(ListView):
         return context
 
 
-class AllPublisherBook(ListView):
+class AllPublisherBook(MixinTemplateEngine, MixinResponseCache, MixinCursorPagination, ListView):
     """Показать все книги издательства"""
-    model = Book
+    model = BookListing
     template_name = "book_management/index.html"
     paginate_by = 10
+    cursor_ordering = ("title", "book_id")
+
+    def get_cache_tags(self):
+        return [f"books:publisher:{self.kwargs['slug']}"]
 
     def get_queryset(self):
-        return Book.objects.filter(publisher__slug=self.kwargs["slug"]).select_related("publisher").prefetch_related(
-            "genre", "author"
-        )
+        return listing_queryset(publisher=self.kwargs["slug"]).order_by("title", "book_id")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -233,7 +306,7 @@ class CreateLanguage(MixinCreateView, CreateView):
         return context
 
 
-class AllLanguageView(ListView):
+class AllLanguageView(MixinTemplateEngine, MixinCursorPagination, ListView):
     """Показ списка языков"""
     model = Language
     template_name = "book_management/list_objects.html"
@@ -249,15 +322,18 @@ class AllLanguageView(ListView):
         return context
 
 
-class AllLanguageBook(ListView):
+class AllLanguageBook(MixinTemplateEngine, MixinResponseCache, MixinCursorPagination, ListView):
     """Показ всех книг на этом языке"""
-    model = Book
+    model = BookListing
     template_name = "book_management/index.html"
     paginate_by = 10
+    cursor_ordering = ("title", "book_id")
+
+    def get_cache_tags(self):
+        return [f"books:language:{self.kwargs['slug']}"]
 
     def get_queryset(self):
-        return Book.objects.filter(language__slug=self.kwargs["slug"]).order_by("title").select_related(
-            "publisher").prefetch_related("genre", "author")
+        return listing_queryset(language=self.kwargs["slug"]).order_by("title", "book_id")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -297,15 +373,18 @@ class CreateGenre(MixinCreateView, CreateView):
         return context
 
 
-class AllGenreBook(ListView):
+class AllGenreBook(MixinTemplateEngine, MixinResponseCache, MixinCursorPagination, ListView):
     """Показ всех книг конкретного жанра"""
-    model = Book
+    model = BookListing
     template_name = "book_management/index.html"
     paginate_by = 10
+    cursor_ordering = ("title", "book_id")
+
+    def get_cache_tags(self):
+        return [f"books:genre:{self.kwargs['slug']}"]
 
     def get_queryset(self):
-        return Book.objects.filter(genre__slug=self.kwargs["slug"], show_book=True).order_by("title").select_related(
-            "publisher").prefetch_related("author", "genre")
+        return listing_queryset(genre=self.kwargs["slug"]).filter(show_book=True).order_by("title", "book_id")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -313,7 +392,7 @@ class AllGenreBook(ListView):
         return context
 
 
-class AllGenreView(ListView):
+class AllGenreView(MixinTemplateEngine, MixinCursorPagination, ListView):
     """Показать все жанры"""
     model = Genre
     template_name = "book_management/list_objects.html"
@@ -340,3 +419,33 @@ class DeleteGenre(DeleteView):
         instance = self.get_object()
         messages.success(self.request, f"жанр {instance.title} удален")
         return super().form_valid(form)
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class QueryProfileView(TemplateView):
+    """Страница администратора: представления с худшими показателями по выборочному профилированию"""
+    template_name = "admin/query_profile.html"
+    orders = {"queries": "Запросов в среднем", "db_ms": "Время в базе, мс", "total_ms": "Время ответа(макс), мс"}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        order = self.request.GET.get("order")
+        order = order if order in self.orders else "queries"
+        records = get_profile_buffer().all()
+        context["title"] = "Профилирование запросов"
+        context["order"] = order
+        context["orders"] = self.orders
+        context["endpoints"] = worst_endpoints(records, order=order)
+        context["recent"] = sorted(records, key=lambda record: record[order], reverse=True)[:20]
+        context["sample_rate"] = settings.QUERY_PROFILING_SAMPLE_RATE
+        return context
+
+
+class MetricsView(View):
+    """
+    Метрики всех воркеров в текстовом формате Prometheus
+    Снаружи адрес закрыт в nginx.conf, Prometheus обращается к gunicorn напрямую
+    """
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,4 @@
+"""
+Backend PostgreSQL с пулом соединений внутри процесса (ENGINE = "book_management_system.db_pool")
+Настройки пула - ключ POOL в DATABASES, см. DatabaseWrapper.pool_options
+"""
@@ -0,0 +1,64 @@
+from django.db.backends.postgresql import base
+from .pool import ConnectionPool, get_pool
+
+POOL_DEFAULTS = {
+    "SIZE": 10,
+    "MAX_OVERFLOW": 5,
+    "MIN_SIZE": 0,
+    "TIMEOUT": 10.0,
+    "MAX_IDLE": 300.0,
+    "MAX_LIFETIME": 3600.0,
+    "CHECK_IDLE_AFTER": 5.0,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с пулом соединений
+    Django закрывает соединение в конце каждого запроса(CONN_MAX_AGE = 0), здесь закрытие возвращает
+    соединение в пул, а открытие берет его из пула, поэтому соединение с базой данных не открывается на каждый запрос
+    """
+
+    def pool_options(self):
+        options = dict(POOL_DEFAULTS)
+        options.update(self.settings_dict.get("POOL") or {})
+        return options
+
+    @property
+    def pool(self):
+        settings_dict = self.settings_dict
+        key = f"{self.alias}:{settings_dict['NAME']}@{settings_dict['HOST']}:{settings_dict['PORT']}"
+        return get_pool(key, self._create_pool)
+
+    def _create_pool(self):
+        options = self.pool_options()
+        conn_params = self.get_connection_params()
+        return ConnectionPool(
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            size=options["SIZE"],
+            max_overflow=options["MAX_OVERFLOW"],
+            min_size=options["MIN_SIZE"],
+            timeout=options["TIMEOUT"],
+            max_idle=options["MAX_IDLE"],
+            max_lifetime=options["MAX_LIFETIME"],
+            check_idle_after=options["CHECK_IDLE_AFTER"],
+        )
+
+    def get_new_connection(self, conn_params):
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        # уровень изоляции выставляется родительским get_new_connection только для новых соединений
+        self.isolation_level = base.IsolationLevel(isolation_level) if isolation_level is not None else \
+            base.IsolationLevel.READ_COMMITTED
+        return self.pool.getconn()
+
+    @staticmethod
+    def _reset(connection):
+        """Откатывает незавершенную транзакцию перед возвратом соединения в пул"""
+
+        if connection.get_transaction_status() != base.Database.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection, reset=self._reset)
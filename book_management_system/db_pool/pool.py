@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+
+class ConnectionPool:
+    """
+    Пул соединений с базой данных внутри процесса
+    connect - функция, открывающая новое соединение
+    size - сколько соединений пул держит открытыми, max_overflow - сколько еще можно открыть при пиковой нагрузке
+    (они закрываются сразу после возврата), timeout - сколько ждать свободное соединение
+    max_idle - через сколько секунд простоя лишние(сверх min_size) соединения закрываются,
+    max_lifetime - через сколько секунд соединение закрывается в любом случае
+    check_idle_after - соединение, простоявшее дольше, проверяется запросом перед выдачей
+    Потокобезопасен, поэтому подходит и для потоков WSGI сервера, и для потоков sync_to_async под ASGI
+    """
+
+    def __init__(self, connect, size=10, max_overflow=5, min_size=0, timeout=10.0, max_idle=300.0,
+                 max_lifetime=3600.0, check_idle_after=5.0, check=None):
+        self.connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.min_size = min(min_size, size)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_idle_after = check_idle_after
+        self.check = check or self.ping
+        self._idle = deque()  # (соединение, время возврата), последние возвращенные - справа
+        self._created = dict()  # id(соединения) -> время открытия
+        self._overflow = set()  # id соединений сверх size
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._metrics = dict.fromkeys(
+            ("connections_opened", "connections_closed", "checkouts", "waits", "timeouts", "overflow_opened",
+             "health_check_failures", "reaped"), 0
+        )
+        self._wait_seconds = 0.0
+        self._wait_max_seconds = 0.0
+
+    @staticmethod
+    def ping(connection):
+        """Проверка соединения: SELECT 1"""
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    @staticmethod
+    def is_broken(connection):
+        return bool(getattr(connection, "closed", False))
+
+    def _open(self):
+        connection = self.connect()
+        self._created[id(connection)] = time.monotonic()
+        self._metrics["connections_opened"] += 1
+        return connection
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        self._overflow.discard(id(connection))
+        self._metrics["connections_closed"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _total(self):
+        return self._in_use + len(self._idle)
+
+    def _reap(self, now):
+        """Закрывает лишние простаивающие и слишком старые соединения (самые давние - слева)"""
+
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+            connection, _ = self._idle.popleft()
+            self._discard(connection)
+            self._metrics["reaped"] += 1
+
+    def getconn(self):
+        """Выдает соединение: свободное из пула, новое(в пределах size + max_overflow) или ждет освобождения"""
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._reap(now)
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._total() < self.size + self.max_overflow:
+                    self._in_use += 1
+                    connection = None
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolTimeout(f"Нет свободного соединения за {self.timeout} с")
+                waited = True
+                self._condition.wait(remaining)
+
+            waited_for = time.monotonic() - started
+            self._metrics["checkouts"] += 1
+            if waited:
+                self._metrics["waits"] += 1
+            self._wait_seconds += waited_for
+            self._wait_max_seconds = max(self._wait_max_seconds, waited_for)
+
+        try:
+            if connection is not None and (
+                    self.is_broken(connection) or self._expired(connection)
+                    or (time.monotonic() - returned_at > self.check_idle_after and not self._healthy(connection))):
+                with self._condition:
+                    self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = self._open_counted()
+        except BaseException:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        return connection
+
+    def _open_counted(self):
+        connection = self._open()
+        with self._condition:
+            if self._total() > self.size:
+                self._overflow.add(id(connection))
+                self._metrics["overflow_opened"] += 1
+        return connection
+
+    def _healthy(self, connection):
+        try:
+            self.check(connection)
+            return True
+        except Exception:
+            with self._condition:
+                self._metrics["health_check_failures"] += 1
+            return False
+
+    def _expired(self, connection):
+        return time.monotonic() - self._created.get(id(connection), 0) > self.max_lifetime
+
+    def putconn(self, connection, reset=None):
+        """
+        Возвращает соединение в пул
+        reset - функция, которая возвращает соединение в исходное состояние(откат незавершенной транзакции),
+        если она не удалась, соединение закрывается
+        """
+
+        keep = not self.is_broken(connection) and not self._expired(connection)
+        if keep and reset is not None:
+            try:
+                reset(connection)
+            except Exception:
+                keep = False
+        with self._condition:
+            self._in_use -= 1
+            if keep and id(connection) not in self._overflow:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+            self._reap(time.monotonic())
+            self._condition.notify()
+
+    def closeall(self):
+        """Закрывает все свободные соединения"""
+
+        with self._condition:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self):
+        """Текущее состояние и счетчики пула"""
+
+        with self._condition:
+            stats = dict(self._metrics)
+            stats.update({
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "overflow_in_use": len(self._overflow),
+                "wait_seconds_total": round(self._wait_seconds, 6),
+                "wait_seconds_max": round(self._wait_max_seconds, 6),
+            })
+        return stats
+
+
+_pools = dict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """
+    Пул по ключу(параметры подключения) для текущего процесса
+    После fork(воркеры gunicorn) у процесса-потомка будет свой пул, соединения родителя не используются
+    """
+
+    key = (os.getpid(), key)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = factory()
+        return pool
+
+
+def all_pool_stats():
+    """Состояние всех пулов текущего процесса: {ключ: stats}"""
+
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [(key, pool) for (owner, key), pool in _pools.items() if owner == pid]
+    return {key: pool.stats() for key, pool in pools}
@@ -0,0 +1,34 @@
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment, pass_context
+from markupsafe import Markup
+from book_management.fragments import load_fragments, render_fragment
+
+
+def url(name, *args, **kwargs):
+    """{{ url('detail_book', object.slug) }} - как {% url 'detail_book' object.slug %}"""
+
+    return reverse(name, args=args or None, kwargs=kwargs or None)
+
+
+@pass_context
+def fragment(context, name, obj, loaded=None, caller=None):
+    """
+    {% call fragment("book_row", object, loaded) %}...{% endcall %} - как {% fragment %} в шаблонах Django
+    loaded - результат load_fragments(name, object_list) для всех строк страницы
+    """
+
+    return Markup(render_fragment(name, obj, caller, context.get("request"), loaded))
+
+
+def environment(**options):
+    """Окружение Jinja2 для страниц каталога (jinja2/): адреса, статика и кэш фрагментов как в templates/"""
+
+    env = Environment(**options)
+    env.globals.update({
+        "url": url,
+        "static": static,
+        "load_fragments": load_fragments,
+        "fragment": fragment,
+    })
+    return env
@@ -0,0 +1,107 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = "primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RoutingState:
+    """
+    Состояние маршрутизации для текущего запроса
+    use_replicas - можно ли читать с реплик, wrote - была ли запись (после нее чтение идет с основной базы)
+    replica - реплика запроса(одна на запрос: данные страницы из одного снимка), replica_current - проверка ее
+    отставания (book_management.versioning.replica_caught_up), выполняется один раз
+    Объект изменяемый: под ASGI он общий для запроса и потоков sync_to_async
+    """
+
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+        self.replica = None
+        self.replica_current = None
+
+
+_state = ContextVar("replica_routing", default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+def get_routing_state():
+    """Состояние маршрутизации текущего запроса (None - вне запроса: команды, фоновые задачи)"""
+
+    return _state.get()
+
+
+def pin_primary():
+    """Дальнейшие чтения в текущем запросе - только с основной базы"""
+
+    state = _state.get()
+    if state is not None:
+        state.use_replicas = False
+
+
+class ReplicaRouter:
+    """
+    Чтение с реплик, запись в основную базу
+    Реплики используются только в безопасных запросах(GET, HEAD, OPTIONS) без закрепления за основной базой,
+    поэтому команды, фоновые задачи и обработка форм всегда работают с основной базой
+    После записи в запросе и внутри транзакции чтение тоже идет с основной базы
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = get_replicas()
+        if state is None or not state.use_replicas or state.wrote or not replicas:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Реплики получают схему через репликацию"""
+        return db not in get_replicas()
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Закрепление клиента за основной базой после записи(read-your-writes)
+    После изменяющего запроса(не GET, HEAD, OPTIONS) клиент получает cookie на REPLICA_PIN_SECONDS секунд,
+    и пока она есть, его запросы читают с основной базы: редирект после messages.success покажет свежие данные,
+    даже если реплика еще отстает
+    """
+
+    def process_request(self, request):
+        pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+        request.replica_routing = RoutingState(use_replicas=not pinned)
+        request.replica_routing_token = _state.set(request.replica_routing)
+
+    def process_response(self, request, response):
+        state = getattr(request, "replica_routing", None)
+        if state is None:
+            return response
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax")
+        try:
+            _state.reset(request.replica_routing_token)
+        except ValueError:
+            _state.set(None)  # ответ формируется в другом контексте (sync_to_async под ASGI)
+        return response
@@ -38,22 +38,21 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'book_management.apps.BookManagementConfig',
     'rest_framework',
-    'debug_toolbar',
-]
-
-INTERNAL_IPS = [
-    '127.0.0.1'
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # сразу после SecurityMiddleware(запросов к базе не делает), чтобы учитывать запросы всех следующих middleware
+    'book_management.profiling.QueryProfilingMiddleware',
+    # время ответа и запросы к базе всех следующих middleware, профилирование(выше) в метрики не входит
+    'book_management.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'book_management_system.replicas.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'book_management_system.urls'
@@ -72,8 +71,25 @@ TEMPLATES = [
             ],
         },
     },
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'NAME': 'jinja2',
+        'DIRS': [BASE_DIR / 'jinja2'],  # Шаблоны страниц каталога, повторяют templates/ (тот же контекст)
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'book_management_system.jinja2.environment',
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
 ]
 
+CATALOG_TEMPLATE_ENGINE = catalog_template_engine  # Шаблонизатор страниц каталога: django или jinja2
+
 WSGI_APPLICATION = 'book_management_system.wsgi.application'
 
 # Database
@@ -81,15 +97,38 @@ WSGI_APPLICATION = 'book_management_system.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'book_management_system.db_pool',  # PostgreSQL с пулом соединений
         'NAME': postgres_db,
         'USER': postgres_user,
         'PASSWORD': postgres_password,
         'HOST': postgres_host,
-        'PORT': postgres_port
+        'PORT': postgres_port,
+        'CONN_MAX_AGE': 0,  # соединение возвращается в пул в конце запроса
+        'POOL': {
+            'SIZE': 10,  # постоянных соединений на процесс (воркеры * SIZE <= max_connections PostgreSQL)
+            'MAX_OVERFLOW': 5,  # дополнительных соединений при пиковой нагрузке
+            'TIMEOUT': 10,  # сколько секунд ждать свободное соединение
+            'MAX_IDLE': 300,  # через сколько секунд простоя закрывать лишние соединения
+            'MAX_LIFETIME': 3600,
+            'CHECK_IDLE_AFTER': 5,  # проверять SELECT 1 соединения, простоявшие дольше
+        },
     }
 }
 
+# Реплики для чтения (book_management_system/replicas.py): replica_1, replica_2...
+for number, replica in enumerate(postgres_replicas, start=1):
+    replica_host, _, replica_port = replica.partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or postgres_port,
+        'TEST': {'MIRROR': 'default'},  # в тестах реплика - та же база
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['book_management_system.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5  # Сколько секунд после записи клиент читает с основной базы (больше задержки репликации)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -136,6 +175,65 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media/'
 
+# Кэш
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Файловый кэш общий для всех воркеров gunicorn/uvicorn: инвалидация тегов (book_management/cache.py), версия
+# каталога и кэш фрагментов видны всем процессам. LocMemCache допустим только с одним воркером (runserver)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': cache_dir,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+}
+
+CATALOG_CACHE_ALIAS = 'default'  # Кэш страниц каталога с тегами (book_management/cache.py)
+CATALOG_CACHE_TIMEOUT = 600
+CATALOG_VERSION_TIMEOUT = 60  # Сколько секунд версия каталога (ETag в API) живет в кэше без обращения к базе
+
+PAGINATOR_ESTIMATE_THRESHOLD = 100000  # С какой оценки планировщика PostgreSQL не выполнять COUNT(*) при пагинации
+BULK_CREATE_MAX_ITEMS = 10000  # Максимум книг в одном запросе /api/v1/bulk-add-book/
+ASYNC_API = async_api  # /api/v1/ на асинхронных представлениях (api/v1/async_views.py), для запуска под ASGI
+COVER_WORKERS = 2  # Процессов для обработки обложек(0 - обрабатывать сразу, в текущем потоке)
+COVER_SIZES = [(40, 50), (80, 100), (240, 300)]  # Размеры копий обложки(первая - для thumbnail_url)
+EXPORT_CHUNK_SIZE = 2000  # Сколько книг загружать (с prefetch связей) за один запрос при выгрузке каталога
+
+# Выборочное профилирование запросов к базе данных (book_management/profiling.py)
+QUERY_PROFILING_SAMPLE_RATE = query_profiling_sample_rate  # Доля профилируемых запросов (0 - выключено)
+QUERY_PROFILING_BUFFER_SIZE = 1000  # Сколько последних записей хранить в памяти процесса
+QUERY_PROFILING_N_PLUS_ONE = 5  # С какого количества повторов одного отпечатка запроса считать его N+1
+
+# Метрики в формате Prometheus на /metrics (book_management/metrics.py)
+METRICS_DIR = metrics_dir  # Каталог файлов метрик, очищается перед запуском gunicorn (docker_start/start.sh)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'book_management.profiling': {  # одна строка JSON на профилированный запрос
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Фасетный подбор книг (book_management/facets.py)
+FACET_CACHE_SIZE = 256  # Сколько наборов фильтров хранить с посчитанными количествами (до изменения каталога)
+FACET_MAX_VALUES = 50  # Сколько самых частых значений каждого фасета показывать
+FACET_INDEX_BACKGROUND = True  # Перестраивать индекс после изменения каталога в фоне, пока отдается прежний
+
+# Нечеткий поиск авторов и издательств (book_management/fuzzy.py)
+FUZZY_LOOKUP_LIMIT = 10  # Сколько похожих имен возвращать
+FUZZY_LOOKUP_TIMEOUT_MS = 50  # Бюджет времени на один поиск
+FUZZY_LOOKUP_MIN_SIMILARITY = 0.3  # Минимальная похожесть по триграммам (как pg_trgm.similarity_threshold)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
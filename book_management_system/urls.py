@@ -18,15 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from book_management.views import QueryProfileView, MetricsView
 
 urlpatterns = [
+    path('admin/query-profile/', QueryProfileView.as_view(), name='query_profile'),
     path('admin/', admin.site.urls),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('', include('book_management.urls')),
-    path('api/v1/', include('api.v1.urls', namespace='api')),
+    path('api/v1/', include('api.v1.async_urls' if settings.ASYNC_API else 'api.v1.urls', namespace='api')),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns = [
-        path('__debug__/', include('debug_toolbar.urls'))
-    ] + urlpatterns
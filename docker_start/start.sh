@@ -11,4 +11,12 @@ python manage.py collectstatic --no-input
 echo "Create superuser"
 DJANGO_SUPERUSER_PASSWORD=$A_PASSWORD python manage.py createsuperuser --username $A_NAME --email $A_EMAIL --noinput
 
+echo "Clear metrics"
+export METRICS_DIR=${METRICS_DIR:-/tmp/metrics}
+rm -rf "$METRICS_DIR" && mkdir -p "$METRICS_DIR"
+
+echo "Clear page cache"
+export CACHE_DIR=${CACHE_DIR:-/tmp/book_management_cache}
+rm -rf "$CACHE_DIR" && mkdir -p "$CACHE_DIR"
+
 gunicorn book_management_system.wsgi:application --bind 0.0.0.0:8018
\ No newline at end of file
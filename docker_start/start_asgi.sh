@@ -0,0 +1,21 @@
+#!/bin/bash
+echo "Wait ..."
+sleep 5
+
+echo "Start migrate"
+python manage.py migrate --no-input
+
+echo "Start collectstatic"
+python manage.py collectstatic --no-input
+
+echo "Clear metrics"
+export METRICS_DIR=${METRICS_DIR:-/tmp/metrics}
+rm -rf "$METRICS_DIR" && mkdir -p "$METRICS_DIR"
+
+echo "Clear page cache"
+export CACHE_DIR=${CACHE_DIR:-/tmp/book_management_cache}
+rm -rf "$CACHE_DIR" && mkdir -p "$CACHE_DIR"
+
+# /api/v1/ на асинхронных представлениях, воркеры uvicorn под управлением gunicorn
+ASYNC_API=1 gunicorn book_management_system.asgi:application -k uvicorn.workers.UvicornWorker \
+    --workers ${WEB_WORKERS:-2} --bind 0.0.0.0:8018
@@ -8,5 +8,16 @@ postgres_user = os.getenv("POSTGRES_USER")
 postgres_password = os.getenv("POSTGRES_PASSWORD")
 postgres_host = os.getenv("POSTGRES_HOST")
 postgres_port = os.getenv("POSTGRES_PORT")
+# Реплики только для чтения: "host:port,host:port"
+postgres_replicas = [replica for replica in os.getenv("POSTGRES_REPLICAS", "").split(",") if replica]
 
 secret_key = os.getenv("SECRET_KEY")
+
+async_api = os.getenv("ASYNC_API", "0") == "1"
+query_profiling_sample_rate = float(os.getenv("QUERY_PROFILING_SAMPLE_RATE", "0.01"))
+# Каталог файлового кэша страниц, общий для всех воркеров (очищается перед запуском, docker_start/start.sh)
+cache_dir = os.getenv("CACHE_DIR", "/tmp/book_management_cache")
+# Каталог файлов метрик, общий для всех воркеров gunicorn (пусто - метрики в памяти процесса)
+metrics_dir = os.getenv("METRICS_DIR") or None
+# Шаблонизатор страниц каталога: django или jinja2 (шаблоны jinja2/)
+catalog_template_engine = os.getenv("CATALOG_TEMPLATE_ENGINE", "django")